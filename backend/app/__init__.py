@@ -1,5 +1,5 @@
 """BAWS Flask application factory."""
-from flask import Flask
+from flask import Flask, jsonify
 from flask_cors import CORS
 from flasgger import Swagger
 
@@ -25,7 +25,7 @@ SWAGGER_TEMPLATE = {
 def create_app(config=None):
     """Create and configure the Flask application."""
     app = Flask(__name__)
-    CORS(app)
+    CORS(app, expose_headers=["X-Has-More", "Retry-After", "Idempotent-Replayed"])
     Swagger(app, template=SWAGGER_TEMPLATE)
 
     # Load config (use Config class, not module)
@@ -50,15 +50,43 @@ def create_app(config=None):
     app.register_blueprint(documents_bp, url_prefix="/api/v1/projects")
     app.register_blueprint(analysis_bp, url_prefix="/api/v1")
 
-    # Init DB
+    # LLM capacity exhausted -> 429 with Retry-After instead of queueing more threads
+    from app.services.llm_governor import LLMOverloadedError
+
+    @app.errorhandler(LLMOverloadedError)
+    def llm_overloaded(e):
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 429
+
+    # Init DB (SQLite pragmas, pool sizes, the read-only pool and per-project shards from the sqlite config section)
+    from app.db_engine import configure_engines, install_pragmas
+    from app.db_shards import configure_shards
     from app.models import db
 
+    configure_engines(app)
+    configure_shards(app)
     db.init_app(app)
     with app.app_context():
-        db.create_all()
-        from app.db_migrate import migrate_add_conversation_columns, migrate_add_message_agent_id
+        install_pragmas(db.engines)
+        db.create_all(bind_key=None)  # the read bind has no tables of its own
+        from app.db_migrate import run_migrations
+
+        run_migrations(app)
+
+        from app.services.conversation_agent import fail_interrupted_replies
+
+        fail_interrupted_replies()
+
+    # Start background analysis workers (also re-queues jobs interrupted by a crash)
+    from app.services.analysis_queue import start_workers
+
+    start_workers(app, app.config.get("ANALYSIS_WORKERS", 0))
+
+    # Deleted projects answer 404 at once; their rows and folders are removed in the background
+    from app.services.project_purger import reject_deleted_project, resume_purges
 
-        migrate_add_conversation_columns(app)
-        migrate_add_message_agent_id(app)
+    app.url_value_preprocessor(reject_deleted_project)
+    resume_purges(app)
 
     return app
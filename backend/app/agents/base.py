@@ -1,13 +1,15 @@
 """Base agent logic - load YAML and build prompt from persona."""
-import os
 from pathlib import Path
 
 import yaml
 
 # Paths relative to ba-analysis module (agents and prompts)
-_BA_ANALYSIS_ROOT = Path(__file__).resolve().parent.parent.parent.parent / "src" / "modules" / "ba-analysis"
-AGENTS_DIR = _BA_ANALYSIS_ROOT / "agents"
-PROMPTS_DIR = _BA_ANALYSIS_ROOT / "prompts"
+BA_ANALYSIS_ROOT = Path(__file__).resolve().parent.parent.parent.parent / "src" / "modules" / "ba-analysis"
+AGENTS_DIR = BA_ANALYSIS_ROOT / "agents"
+PROMPTS_DIR = BA_ANALYSIS_ROOT / "prompts"
+CONFIG_DIR = BA_ANALYSIS_ROOT / "config"
+CONVERSATION_AGENTS_CONFIG = CONFIG_DIR / "conversation-agents.yaml"
+BA_CONVERSATION_PROMPT_PATH = PROMPTS_DIR / "ba_conversation.prompt.txt"
 
 AGENT_FILES = {
     "alex": "alex.agent.yaml",
@@ -18,34 +20,28 @@ AGENT_FILES = {
 }
 
 
-def load_agent_yaml(agent_name: str) -> dict:
-    """Load agent YAML and return parsed config."""
-    if agent_name not in AGENT_FILES:
-        raise ValueError(f"Unknown agent: {agent_name}")
-    path = AGENTS_DIR / AGENT_FILES[agent_name]
-    if not path.exists():
-        raise FileNotFoundError(f"Agent config not found: {path}")
+DEFAULT_ANALYSIS_INSTRUCTION = (
+    "\nAnalyze the provided document and return your analysis in a clear, structured format."
+)
+
+
+def read_agent_yaml(path: Path) -> dict:
+    """Parse one agent YAML file."""
     with open(path, encoding="utf-8") as f:
-        return yaml.safe_load(f)
+        return yaml.safe_load(f) or {}
 
 
-def get_agent_bot_info(agent_name: str) -> dict:
-    """
-    Return bot info for API: { name, avatar, role }.
-    avatar is taken from metadata.icon in agent YAML.
-    """
-    data = load_agent_yaml(agent_name)
-    meta = data.get("agent", {}).get("metadata", {})
-    return {
-        "name": meta.get("name", agent_name.title()),
-        "avatar": meta.get("icon", ""),
-        "role": "assistant",
-    }
+def prompt_file_path(data: dict) -> Path | None:
+    """Path of the agent's activation.prompt_file, resolved to PROMPTS_DIR / filename."""
+    prompt_file = data.get("agent", {}).get("activation", {}).get("prompt_file")
+    if not prompt_file:
+        return None
+    # e.g. ../prompts/alex.prompt.txt -> PROMPTS_DIR / alex.prompt.txt
+    return PROMPTS_DIR / Path(prompt_file).name
 
 
-def build_system_prompt(agent_name: str) -> str:
-    """Build system prompt from agent YAML persona and optional prompt_file."""
-    data = load_agent_yaml(agent_name)
+def compose_system_prompt(data: dict, prompt_text: str | None) -> str:
+    """System prompt from agent YAML persona plus the prompt file text (None if missing)."""
     agent = data.get("agent", {})
     persona = agent.get("persona", {})
 
@@ -58,18 +54,39 @@ def build_system_prompt(agent_name: str) -> str:
         parts.append(f"Communication style: {persona['communication_style']}")
     if persona.get("principles"):
         parts.append(f"Principles:\n{persona['principles']}")
-
-    # Load prompt_file from activation if present (e.g. ../prompts/alex.prompt.txt)
-    activation = agent.get("activation", {})
-    prompt_file = activation.get("prompt_file")
-    if prompt_file and PROMPTS_DIR.exists():
-        # Resolve to PROMPTS_DIR / filename (e.g. alex.prompt.txt)
-        name = Path(prompt_file).name
-        path = PROMPTS_DIR / name
-        if path.exists():
-            parts.append(path.read_text(encoding="utf-8").strip())
-        else:
-            parts.append("\nAnalyze the provided document and return your analysis in a clear, structured format.")
-    else:
-        parts.append("\nAnalyze the provided document and return your analysis in a clear, structured format.")
+    parts.append(prompt_text.strip() if prompt_text is not None else DEFAULT_ANALYSIS_INSTRUCTION)
     return "\n\n".join(parts)
+
+
+def compose_bot_info(agent_name: str, data: dict) -> dict:
+    """Bot info { name, avatar, role }; avatar is taken from metadata.icon in agent YAML."""
+    meta = data.get("agent", {}).get("metadata", {})
+    return {
+        "name": meta.get("name", agent_name.title()),
+        "avatar": meta.get("icon", ""),
+        "role": "assistant",
+    }
+
+
+def load_agent_yaml(agent_name: str) -> dict:
+    """Return the parsed agent YAML config (a copy of the registry's compiled entry)."""
+    from app.agents.registry import get_registry, thaw
+
+    return thaw(get_registry().get_agent(agent_name).config)
+
+
+def get_agent_bot_info(agent_name: str) -> dict:
+    """
+    Return bot info for API: { name, avatar, role }.
+    avatar is taken from metadata.icon in agent YAML.
+    """
+    from app.agents.registry import get_registry
+
+    return dict(get_registry().get_agent(agent_name).bot_info)
+
+
+def build_system_prompt(agent_name: str) -> str:
+    """Build system prompt from agent YAML persona and optional prompt_file (compiled once, see registry)."""
+    from app.agents.registry import get_registry
+
+    return get_registry().get_agent(agent_name).system_prompt
@@ -0,0 +1,212 @@
+"""
+Agent registry: agent YAML, conversation-agents.yaml and prompt files compiled once.
+
+Lookups (system prompt, bot info, conversation agents) are dict reads on an immutable
+snapshot. At most every RELOAD_CHECK_SECONDS the registry stats its source files; when an
+mtime changed, only those files are re-read and a new snapshot is compiled and swapped in.
+prompt_version is a hash over everything that shapes model prompts, for cache keys.
+"""
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+
+import yaml
+
+from app.agents.base import (
+    AGENT_FILES,
+    AGENTS_DIR,
+    BA_CONVERSATION_PROMPT_PATH,
+    CONVERSATION_AGENTS_CONFIG,
+    compose_bot_info,
+    compose_system_prompt,
+    prompt_file_path,
+    read_agent_yaml,
+)
+
+RELOAD_CHECK_SECONDS = 1.0
+
+
+def _freeze(value):
+    """Read-only view of parsed YAML (mappings become MappingProxyType, lists tuples)."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """Mutable deep copy of a frozen value."""
+    if isinstance(value, MappingProxyType):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class CompiledAgent:
+    """An analysis agent with its system prompt built from persona + prompt file."""
+
+    name: str
+    config: MappingProxyType
+    system_prompt: str
+    bot_info: MappingProxyType
+    prompt_hash: str
+
+
+@dataclass(frozen=True)
+class RegistrySnapshot:
+    agents: MappingProxyType  # name -> CompiledAgent (agents whose YAML exists)
+    conversation_agents: tuple  # entries of conversation-agents.yaml, in file order
+    conversation_agents_by_id: MappingProxyType
+    routing: MappingProxyType
+    conversation_prompt: str | None
+    prompt_version: str
+
+
+class AgentRegistry:
+    """Compiled agent definitions with mtime-based hot reload."""
+
+    def __init__(self, check_interval: float = RELOAD_CHECK_SECONDS):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._files: dict = {}  # path -> (mtime or None, parsed value)
+        self._snapshot: RegistrySnapshot | None = None
+        self._checked_at = 0.0
+        self._stats = {"reloads": 0, "files_read": 0}
+
+    # -- loading -----------------------------------------------------------------------
+
+    @staticmethod
+    def _mtime(path: Path) -> float | None:
+        try:
+            return path.stat().st_mtime
+        except OSError:
+            return None
+
+    def _read(self, path: Path, parse):
+        """Parsed contents of path (None if missing), re-read only when its mtime changed."""
+        mtime = self._mtime(path)
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        value = parse(path) if mtime is not None else None
+        if mtime is not None:
+            self._stats["files_read"] += 1
+        self._files[path] = (mtime, value)
+        return value
+
+    def _changed(self) -> bool:
+        return any(self._mtime(path) != mtime for path, (mtime, _) in self._files.items())
+
+    def _compile(self) -> RegistrySnapshot:
+        agents = {}
+        for name, filename in AGENT_FILES.items():
+            data = self._read(AGENTS_DIR / filename, read_agent_yaml)
+            if data is None:
+                continue
+            prompt_path = prompt_file_path(data)
+            prompt_text = self._read(prompt_path, lambda p: p.read_text(encoding="utf-8")) if prompt_path else None
+            system_prompt = compose_system_prompt(data, prompt_text)
+            agents[name] = CompiledAgent(
+                name=name,
+                config=_freeze(data),
+                system_prompt=system_prompt,
+                bot_info=MappingProxyType(compose_bot_info(name, data)),
+                prompt_hash=_sha256(system_prompt),
+            )
+
+        conversation = self._read(
+            CONVERSATION_AGENTS_CONFIG, lambda p: yaml.safe_load(p.read_text(encoding="utf-8")) or {}
+        ) or {}
+        conversation_agents = _freeze(conversation.get("agents") or [])
+        conversation_prompt = self._read(
+            BA_CONVERSATION_PROMPT_PATH, lambda p: p.read_text(encoding="utf-8").strip()
+        )
+
+        version = hashlib.sha256()
+        for name in sorted(agents):
+            version.update(f"{name}\0{agents[name].prompt_hash}\0".encode("utf-8"))
+        version.update(json.dumps(conversation.get("agents") or [], sort_keys=True, default=str).encode("utf-8"))
+        version.update(b"\0" + (conversation_prompt or "").encode("utf-8"))
+
+        return RegistrySnapshot(
+            agents=MappingProxyType(agents),
+            conversation_agents=conversation_agents,
+            conversation_agents_by_id=MappingProxyType(
+                {a.get("id"): a for a in conversation_agents if a.get("id")}
+            ),
+            routing=_freeze(conversation.get("routing") or {}),
+            conversation_prompt=conversation_prompt,
+            prompt_version=version.hexdigest(),
+        )
+
+    def snapshot(self) -> RegistrySnapshot:
+        """Current compiled snapshot; recompiled when a source file changed."""
+        now = time.monotonic()
+        snapshot = self._snapshot
+        if snapshot is not None and now - self._checked_at < self.check_interval:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or (now - self._checked_at >= self.check_interval and self._changed()):
+                self._snapshot = self._compile()
+                self._stats["reloads"] += 1
+            self._checked_at = now
+            return self._snapshot
+
+    def reload(self) -> RegistrySnapshot:
+        """Force an mtime check now (e.g. right after editing a prompt)."""
+        with self._lock:
+            self._checked_at = 0.0
+        return self.snapshot()
+
+    # -- lookups -----------------------------------------------------------------------
+
+    def get_agent(self, name: str) -> CompiledAgent:
+        if name not in AGENT_FILES:
+            raise ValueError(f"Unknown agent: {name}")
+        agent = self.snapshot().agents.get(name)
+        if agent is None:
+            raise FileNotFoundError(f"Agent config not found: {AGENTS_DIR / AGENT_FILES[name]}")
+        return agent
+
+    def conversation_agents(self) -> tuple:
+        return self.snapshot().conversation_agents
+
+    def conversation_agent(self, agent_id: str):
+        return self.snapshot().conversation_agents_by_id.get(agent_id)
+
+    @property
+    def prompt_version(self) -> str:
+        return self.snapshot().prompt_version
+
+    def stats(self) -> dict:
+        return {**self._stats, "files": len(self._files), "prompt_version": self.prompt_version[:12]}
+
+
+_registry: AgentRegistry | None = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> AgentRegistry:
+    """Process-wide agent registry."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = AgentRegistry()
+    return _registry
+
+
+def get_prompt_version() -> str:
+    """Hash of all agent prompts and conversation-agent config; changes when any of them is edited."""
+    return get_registry().prompt_version
@@ -1,16 +1,44 @@
 """Analysis API."""
-from flask import Blueprint, jsonify, request
+import os
+import time
 
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from app.db_shards import allocate_analysis_id
 from app.models import Analysis, Document, Project, db
-from app.services.orchestrator import run_analysis, save_analysis_output
+from app.services.analysis_events import FINAL_STATUSES, format_sse, result_events, status_event
+from app.services.analysis_queue import (
+    coalesce_lock,
+    enqueue,
+    failed_agents,
+    find_inflight,
+    initial_progress,
+    retry_progress,
+    wait_for_update,
+)
+from app.services.document_cache import file_sha256
+from app.services.gemini_client import get_governor
+from app.services.llm_governor import PRIORITY_ANALYSIS, PRIORITY_BATCH, LLMOverloadedError
+from app.services.idempotency import idempotent
+from app.services.orchestrator import ANALYSIS_MODES, analysis_coalesce_key
 
 bp = Blueprint("analysis", __name__)
 
+# SSE: max seconds between DB checks (workers in this process wake the stream earlier)
+EVENTS_POLL_INTERVAL = 1.0
+EVENTS_KEEPALIVE_SECONDS = 15.0
+
 
 @bp.route("/projects/<int:project_id>/analyze", methods=["POST"])
+@idempotent
 def trigger_analysis(project_id):
     """
-    Run analysis on a document
+    Queue analysis of a document.
+    Returns 202 immediately with the analysis id; poll GET /analyses/{id} for progress and results.
+    If an identical analysis (same document contents, prompts and mode) is already in flight, no new
+    run starts: the same request again (same project, document, conversation) gets the in-flight
+    analysis back, anything else gets a new analysis with coalesced_into set that receives the
+    in-flight run's progress and result.
     ---
     tags:
       - Analysis
@@ -19,6 +47,11 @@ def trigger_analysis(project_id):
         in: path
         type: integer
         required: true
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retrying with the same key and body returns the first response instead of queueing again
       - name: body
         in: body
         required: true
@@ -28,23 +61,62 @@ def trigger_analysis(project_id):
           properties:
             document_id: { type: integer }
             conversation_id: { type: integer }
+            use_cache:
+              type: boolean
+              default: true
+              description: Set false to bypass the LLM response cache (and never join an in-flight analysis)
+            mode:
+              type: string
+              enum: [auto, single, chunked]
+              description: chunked = map-reduce over section-aware chunks; auto (default) chunks only large documents
+            priority:
+              type: string
+              enum: [analysis, batch]
+              description: LLM scheduling class; batch runs behind interactive chat and analyses
+            deadline_seconds:
+              type: number
+              description: Overall time budget (default analysis.deadline_seconds); agents still running then are marked timed_out
     responses:
-      201:
-        description: Analysis started and result
+      202:
+        description: Analysis queued (status pending); Location header points to the analysis
       400:
-        description: document_id is required
+        description: document_id is required, or invalid mode/priority/deadline_seconds
       404:
         description: Project or document not found
-      500:
-        description: Analysis failed
+      409:
+        description: A request with the same Idempotency-Key is still in progress
+      422:
+        description: Idempotency-Key was already used with a different body
+      429:
+        description: LLM capacity exhausted; retry after the Retry-After header (seconds)
     """
     project = Project.query.get_or_404(project_id)
     data = request.get_json() or {}
     document_id = data.get("document_id")
     if not document_id:
         return jsonify({"error": "document_id is required"}), 400
+    mode = data.get("mode")
+    if mode is not None and mode not in ANALYSIS_MODES:
+        return jsonify({"error": f"mode must be one of {', '.join(ANALYSIS_MODES)}"}), 400
+    priority = data.get("priority") or PRIORITY_ANALYSIS
+    if priority not in (PRIORITY_ANALYSIS, PRIORITY_BATCH):
+        return jsonify({"error": f"priority must be {PRIORITY_ANALYSIS} or {PRIORITY_BATCH}"}), 400
+
+    deadline_seconds = data.get("deadline_seconds")
+    if deadline_seconds is not None and (
+        isinstance(deadline_seconds, bool) or not isinstance(deadline_seconds, (int, float)) or deadline_seconds <= 0
+    ):
+        return jsonify({"error": "deadline_seconds must be a positive number"}), 400
 
     doc = Document.query.filter_by(id=document_id, project_id=project_id).first_or_404()
+    if doc.content_hash is None and os.path.isfile(doc.file_path):
+        # Uploaded before documents.content_hash existed: hash it now so it can be coalesced
+        doc.content_hash = file_sha256(doc.file_path)
+        db.session.commit()
+
+    governor = get_governor()
+    if governor.is_overloaded(priority):
+        raise LLMOverloadedError(governor.retry_after(priority))
 
     conversation_id = data.get("conversation_id")
     if conversation_id is not None:
@@ -58,41 +130,50 @@ def trigger_analysis(project_id):
     else:
         conversation_id = None
 
-    analysis = Analysis(
-        project_id=project_id,
-        document_id=document_id,
-        conversation_id=conversation_id,
-        status="running",
-    )
-    db.session.add(analysis)
-    db.session.commit()
-
-    try:
-        result = run_analysis(doc.file_path, project_id)
-        if "error" in result:
-            analysis.status = "failed"
-            analysis.error_message = result["error"]
-            analysis.agent_results = None
+    use_cache = data.get("use_cache") is not False
+    coalesce_key = analysis_coalesce_key(doc.content_hash, mode) if use_cache and doc.content_hash else None
+    with coalesce_lock:
+        leader = find_inflight(coalesce_key, priority, deadline_seconds) if coalesce_key else None
+        if leader is not None and (leader.project_id, leader.document_id, leader.conversation_id) == (
+            project_id,
+            doc.id,
+            conversation_id,
+        ):
+            analysis = leader  # duplicate request: attach to the run already in flight
         else:
-            analysis.status = "completed"
-            analysis.agent_results = result.get("agent_results", result)
-            analysis.error_message = None
-            save_analysis_output(project_id, analysis.id, result)
-        db.session.commit()
-    except Exception as e:
-        analysis.status = "failed"
-        analysis.error_message = str(e)
-        analysis.agent_results = None
-        db.session.commit()
-        return jsonify({"error": str(e)}), 500
+            analysis = Analysis(
+                id=allocate_analysis_id(project_id),
+                project_id=project_id,
+                document_id=doc.id,
+                conversation_id=conversation_id,
+                status="pending",
+                progress=leader.progress if leader is not None else initial_progress(),
+                agent_results=leader.agent_results if leader is not None else None,
+                options={
+                    "use_cache": use_cache,
+                    "mode": mode,
+                    "priority": priority,
+                    "deadline_seconds": deadline_seconds,
+                },
+                coalesce_key=coalesce_key,
+                coalesced_into=leader.id if leader is not None else None,
+            )
+            db.session.add(analysis)
+            db.session.commit()
+    if leader is None:
+        enqueue(analysis.id)
 
-    return jsonify(analysis.to_dict()), 201
+    response = jsonify(analysis.to_dict())
+    response.headers["Location"] = f"/api/v1/analyses/{analysis.id}"
+    return response, 202
 
 
 @bp.route("/analyses/<int:analysis_id>", methods=["GET"])
 def get_analysis(analysis_id):
     """
-    Get analysis result by ID
+    Get analysis result by ID.
+    While pending/running, progress lists the agents finished so far and agent_results holds their partial output.
+    progress.agent_status marks each finished agent completed, error or timed_out.
     ---
     tags:
       - Analysis
@@ -103,9 +184,153 @@ def get_analysis(analysis_id):
         required: true
     responses:
       200:
-        description: Analysis result
+        description: Analysis status, progress and result
       404:
         description: Not found
     """
     analysis = Analysis.query.get_or_404(analysis_id)
     return jsonify(analysis.to_dict())
+
+
+@bp.route("/analyses/<int:analysis_id>/retry", methods=["POST"])
+def retry_analysis(analysis_id):
+    """
+    Re-run only the agents of a finished analysis that errored or timed out.
+    The parsed document comes from the cache, the new results are merged into agent_results and
+    analysis_{id}.json is rewritten. Returns 202; the analysis is pending again until the retry ends.
+    ---
+    tags:
+      - Analysis
+    parameters:
+      - name: analysis_id
+        in: path
+        type: integer
+        required: true
+      - name: body
+        in: body
+        required: false
+        schema:
+          type: object
+          properties:
+            agents:
+              type: array
+              items: { type: string }
+              description: Retry only these of the failed agents (default all of them)
+    responses:
+      202:
+        description: Retry queued; progress.completed no longer lists the retried agents
+      400:
+        description: No failed agents to retry, or agents names an agent that did not fail
+      404:
+        description: Not found
+      409:
+        description: Analysis is still pending or running
+      429:
+        description: LLM capacity exhausted; retry after the Retry-After header (seconds)
+    """
+    analysis = Analysis.query.get_or_404(analysis_id)
+    if analysis.status not in FINAL_STATUSES:
+        return jsonify({"error": f"Analysis is {analysis.status}; wait for it to finish"}), 409
+
+    failed = failed_agents(analysis)
+    data = request.get_json(silent=True) or {}
+    agents = data.get("agents")
+    if agents is not None:
+        if not isinstance(agents, list) or any(a not in failed for a in agents):
+            return jsonify({"error": f"agents must be a subset of the failed agents: {', '.join(failed)}"}), 400
+        failed = [a for a in failed if a in agents]
+    if not failed:
+        return jsonify({"error": "No failed agents to retry"}), 400
+
+    options = dict(analysis.options or {})
+    priority = options.get("priority") or PRIORITY_ANALYSIS
+    governor = get_governor()
+    if governor.is_overloaded(priority):
+        raise LLMOverloadedError(governor.retry_after(priority))
+
+    analysis.options = {**options, "only_agents": failed}
+    analysis.coalesced_into = None
+    analysis.progress = retry_progress(analysis.progress, failed)
+    analysis.status = "pending"
+    analysis.error_message = None
+    analysis.started_at = None
+    analysis.finished_at = None
+    db.session.commit()
+    enqueue(analysis.id)
+
+    response = jsonify(analysis.to_dict())
+    response.headers["Location"] = f"/api/v1/analyses/{analysis.id}"
+    return response, 202
+
+
+@bp.route("/analyses/<int:analysis_id>/events", methods=["GET"])
+def analysis_events(analysis_id):
+    """
+    Stream analysis progress as Server-Sent Events.
+    Emits "overview" when Alex finishes, "agent_result" as each specialist finishes, and a final
+    "status" event (completed/failed), after which the stream ends. Reconnecting with
+    Last-Event-ID (or ?last_event_id=) replays only the events after that id.
+    ---
+    tags:
+      - Analysis
+    produces:
+      - text/event-stream
+    parameters:
+      - name: analysis_id
+        in: path
+        type: integer
+        required: true
+      - name: Last-Event-ID
+        in: header
+        type: integer
+        required: false
+    responses:
+      200:
+        description: text/event-stream of overview, agent_result and status events
+      404:
+        description: Not found
+    """
+    Analysis.query.get_or_404(analysis_id)
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID") or request.args.get("last_event_id") or 0)
+    except ValueError:
+        last_event_id = 0
+
+    @stream_with_context
+    def generate():
+        sent_id = last_event_id
+        last_status = None
+        last_write = time.monotonic()
+        yield "retry: 2000\n\n"
+        while True:
+            db.session.rollback()  # end the previous read snapshot so new commits are visible
+            analysis = db.session.get(Analysis, analysis_id, populate_existing=True)
+            if analysis is None:
+                return
+            frames = []
+            if analysis.status != last_status and analysis.status not in FINAL_STATUSES:
+                _, event, data = status_event(analysis)
+                frames.append(format_sse(event, data))
+                last_status = analysis.status
+            for event_id, event, data in result_events(analysis):
+                if event_id > sent_id:
+                    frames.append(format_sse(event, data, event_id))
+                    sent_id = event_id
+            if analysis.status in FINAL_STATUSES:
+                event_id, event, data = status_event(analysis)
+                frames.append(format_sse(event, data, event_id))
+                yield "".join(frames)
+                return
+            if frames:
+                yield "".join(frames)
+                last_write = time.monotonic()
+            elif time.monotonic() - last_write >= EVENTS_KEEPALIVE_SECONDS:
+                yield ": keepalive\n\n"
+                last_write = time.monotonic()
+            wait_for_update(EVENTS_POLL_INTERVAL)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,7 +1,8 @@
 """Conversations API."""
 from flask import Blueprint, jsonify, request
 
-from app.models import Conversation, Project, db
+from app.models import Conversation, Message, Project, db
+from app.services.activity import conversations_changed
 
 bp = Blueprint("conversations", __name__)
 
@@ -20,7 +21,18 @@ def list_conversations(project_id):
         required: true
     responses:
       200:
-        description: List of conversations
+        description: List of conversations, most recently active first
+        schema:
+          type: array
+          items:
+            type: object
+            properties:
+              id: { type: integer }
+              title: { type: string }
+              updated_at: { type: string }
+              message_count: { type: integer }
+              last_message_at: { type: string }
+              last_message_preview: { type: string, description: "First 200 characters of the newest message" }
       404:
         description: Project not found
     """
@@ -62,6 +74,7 @@ def create_conversation(project_id):
     title = data.get("title", "New chat")
     conv = Conversation(project_id=project_id, title=title.strip() or "New chat")
     db.session.add(conv)
+    conversations_changed(project_id, 1)
     db.session.commit()
     return jsonify(conv.to_dict()), 201
 
@@ -157,6 +170,9 @@ def delete_conversation(project_id, conversation_id):
     conv = Conversation.query.filter_by(
         id=conversation_id, project_id=project_id
     ).first_or_404()
-    db.session.delete(conv)
+    # Set-based deletes: the conversation's messages are never loaded into the session
+    Message.query.filter_by(conversation_id=conv.id).delete(synchronize_session=False)
+    Conversation.query.filter_by(id=conv.id).delete(synchronize_session=False)
+    conversations_changed(project_id, -1)
     db.session.commit()
     return "", 204
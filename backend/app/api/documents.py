@@ -5,7 +5,9 @@ from pathlib import Path
 from flask import Blueprint, current_app, jsonify, request
 
 from app.models import Conversation, Document, Project, db
+from app.services.activity import documents_changed
 from app.services.config_loader import get_config
+from app.services.document_cache import file_sha256
 from app.services.document_parser import ALLOWED_EXTENSIONS
 
 bp = Blueprint("documents", __name__)
@@ -120,10 +122,12 @@ def upload_document(project_id):
         conversation_id=conversation_id,
         filename=file.filename,
         file_path=str(file_path),
+        content_hash=file_sha256(str(file_path)),
         ai_task=ai_task,
         notes=notes,
     )
     db.session.add(doc)
+    documents_changed(project_id, 1)
     db.session.commit()
     return jsonify(doc.to_dict()), 201
 
@@ -158,5 +162,6 @@ def delete_document(project_id, document_id):
         file_path.unlink(missing_ok=True)
 
     db.session.delete(doc)
+    documents_changed(project_id, -1)
     db.session.commit()
     return "", 204
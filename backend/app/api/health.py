@@ -2,7 +2,12 @@
 from flask import Blueprint, jsonify
 from sqlalchemy import text
 
+from app.agents.registry import get_registry
+from app.db_engine import pool_stats
+from app.db_shards import shard_stats
 from app.models import db
+from app.services import agent_router, chat_history, document_cache, hedging, llm_cache, project_purger
+from app.services.gemini_client import get_governor
 
 bp = Blueprint("health", __name__)
 
@@ -37,3 +42,61 @@ def health():
         "version": VERSION,
         "database": "connected" if db_ok else "disconnected",
     })
+
+
+@bp.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Cache and queue counters
+    ---
+    tags:
+      - Health
+    responses:
+      200:
+        description: Runtime counters per component
+        schema:
+          type: object
+          properties:
+            document_cache:
+              type: object
+              description: Parsed document text cache (hits, misses, evictions, entries, bytes, max_bytes)
+            llm_cache:
+              type: object
+              description: LLM response cache (hits, misses, tiers)
+            llm_governor:
+              type: object
+              description: Model call governor (in_flight, queue_depth, concurrency_limit, throttled, rejected, ...)
+            agent_router:
+              type: object
+              description: Chat routing (requests, cache_hits, local, llm_fallback, fallback_rate)
+            agent_registry:
+              type: object
+              description: Compiled agent prompts (reloads, files_read, files, prompt_version)
+            llm_hedging:
+              type: object
+              description: Hedged analysis calls (calls, hedged, hedge_wins)
+            db_pools:
+              type: object
+              description: SQLAlchemy pools (primary and sqlite_read) with checked_out, idle, overflow, size
+            db_shards:
+              type: object
+              description: Per-project SQLite shards (enabled, open)
+            project_purger:
+              type: object
+              description: Background removal of deleted projects (projects_purged, rows_deleted, errors)
+            chat_history:
+              type: object
+              description: Rolling chat summaries (updates, messages_summarized, errors, running)
+    """
+    return jsonify({
+        "document_cache": document_cache.get_stats(),
+        "llm_cache": llm_cache.get_stats(),
+        "llm_governor": get_governor().stats(),
+        "llm_hedging": hedging.get_stats(),
+        "agent_registry": get_registry().stats(),
+        "agent_router": agent_router.get_stats(),
+        "chat_history": chat_history.get_stats(),
+        "db_pools": pool_stats(db.engines),
+        "db_shards": shard_stats(),
+        "project_purger": project_purger.get_stats(),
+    })
@@ -1,14 +1,23 @@
 """Messages API."""
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 
 from app.models import Conversation, Message, Project, db
+from app.services.activity import message_completed, messages_added, recount_messages
+from app.services.chat_history import schedule_summary_update
 from app.services.content_normalizer import normalize_user_content
-from app.services.conversation_agent import get_agent_reply, get_conversation_bot
+from app.services.analysis_events import format_sse
+from app.services.conversation_agent import get_agent_reply, get_conversation_bot, stream_agent_reply
 from app.services.export_detector import detect_export_format
 from app.services.export_service import EXPORT_EXT, save_export_to_project
+from app.services.idempotency import idempotent
+from app.services.gemini_client import get_governor
+from app.services.llm_governor import PRIORITY_CHAT, LLMOverloadedError
 
 bp = Blueprint("messages", __name__)
 
+MAX_PAGE_SIZE = 200
+HAS_MORE_HEADER = "X-Has-More"
+
 
 def _message_with_bot(msg: Message) -> dict:
     """
@@ -24,7 +33,14 @@ def _message_with_bot(msg: Message) -> dict:
 @bp.route("/<int:project_id>/conversations/<int:conversation_id>/messages", methods=["GET"])
 def list_messages(project_id, conversation_id):
     """
-    List messages in a conversation
+    List messages in a conversation (oldest first)
+    Without query parameters, every message is returned. With any of limit, before_id,
+    after_id or since, one page is returned (keyset on message id) and the X-Has-More
+    header tells whether more messages lie beyond it:
+    - limit only: the newest `limit` messages
+    - before_id: the `limit` messages just before that id (scroll back)
+    - after_id / since: messages after that id, oldest first (incremental fetch after the
+      last message the client has; use the id before a pending reply to pick up its completion)
     ---
     tags:
       - Messages
@@ -37,25 +53,87 @@ def list_messages(project_id, conversation_id):
         in: path
         type: integer
         required: true
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size (default and maximum 200)
+      - name: before_id
+        in: query
+        type: integer
+        required: false
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+      - name: since
+        in: query
+        type: integer
+        required: false
+        description: Same as after_id
     responses:
       200:
-        description: List of messages
+        description: List of messages; paginated requests set the X-Has-More header (true/false)
+      400:
+        description: limit or before_id is not a positive integer, or after_id/since is negative
       404:
         description: Conversation not found
     """
     conv = Conversation.query.filter_by(
         id=conversation_id, project_id=project_id
     ).first_or_404()
-    msgs = Message.query.filter_by(conversation_id=conv.id).order_by(Message.created_at.asc()).all()
-    return jsonify([_message_with_bot(m) for m in msgs])
+    try:
+        limit = _int_arg("limit", minimum=1)
+        before_id = _int_arg("before_id", minimum=1)
+        after_id = _int_arg("after_id", minimum=0)
+        if after_id is None:
+            after_id = _int_arg("since", minimum=0)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = Message.query.filter(Message.conversation_id == conv.id)
+    if limit is None and before_id is None and after_id is None:
+        msgs = query.order_by(Message.id.asc()).all()
+        return jsonify([_message_with_bot(m) for m in msgs])
+
+    limit = min(limit or MAX_PAGE_SIZE, MAX_PAGE_SIZE)
+    if before_id is not None:
+        query = query.filter(Message.id < before_id)
+    if after_id is not None:
+        msgs = query.filter(Message.id > after_id).order_by(Message.id.asc()).limit(limit + 1).all()
+        has_more = len(msgs) > limit
+        msgs = msgs[:limit]
+    else:
+        msgs = query.order_by(Message.id.desc()).limit(limit + 1).all()
+        has_more = len(msgs) > limit
+        msgs = msgs[:limit][::-1]
+    response = jsonify([_message_with_bot(m) for m in msgs])
+    response.headers[HAS_MORE_HEADER] = "true" if has_more else "false"
+    return response
+
+
+def _int_arg(name: str, minimum: int) -> int | None:
+    value = request.args.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        number = minimum - 1
+    if number < minimum:
+        raise ValueError(f"{name} must be an integer >= {minimum}")
+    return number
 
 
 @bp.route("/<int:project_id>/conversations/<int:conversation_id>/messages", methods=["POST"])
+@idempotent
 def create_message(project_id, conversation_id):
     """
     Add a message to a conversation.
     When role is "user", the BA agent is triggered: an assistant reply is generated
     (using conversation history), saved, and returned along with the user message.
+    The user message and a "pending" assistant message are committed before the model is
+    called; the reply is stored (status "complete") in a separate short transaction.
     ---
     tags:
       - Messages
@@ -68,6 +146,19 @@ def create_message(project_id, conversation_id):
         in: path
         type: integer
         required: true
+      - name: stream
+        in: query
+        type: string
+        required: false
+        description: |
+          1 = stream the reply as Server-Sent Events (user role only): "message" (saved user
+          message, bot, agents_involved), "token" ({text}) per chunk, then "done" with the
+          usual payload once the assistant message is saved, or "error"
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retrying with the same key and body returns the first response instead of calling the agent again
       - name: body
         in: body
         required: true
@@ -76,6 +167,10 @@ def create_message(project_id, conversation_id):
           required: [role, content]
           properties:
             role: { type: string, enum: [user, assistant, system] }
+            use_cache: { type: boolean, default: true, description: Set false to bypass the LLM response cache }
+            single_pass:
+              type: boolean
+              description: Route and reply in one model call (default chat.single_pass from config)
             content:
               description: |
                 Plain string or structured (GPT-style). Structured format:
@@ -96,12 +191,20 @@ def create_message(project_id, conversation_id):
                 - "We need to validate the login requirements."
                 - "Stakeholders: product owner, dev team."
     responses:
+      200:
+        description: With ?stream=1, text/event-stream of message, token and done (or error) events
       201:
         description: Created message; if role was user, includes assistant_message and bot (name, avatar, role)
       400:
         description: role and content required; role must be user/assistant/system
       404:
         description: Conversation not found
+      409:
+        description: A request with the same Idempotency-Key is still in progress
+      422:
+        description: Idempotency-Key was already used with a different body
+      429:
+        description: LLM capacity exhausted; retry after the Retry-After header (seconds)
       500:
         description: Agent (Gemini) error when role is user
     """
@@ -126,43 +229,142 @@ def create_message(project_id, conversation_id):
         role=role,
         content=content,
     )
-    db.session.add(msg)
+    if role != "user":
+        db.session.add(msg)
+        messages_added(conv.id, project_id, 1, content)
+        db.session.commit()
+        return jsonify({"message": _message_with_bot(msg)}), 201
 
-    if role == "user":
-        try:
-            reply_text, selected_agent_ids = get_agent_reply(conv.id, content)
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({"error": f"Agent failed: {str(e)}"}), 500
-        primary_agent_id = selected_agent_ids[0] if selected_agent_ids else None
-        assistant_msg = Message(
-            conversation_id=conv.id,
-            role="assistant",
-            content=reply_text,
-            agent_id=primary_agent_id,
-        )
-        db.session.add(assistant_msg)
+    governor = get_governor()
+    if governor.is_overloaded(PRIORITY_CHAT):
+        raise LLMOverloadedError(governor.retry_after(PRIORITY_CHAT))
 
+    # Two-phase write: commit the user message and a pending reply now, call the agent with
+    # no transaction open, then fill in the reply in a short transaction of its own
+    reply = Message(conversation_id=conv.id, role="assistant", content="", status="pending")
+    db.session.add_all([msg, reply])
+    messages_added(conv.id, project_id, 2, content)
     db.session.commit()
+    conversation_id, message_id, reply_id = conv.id, msg.id, reply.id
+    use_cache = data.get("use_cache") is not False
 
-    payload = {"message": _message_with_bot(msg)}
-    if role == "user":
-        payload["assistant_message"] = _message_with_bot(assistant_msg)
-        payload["bot"] = get_conversation_bot(primary_agent_id)
-        payload["agents_involved"] = selected_agent_ids or []
-
-        # If user asked for export with a format, save file and return download link
-        export_format = detect_export_format(content)
-        if export_format and export_format in EXPORT_EXT and reply_text.strip():
-            try:
-                filename = save_export_to_project(project_id, reply_text, export_format)
-                # Relative path; frontend prepends API base for same-origin or proxy
-                payload["export_requested"] = {
-                    "format": export_format,
-                    "download_url": f"/api/v1/projects/{project_id}/exports/{filename}",
-                    "filename": filename,
-                }
-            except Exception:
-                pass  # Do not fail the request if export save fails
+    if request.args.get("stream") in ("1", "true"):
+        return _stream_reply(project_id, conversation_id, msg, reply_id, content, use_cache)
+
+    try:
+        single_pass = data.get("single_pass")
+        reply_text, selected_agent_ids = get_agent_reply(
+            conversation_id,
+            content,
+            use_cache=use_cache,
+            single_pass=single_pass if isinstance(single_pass, bool) else None,
+        )
+    except LLMOverloadedError:
+        _discard_turn(conversation_id, message_id, reply_id)
+        raise
+    except Exception as e:
+        _discard_turn(conversation_id, message_id, reply_id)
+        return jsonify({"error": f"Agent failed: {str(e)}"}), 500
+    assistant_msg = _complete_reply(project_id, reply_id, reply_text, selected_agent_ids)
+    schedule_summary_update(conversation_id)
 
+    payload = {"message": _message_with_bot(msg)}
+    payload.update(_reply_payload(project_id, content, assistant_msg, selected_agent_ids))
     return jsonify(payload), 201
+
+
+def _complete_reply(project_id: int, reply_id: int, reply_text: str, selected_agent_ids: list) -> Message:
+    """Phase two: store the generated reply on its pending message."""
+    reply = db.session.get(Message, reply_id)
+    reply.content = reply_text
+    reply.agent_id = selected_agent_ids[0] if selected_agent_ids else None
+    reply.status = "complete"
+    message_completed(reply.conversation_id, project_id, reply_text)
+    db.session.commit()
+    return reply
+
+
+def _discard_turn(conversation_id: int, message_id: int, reply_id: int) -> None:
+    """Remove the user message and its pending reply when the agent failed (the client retries)."""
+    db.session.rollback()
+    Message.query.filter(Message.id.in_((message_id, reply_id))).delete(synchronize_session=False)
+    recount_messages(conversation_id)
+    db.session.commit()
+
+
+def _reply_payload(project_id: int, content: str, assistant_msg: Message, selected_agent_ids: list) -> dict:
+    """assistant_message, bot, agents_involved and (if the user asked for a file) export_requested."""
+    payload = {
+        "assistant_message": _message_with_bot(assistant_msg),
+        "bot": get_conversation_bot(assistant_msg.agent_id),
+        "agents_involved": selected_agent_ids or [],
+    }
+    # If user asked for export with a format, save file and return download link
+    reply_text = assistant_msg.content or ""
+    export_format = detect_export_format(content)
+    if export_format and export_format in EXPORT_EXT and reply_text.strip():
+        try:
+            filename = save_export_to_project(project_id, reply_text, export_format)
+            # Relative path; frontend prepends API base for same-origin or proxy
+            payload["export_requested"] = {
+                "format": export_format,
+                "download_url": f"/api/v1/projects/{project_id}/exports/{filename}",
+                "filename": filename,
+            }
+        except Exception:
+            pass  # Do not fail the request if export save fails
+    return payload
+
+
+def _stream_reply(project_id: int, conversation_id: int, msg: Message, reply_id: int, content: str, use_cache: bool):
+    """
+    SSE response for POST .../messages?stream=1: "message" (the saved user message and the
+    agents answering), "token" per reply chunk, then "done" with the usual payload once the
+    assistant message is saved, or "error" (the user message is then removed again). A client
+    that disconnects before "done" has its turn removed the same way.
+    """
+    message_id = msg.id
+    try:
+        selected_agent_ids, chunks = stream_agent_reply(conversation_id, content, use_cache=use_cache)
+    except LLMOverloadedError:
+        _discard_turn(conversation_id, message_id, reply_id)
+        raise
+    except Exception as e:
+        _discard_turn(conversation_id, message_id, reply_id)
+        return jsonify({"error": f"Agent failed: {str(e)}"}), 500
+    start = {
+        "message": _message_with_bot(msg),
+        "bot": get_conversation_bot(selected_agent_ids[0] if selected_agent_ids else None),
+        "agents_involved": selected_agent_ids or [],
+    }
+    db.session.rollback()  # no transaction open while the reply streams
+
+    @stream_with_context
+    def generate():
+        parts = []
+        try:
+            yield format_sse("message", start)
+            for text in chunks:
+                parts.append(text)
+                yield format_sse("token", {"text": text})
+        except GeneratorExit:
+            # Client disconnected mid-reply: stop the model stream (frees its governor slot)
+            # and drop the turn as on an error, so no empty pending reply is left behind
+            chunks.close()
+            _discard_turn(conversation_id, message_id, reply_id)
+            raise
+        except Exception as e:
+            _discard_turn(conversation_id, message_id, reply_id)
+            yield format_sse("error", {"error": f"Agent failed: {str(e)}"})
+            return
+        assistant_msg = _complete_reply(project_id, reply_id, "".join(parts), selected_agent_ids)
+        schedule_summary_update(conversation_id)
+        payload = {"message": start["message"]}
+        payload.update(_reply_payload(project_id, content, assistant_msg, selected_agent_ids))
+        yield format_sse("done", payload)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,4 +1,5 @@
 """Projects API."""
+from datetime import datetime
 from pathlib import Path
 
 from flask import Blueprint, jsonify, request, send_file
@@ -6,6 +7,7 @@ from flask import Blueprint, jsonify, request, send_file
 from app.models import Project, db
 from app.services.config_loader import get_config
 from app.services.export_service import EXPORT_MIME, is_export_filename_safe
+from app.services.project_purger import schedule_purge
 
 bp = Blueprint("projects", __name__)
 
@@ -29,8 +31,11 @@ def list_projects():
               name: { type: string }
               created_at: { type: string }
               updated_at: { type: string }
+              conversation_count: { type: integer }
+              document_count: { type: integer }
+              last_activity_at: { type: string }
     """
-    projects = Project.query.order_by(Project.updated_at.desc()).all()
+    projects = Project.query.filter(Project.deleted_at.is_(None)).order_by(Project.updated_at.desc()).all()
     return jsonify([p.to_dict() for p in projects])
 
 
@@ -179,7 +184,8 @@ def download_export(project_id, filename):
 @bp.route("/<int:project_id>", methods=["DELETE"])
 def delete_project(project_id):
     """
-    Delete project and its data folder (documents + exports under data/documents/<project_id>).
+    Delete project. It disappears at once; its conversations, messages, documents, analyses
+    and folders (data/documents/<project_id>, analysis_output/<project_id>) are removed in the background.
     ---
     tags:
       - Projects
@@ -195,10 +201,7 @@ def delete_project(project_id):
         description: Not found
     """
     project = Project.query.get_or_404(project_id)
-    folder = _get_project_documents_path(project_id)
-    if folder.is_dir():
-        import shutil
-        shutil.rmtree(folder, ignore_errors=True)
-    db.session.delete(project)
+    project.deleted_at = datetime.utcnow()
     db.session.commit()
+    schedule_purge()
     return "", 204
@@ -30,6 +30,18 @@ def _init_db_uri():
     return f"sqlite:///{Path(db_path) / 'baws.db'}"
 
 
+def _init_analysis_workers():
+    env = os.getenv("ANALYSIS_WORKERS")
+    if env:
+        return int(env)
+    try:
+        from app.services.config_loader import get_config
+
+        return int((get_config().get("analysis_queue") or {}).get("workers", 2))
+    except Exception:
+        return 2
+
+
 class Config:
     """Flask configuration."""
 
@@ -38,3 +50,5 @@ class Config:
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
     SQLALCHEMY_DATABASE_URI = _init_db_uri()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Background threads that run queued analyses (0 = do not start workers in this process)
+    ANALYSIS_WORKERS = _init_analysis_workers()
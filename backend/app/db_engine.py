@@ -0,0 +1,136 @@
+"""
+SQLite engine profile.
+
+Every connection gets the pragmas from the `sqlite` section of config.yaml when it is opened:
+WAL journaling (readers and the writer no longer block each other), synchronous=NORMAL
+(safe with WAL, one fsync per checkpoint instead of per commit), a busy timeout so a writer
+waits for the lock instead of failing with "database is locked", and a larger page cache
+and memory-mapped I/O for reads.
+
+With read_pool_enabled, a second engine (bind READ_BIND) with its own pool and
+PRAGMA query_only serves SELECTs issued while handling GET/HEAD requests; writes, flushes
+and background threads always use the primary engine.
+"""
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+READ_BIND = "sqlite_read"
+READ_METHODS = ("GET", "HEAD")
+
+DEFAULTS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout_ms": 5000,
+    "cache_size_kib": 65536,
+    "mmap_size_mb": 256,
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "read_pool_enabled": True,
+    "read_pool_size": 10,
+    "shard_per_project": False,
+}
+
+
+def get_sqlite_settings() -> dict:
+    from app.services.config_loader import get_config
+
+    cfg = get_config().get("sqlite") or {}
+    return {**DEFAULTS, **{k: cfg[k] for k in DEFAULTS if k in cfg}}
+
+
+def _is_sqlite_file(uri: str) -> bool:
+    return uri.startswith("sqlite:///") and ":memory:" not in uri
+
+
+def engine_options(settings: dict) -> dict:
+    """create_engine() keyword arguments (pool sizes, connect timeout) for a SQLite file."""
+    return {
+        "pool_size": int(settings["pool_size"]),
+        "max_overflow": int(settings["max_overflow"]),
+        "pool_timeout": float(settings["pool_timeout"]),
+        "connect_args": {"timeout": int(settings["busy_timeout_ms"]) / 1000, "check_same_thread": False},
+    }
+
+
+def configure_engines(app, settings: dict | None = None) -> None:
+    """Set engine options (and the read bind) on app.config before db.init_app(app)."""
+    uri = app.config.get("SQLALCHEMY_DATABASE_URI") or ""
+    if not _is_sqlite_file(uri):
+        return
+    settings = settings or get_sqlite_settings()
+    options = engine_options(settings)
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", options)
+    if settings["read_pool_enabled"]:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds.setdefault(
+            READ_BIND,
+            {**options, "url": uri, "pool_size": int(settings["read_pool_size"])},
+        )
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def install_pragmas(engines: dict, settings: dict | None = None) -> None:
+    """Register the connect-time pragmas on each SQLite engine (call in an app context)."""
+    settings = settings or get_sqlite_settings()
+    for key, engine in engines.items():
+        if engine.dialect.name != "sqlite" or not _is_sqlite_file(str(engine.url)):
+            continue
+        read_only = key == READ_BIND
+
+        def on_connect(dbapi_connection, _record, read_only=read_only):
+            cursor = dbapi_connection.cursor()
+            if not read_only:
+                cursor.execute(f"PRAGMA journal_mode={settings['journal_mode']}")
+            cursor.execute(f"PRAGMA synchronous={settings['synchronous']}")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings['busy_timeout_ms'])}")
+            cursor.execute(f"PRAGMA cache_size=-{int(settings['cache_size_kib'])}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings['mmap_size_mb']) * 1024 * 1024}")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+            cursor.close()
+
+        event.listen(engine, "connect", on_connect)
+
+
+class RoutingSession(Session):
+    """
+    Session that sends sharded models to their project's database (see app.db_shards) and
+    SELECTs made while serving a GET/HEAD request to the read pool.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and mapper is not None:
+            from app.db_shards import shard_engine
+
+            engine = shard_engine(mapper)
+            if engine is not None:
+                return engine
+        if (
+            bind is None
+            and not self._flushing
+            and isinstance(clause, Select)
+            and has_request_context()
+            and request.method in READ_METHODS
+        ):
+            engine = self._db.engines.get(READ_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def pool_stats(engines: dict) -> dict:
+    """Checked-out / idle connections per engine, for /metrics."""
+    stats = {}
+    for key, engine in engines.items():
+        pool = engine.pool
+        if hasattr(pool, "checkedout"):
+            stats[key or "primary"] = {
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "size": pool.size(),
+            }
+    return stats
@@ -1,31 +1,207 @@
-"""Migration helper - add new columns to existing tables."""
-from sqlalchemy import text
+"""
+Versioned schema migrations.
+
+db.create_all() creates missing tables from the models; MIGRATIONS then bring databases
+created by older versions up to date. Applied steps are recorded in the schema_version
+table, so each startup runs only the steps it has not seen. Steps are idempotent (columns
+are added only when missing, indexes use IF NOT EXISTS): on a database that create_all()
+has just built they change nothing, and a step interrupted midway is simply run again.
+Steps skip tables a database does not have: project shards hold only the sharded tables.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError
 
 from app.models import db
 
+logger = logging.getLogger(__name__)
 
-def migrate_add_conversation_columns(app):
-    """Add conversation_id to documents and analyses if missing (for existing DBs)."""
-    with app.app_context():
-        for table, column in [("documents", "conversation_id"), ("analyses", "conversation_id")]:
-            try:
-                db.session.execute(text(f"SELECT {column} FROM {table} LIMIT 1"))
-            except Exception:
-                try:
-                    db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER"))
-                    db.session.commit()
-                except Exception:
-                    db.session.rollback()
-
-
-def migrate_add_message_agent_id(app):
-    """Add agent_id to messages if missing (for existing DBs)."""
-    with app.app_context():
+SCHEMA_VERSION_DDL = (
+    "CREATE TABLE IF NOT EXISTS schema_version ("
+    "version INTEGER PRIMARY KEY, description VARCHAR(255) NOT NULL, applied_at DATETIME NOT NULL)"
+)
+
+
+def _has_table(conn, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+
+def _add_columns(conn, table: str, columns: list[tuple[str, str]]) -> None:
+    if not _has_table(conn, table):
+        return
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    for column, col_type in columns:
+        if column not in existing:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}"))
+
+
+def _create_indexes(conn, indexes: list[tuple[str, str, tuple]]) -> None:
+    for name, table, columns in indexes:
+        if not _has_table(conn, table):
+            continue
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"))
+
+
+def _conversation_columns(conn):
+    _add_columns(conn, "documents", [("conversation_id", "INTEGER")])
+    _add_columns(conn, "analyses", [("conversation_id", "INTEGER")])
+
+
+def _message_agent_id(conn):
+    _add_columns(conn, "messages", [("agent_id", "VARCHAR(32)")])
+
+
+def _analysis_job_columns(conn):
+    _add_columns(
+        conn,
+        "analyses",
+        [("progress", "JSON"), ("options", "JSON"), ("started_at", "DATETIME"), ("finished_at", "DATETIME")],
+    )
+
+
+def _document_content_hash(conn):
+    _add_columns(conn, "documents", [("content_hash", "VARCHAR(64)")])
+
+
+def _analysis_coalesce_columns(conn):
+    _add_columns(conn, "analyses", [("coalesce_key", "VARCHAR(64)"), ("coalesced_into", "INTEGER")])
+    _create_indexes(
+        conn,
+        [
+            ("ix_analyses_coalesce_key", "analyses", ("coalesce_key",)),
+            ("ix_analyses_coalesced_into", "analyses", ("coalesced_into",)),
+        ],
+    )
+
+
+def _conversation_summary(conn):
+    _add_columns(conn, "conversations", [("summary", "TEXT"), ("summary_through_id", "INTEGER")])
+
+
+def _message_status(conn):
+    _add_columns(conn, "messages", [("status", "VARCHAR(16) NOT NULL DEFAULT 'complete'")])
+
+
+MESSAGE_KEYSET_INDEXES = [("ix_messages_conversation_id_id", "messages", ("conversation_id", "id"))]
+
+# Foreign keys (joins, cascades) and the ORDER BY of each list endpoint
+LIST_INDEXES = [
+    ("ix_projects_updated_at", "projects", ("updated_at",)),
+    ("ix_conversations_project_id_updated_at", "conversations", ("project_id", "updated_at")),
+    ("ix_documents_project_id_created_at", "documents", ("project_id", "created_at")),
+    ("ix_documents_conversation_id", "documents", ("conversation_id",)),
+    ("ix_analyses_project_id", "analyses", ("project_id",)),
+    ("ix_analyses_document_id", "analyses", ("document_id",)),
+    ("ix_analyses_conversation_id", "analyses", ("conversation_id",)),
+    ("ix_analyses_status_id", "analyses", ("status", "id")),
+]
+
+
+def _message_keyset_index(conn):
+    _create_indexes(conn, MESSAGE_KEYSET_INDEXES)
+
+
+def _foreign_key_and_list_indexes(conn):
+    _create_indexes(conn, LIST_INDEXES)
+
+
+def _project_soft_delete(conn):
+    _add_columns(conn, "projects", [("deleted_at", "DATETIME")])
+
+
+def _activity_counters(conn):
+    _add_columns(
+        conn,
+        "conversations",
+        [
+            ("message_count", "INTEGER NOT NULL DEFAULT 0"),
+            ("last_message_at", "DATETIME"),
+            ("last_message_preview", "VARCHAR(200)"),
+        ],
+    )
+    _add_columns(
+        conn,
+        "projects",
+        [
+            ("conversation_count", "INTEGER NOT NULL DEFAULT 0"),
+            ("document_count", "INTEGER NOT NULL DEFAULT 0"),
+            ("last_activity_at", "DATETIME"),
+        ],
+    )
+    # Backfill from the existing rows (each subquery uses a conversation_id / project_id index)
+    conn.execute(
+        text(
+            "UPDATE conversations SET "
+            "message_count = (SELECT COUNT(*) FROM messages m WHERE m.conversation_id = conversations.id), "
+            "last_message_at = (SELECT MAX(m.created_at) FROM messages m WHERE m.conversation_id = conversations.id), "
+            "last_message_preview = (SELECT substr(m.content, 1, 200) FROM messages m "
+            "WHERE m.conversation_id = conversations.id ORDER BY m.id DESC LIMIT 1)"
+        )
+    )
+    if not _has_table(conn, "projects"):
+        return
+    chats = (
+        "(SELECT MAX(COALESCE(c.last_message_at, c.created_at)) FROM conversations c "
+        "WHERE c.project_id = projects.id)"
+    )
+    docs = "(SELECT MAX(d.created_at) FROM documents d WHERE d.project_id = projects.id)"
+    conn.execute(
+        text(
+            "UPDATE projects SET "
+            "conversation_count = (SELECT COUNT(*) FROM conversations c WHERE c.project_id = projects.id), "
+            "document_count = (SELECT COUNT(*) FROM documents d WHERE d.project_id = projects.id), "
+            f"last_activity_at = MAX(COALESCE({chats}, {docs}), COALESCE({docs}, {chats}))"
+        )
+    )
+
+
+def _analysis_lease_columns(conn):
+    _add_columns(conn, "analyses", [("worker_id", "VARCHAR(128)"), ("heartbeat_at", "DATETIME")])
+
+
+# (version, description, step(conn)); append new steps with the next version, never renumber
+MIGRATIONS = [
+    (1, "documents/analyses.conversation_id", _conversation_columns),
+    (2, "messages.agent_id", _message_agent_id),
+    (3, "analyses job queue columns", _analysis_job_columns),
+    (4, "documents.content_hash", _document_content_hash),
+    (5, "analyses single-flight columns", _analysis_coalesce_columns),
+    (6, "conversations rolling summary", _conversation_summary),
+    (7, "messages.status", _message_status),
+    (8, "messages (conversation_id, id) index", _message_keyset_index),
+    (9, "foreign-key and list ordering indexes", _foreign_key_and_list_indexes),
+    (10, "projects.deleted_at", _project_soft_delete),
+    (11, "conversation and project activity counters", _activity_counters),
+    (12, "analyses job lease columns", _analysis_lease_columns),
+]
+
+
+def migrate_engine(engine) -> list[int]:
+    """Apply pending MIGRATIONS to one database, each in its own transaction. Returns the versions applied."""
+    applied = []
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA_VERSION_DDL))
+        done = {row[0] for row in conn.execute(text("SELECT version FROM schema_version"))}
+    for version, description, step in MIGRATIONS:
+        if version in done:
+            continue
         try:
-            db.session.execute(text("SELECT agent_id FROM messages LIMIT 1"))
-        except Exception:
-            try:
-                db.session.execute(text("ALTER TABLE messages ADD COLUMN agent_id VARCHAR(32)"))
-                db.session.commit()
-            except Exception:
-                db.session.rollback()
+            with engine.begin() as conn:
+                step(conn)
+                conn.execute(
+                    text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                    {"v": version, "d": description, "t": datetime.utcnow()},
+                )
+        except IntegrityError:
+            continue  # another process recorded this step first
+        logger.info("Applied schema migration %s to %s: %s", version, engine.url.database, description)
+        applied.append(version)
+    return applied
+
+
+def run_migrations(app) -> list[int]:
+    """Migrate the main database (project shards are migrated when opened, see app.db_shards)."""
+    with app.app_context():
+        return migrate_engine(db.engine)
@@ -0,0 +1,189 @@
+"""
+Per-project SQLite shards.
+
+With sqlite.shard_per_project, each project's conversations, messages, documents and
+analyses live in their own database file, <database dir>/projects/<project_id>.db, so
+writes to unrelated projects no longer queue on one SQLite lock. The main database becomes
+the catalog: projects, idempotency keys and analysis_locations (analysis ids are allocated
+there so they stay unique across shards; /analyses/<id> has no project in its URL).
+
+RoutingSession asks shard_engine() for the engine of a sharded model. The project is taken
+from project_scope() in background threads, or inside a request from the project_id (or
+analysis_id) URL argument, which select_request_shard() stores on g. A shard is created
+(create_all + migrations) the first time its project is used; purging a deleted project
+drops the file. Work that spans projects (job workers, startup recovery) loops over
+project_shards(), the projects that already have a shard file, or [None] (the main
+database) when sharding is off.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from flask import abort, current_app, g, has_app_context
+from sqlalchemy import create_engine, inspect, insert, select, text
+from werkzeug.exceptions import NotFound
+
+from app.db_engine import _is_sqlite_file, engine_options, get_sqlite_settings, install_pragmas
+
+SHARDED_TABLES = frozenset({"conversations", "messages", "documents", "analyses"})
+SHARDS_DIR = "projects"
+
+_engines: dict = {}  # shard file path -> Engine
+_lock = threading.Lock()
+_scope: ContextVar[int | None] = ContextVar("project_shard", default=None)
+
+
+def configure_shards(app, settings: dict | None = None) -> None:
+    """Enable sharding on app.config (SQLITE_SHARDS) and route requests by their project."""
+    settings = settings or get_sqlite_settings()
+    uri = app.config.get("SQLALCHEMY_DATABASE_URI") or ""
+    app.config.setdefault("SQLITE_SHARDS", bool(settings["shard_per_project"]) and _is_sqlite_file(uri))
+    if app.config["SQLITE_SHARDS"]:
+        app.url_value_preprocessor(select_request_shard)
+
+
+def sharding_enabled() -> bool:
+    return has_app_context() and bool(current_app.config.get("SQLITE_SHARDS"))
+
+
+@contextmanager
+def project_scope(project_id: int | None):
+    """Run the block against project_id's shard (None: leave the current selection)."""
+    if project_id is None:
+        yield
+        return
+    token = _scope.set(project_id)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_project_id() -> int | None:
+    project_id = _scope.get()
+    if project_id is None and has_app_context():
+        project_id = g.get("shard_project_id")
+    return project_id
+
+
+def select_request_shard(endpoint, values) -> None:
+    """url_value_preprocessor: pick the shard from the project_id or analysis_id URL argument."""
+    values = values or {}
+    if "project_id" in values:
+        g.shard_project_id = values["project_id"]
+    elif "analysis_id" in values:
+        g.shard_project_id = locate_analysis(values["analysis_id"])
+        if g.shard_project_id is None:
+            abort(404)
+
+
+def shard_path(project_id: int) -> Path:
+    from app.models import db
+
+    return Path(db.engine.url.database).parent / SHARDS_DIR / f"{int(project_id)}.db"
+
+
+def _project_exists(project_id: int) -> bool:
+    from app.models import db
+
+    with db.engine.connect() as conn:
+        return (
+            conn.execute(
+                text("SELECT 1 FROM projects WHERE id = :id AND deleted_at IS NULL"), {"id": project_id}
+            ).first()
+            is not None
+        )
+
+
+def get_shard_engine(project_id: int):
+    """Engine for a project's shard, creating and migrating the file on first use."""
+    path = shard_path(project_id)
+    key = str(path)
+    engine = _engines.get(key)
+    if engine is not None:
+        return engine
+    with _lock:
+        engine = _engines.get(key)
+        if engine is None:
+            if not path.exists() and not _project_exists(project_id):
+                raise NotFound(f"Project {project_id} not found")
+            from app.db_migrate import migrate_engine
+            from app.models import db
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            settings = get_sqlite_settings()
+            engine = create_engine(f"sqlite:///{path}", **engine_options(settings))
+            install_pragmas({key: engine}, settings)
+            db.metadata.create_all(engine, tables=[db.metadata.tables[name] for name in sorted(SHARDED_TABLES)])
+            migrate_engine(engine)
+            _engines[key] = engine
+    return engine
+
+
+def shard_engine(mapper):
+    """Engine of the current project's shard if mapper's table is sharded, else None."""
+    if not sharding_enabled() or inspect(mapper).local_table.name not in SHARDED_TABLES:
+        return None
+    project_id = current_project_id()
+    if project_id is None:
+        raise RuntimeError("No project selected for a sharded table (use project_scope)")
+    return get_shard_engine(project_id)
+
+
+def project_shards() -> list:
+    """
+    Projects to visit for work spanning all projects; [None] (the main database) unless sharded.
+    Only projects whose shard file exists are listed: scanning never creates a shard.
+    """
+    if not sharding_enabled():
+        return [None]
+    from app.models import Project, db
+
+    shards_dir = Path(db.engine.url.database).parent / SHARDS_DIR
+    existing = {int(p.stem) for p in shards_dir.glob("*.db") if p.stem.isdigit()}
+    if not existing:
+        return []
+    with db.engine.connect() as conn:
+        return list(
+            conn.execute(
+                select(Project.id)
+                .where(Project.id.in_(existing), Project.deleted_at.is_(None))
+                .order_by(Project.id)
+            ).scalars()
+        )
+
+
+def allocate_analysis_id(project_id: int) -> int | None:
+    """Reserve a catalog-wide analysis id for a new analysis in a sharded project (None: not sharded)."""
+    if not sharding_enabled():
+        return None
+    from app.models import AnalysisLocation, db
+
+    with db.engine.begin() as conn:
+        return conn.execute(insert(AnalysisLocation).values(project_id=project_id)).inserted_primary_key[0]
+
+
+def locate_analysis(analysis_id: int) -> int | None:
+    from app.models import AnalysisLocation, db
+
+    with db.engine.connect() as conn:
+        return conn.execute(
+            select(AnalysisLocation.project_id).where(AnalysisLocation.id == analysis_id)
+        ).scalar()
+
+
+def drop_shard(project_id: int) -> None:
+    """Close a project's shard and delete its file (with the WAL and shared-memory files)."""
+    path = shard_path(project_id)
+    with _lock:
+        engine = _engines.pop(str(path), None)
+        if engine is not None:
+            engine.dispose()
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+
+
+def shard_stats() -> dict:
+    """Open shard engines, for /metrics."""
+    return {"enabled": sharding_enabled(), "open": len(_engines)}
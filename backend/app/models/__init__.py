@@ -1,7 +1,9 @@
 """SQLAlchemy models and db instance."""
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from app.db_engine import RoutingSession
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 # Import after db to register models (order matters for FK: Conversation before Document/Analysis)
 from app.models.project import Project  # noqa: E402
@@ -9,5 +11,7 @@ from app.models.conversation import Conversation  # noqa: E402
 from app.models.message import Message  # noqa: E402
 from app.models.document import Document  # noqa: E402
 from app.models.analysis import Analysis  # noqa: E402
+from app.models.idempotency_key import IdempotencyKey  # noqa: E402
+from app.models.analysis_location import AnalysisLocation  # noqa: E402
 
-__all__ = ["db", "Project", "Conversation", "Message", "Document", "Analysis"]
+__all__ = ["db", "Project", "Conversation", "Message", "Document", "Analysis", "IdempotencyKey", "AnalysisLocation"]
@@ -8,15 +8,28 @@ class Analysis(db.Model):
     """Analysis result entity."""
 
     __tablename__ = "analyses"
+    # Workers claim the oldest pending job: WHERE status = 'pending' ORDER BY id
+    __table_args__ = (db.Index("ix_analyses_status_id", "status", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey("projects.id"), nullable=False)
-    document_id = db.Column(db.Integer, db.ForeignKey("documents.id"), nullable=False)
-    conversation_id = db.Column(db.Integer, db.ForeignKey("conversations.id"), nullable=True)
+    project_id = db.Column(db.Integer, db.ForeignKey("projects.id"), nullable=False, index=True)
+    document_id = db.Column(db.Integer, db.ForeignKey("documents.id"), nullable=False, index=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey("conversations.id"), nullable=True, index=True)
     status = db.Column(db.String(32), default="pending")  # pending, running, completed, failed
     agent_results = db.Column(db.JSON, nullable=True)
     error_message = db.Column(db.Text, nullable=True)
+    progress = db.Column(db.JSON, nullable=True)  # {"completed": [agent, ...], "total": n}
+    options = db.Column(db.JSON, nullable=True)  # run options from the request, e.g. {"use_cache": false}
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Single-flight: hash of (document content, prompt versions, mode); rows sharing an in-flight
+    # key follow the leader run (coalesced_into) instead of running the agents again
+    coalesce_key = db.Column(db.String(64), nullable=True, index=True)
+    coalesced_into = db.Column(db.Integer, nullable=True, index=True)
+    # Job lease: process that claimed the running job and when it last renewed the claim
+    worker_id = db.Column(db.String(128), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
 
     project = db.relationship("Project", back_populates="analyses")
     document = db.relationship("Document", back_populates="analyses")
@@ -30,5 +43,10 @@ class Analysis(db.Model):
             "status": self.status,
             "agent_results": self.agent_results,
             "error_message": self.error_message,
+            "progress": self.progress,
+            "options": self.options,
             "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "coalesced_into": self.coalesced_into,
         }
@@ -0,0 +1,15 @@
+"""Analysis location model (catalog of sharded storage)."""
+from app.models import db
+
+
+class AnalysisLocation(db.Model):
+    """
+    Which project shard stores an analysis. Only used with sqlite.shard_per_project: the
+    row's id is the analysis id, so ids stay unique across shards and /analyses/<id> can be
+    routed without a project in the URL.
+    """
+
+    __tablename__ = "analysis_locations"
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(db.Integer, nullable=False, index=True)
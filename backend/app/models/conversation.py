@@ -8,12 +8,20 @@ class Conversation(db.Model):
     """Conversation entity - each project has one or more conversations."""
 
     __tablename__ = "conversations"
+    __table_args__ = (db.Index("ix_conversations_project_id_updated_at", "project_id", "updated_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey("projects.id"), nullable=False)
     title = db.Column(db.String(255), nullable=False, default="New chat")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Rolling summary of messages up to summary_through_id (see services/chat_history.py)
+    summary = db.Column(db.Text, nullable=True)
+    summary_through_id = db.Column(db.Integer, nullable=True)
+    # Maintained on write by services/activity.py so the list needs no per-row queries
+    message_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_message_at = db.Column(db.DateTime, nullable=True)
+    last_message_preview = db.Column(db.String(200), nullable=True)
 
     project = db.relationship("Project", back_populates="conversations")
     messages = db.relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
@@ -25,4 +33,7 @@ class Conversation(db.Model):
             "title": self.title,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "message_count": self.message_count or 0,
+            "last_message_at": self.last_message_at.isoformat() if self.last_message_at else None,
+            "last_message_preview": self.last_message_preview,
         }
@@ -8,12 +8,14 @@ class Document(db.Model):
     """Document entity."""
 
     __tablename__ = "documents"
+    __table_args__ = (db.Index("ix_documents_project_id_created_at", "project_id", "created_at"),)
 
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey("projects.id"), nullable=False)
-    conversation_id = db.Column(db.Integer, db.ForeignKey("conversations.id"), nullable=True)
+    conversation_id = db.Column(db.Integer, db.ForeignKey("conversations.id"), nullable=True, index=True)
     filename = db.Column(db.String(512), nullable=False)
     file_path = db.Column(db.String(1024), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=True)  # SHA-256 of file contents (parsed text cache key)
     ai_task = db.Column(db.Text, nullable=True)
     notes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -28,6 +30,7 @@ class Document(db.Model):
             "conversation_id": self.conversation_id,
             "filename": self.filename,
             "file_path": self.file_path,
+            "content_hash": self.content_hash,
             "ai_task": self.ai_task,
             "notes": self.notes,
             "created_at": self.created_at.isoformat() if self.created_at else None,
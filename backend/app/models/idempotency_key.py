@@ -0,0 +1,21 @@
+"""Idempotency key model."""
+from datetime import datetime
+
+from app.models import db
+
+
+class IdempotencyKey(db.Model):
+    """Stored response of a POST sent with an Idempotency-Key header (replayed on client retries)."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (db.UniqueConstraint("scope", "key", name="uq_idempotency_scope_key"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(512), nullable=False)  # "POST /api/v1/..." the key was used on
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the request body
+    status = db.Column(db.String(32), nullable=False, default="in_progress")  # in_progress, completed
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    response_location = db.Column(db.String(1024), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
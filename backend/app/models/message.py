@@ -8,6 +8,8 @@ class Message(db.Model):
     """Message entity - messages within a conversation."""
 
     __tablename__ = "messages"
+    # Keyset pagination: WHERE conversation_id = ? AND id < / > cursor ORDER BY id
+    __table_args__ = (db.Index("ix_messages_conversation_id_id", "conversation_id", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey("conversations.id"), nullable=False)
@@ -15,6 +17,8 @@ class Message(db.Model):
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     agent_id = db.Column(db.String(32), nullable=True)  # for assistant: which bot replied (paul, emma, sarah, david, alex)
+    # complete; pending = assistant reply still being generated; failed = generation was interrupted
+    status = db.Column(db.String(16), nullable=False, default="complete", server_default="complete")
 
     conversation = db.relationship("Conversation", back_populates="messages")
 
@@ -26,4 +30,5 @@ class Message(db.Model):
             "content": self.content,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "agent_id": self.agent_id,
+            "status": self.status,
         }
@@ -12,7 +12,12 @@ class Project(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    deleted_at = db.Column(db.DateTime, nullable=True)  # soft-deleted, waiting for the purger
+    # Maintained on write by services/activity.py so the list needs no per-row queries
+    conversation_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    document_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    last_activity_at = db.Column(db.DateTime, nullable=True)
 
     conversations = db.relationship("Conversation", back_populates="project", cascade="all, delete-orphan")
     documents = db.relationship("Document", back_populates="project", cascade="all, delete-orphan")
@@ -24,4 +29,7 @@ class Project(db.Model):
             "name": self.name,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "conversation_count": self.conversation_count or 0,
+            "document_count": self.document_count or 0,
+            "last_activity_at": self.last_activity_at.isoformat() if self.last_activity_at else None,
         }
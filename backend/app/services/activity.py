@@ -0,0 +1,104 @@
+"""
+Denormalized activity counters for the list endpoints.
+
+conversations.message_count, last_message_at and last_message_preview, and
+projects.conversation_count, document_count and last_activity_at are kept up to date by the
+write paths. Each helper issues relative UPDATEs (n = n + :delta, so concurrent requests do
+not lose increments) in the caller's transaction; the caller commits them together with the
+write. list_projects and list_conversations then return complete rows from one indexed
+query. Migration 11 adds the columns and backfills them from the existing rows.
+
+Messages only move projects.last_activity_at forward when it is older than
+PROJECT_TOUCH_SECONDS, so a busy chat does not write the project row (in the catalog, with
+per-project shards) on every message; last_activity_at is accurate to within that interval.
+Conversation and document changes always update the project row, as they change its
+counters. With per-project shards the conversation counters are in the shard's
+transaction, while the project counters are in the catalog and are committed right after
+the shard.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, or_, select, update
+
+from app.models import Conversation, Message, Project, db
+
+PREVIEW_CHARS = 200
+# Message activity refreshes projects.last_activity_at at most this often
+PROJECT_TOUCH_SECONDS = 60
+
+
+def preview(text: str | None) -> str | None:
+    """First PREVIEW_CHARS characters of a message, on one line."""
+    if not text:
+        return None
+    return " ".join(text.split())[:PREVIEW_CHARS]
+
+
+def _touch_project(project_id: int, at: datetime, **deltas) -> None:
+    values = {name: getattr(Project, name) + delta for name, delta in deltas.items()}
+    db.session.execute(
+        update(Project).where(Project.id == project_id).values(last_activity_at=at, **values),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def _touch_project_activity(project_id: int, at: datetime) -> None:
+    """Move last_activity_at to at unless it was set within PROJECT_TOUCH_SECONDS (no write then)."""
+    stale = at - timedelta(seconds=PROJECT_TOUCH_SECONDS)
+    db.session.execute(
+        update(Project)
+        .where(
+            Project.id == project_id,
+            or_(Project.last_activity_at.is_(None), Project.last_activity_at < stale),
+        )
+        .values(last_activity_at=at),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def messages_added(conversation_id: int, project_id: int, count: int, last_content: str | None) -> None:
+    """count messages were added to a conversation; last_content is the newest one's text."""
+    now = datetime.utcnow()
+    values = {"message_count": Conversation.message_count + count, "last_message_at": now, "updated_at": now}
+    if last_content:
+        values["last_message_preview"] = preview(last_content)
+    db.session.execute(
+        update(Conversation).where(Conversation.id == conversation_id).values(**values),
+        execution_options={"synchronize_session": False},
+    )
+    _touch_project_activity(project_id, now)
+
+
+def message_completed(conversation_id: int, project_id: int, content: str) -> None:
+    """A pending assistant reply got its text: it is now the conversation's last message."""
+    messages_added(conversation_id, project_id, 0, content)
+
+
+def recount_messages(conversation_id: int) -> None:
+    """Recompute a conversation's message counters from its rows (after messages were removed)."""
+    count = select(func.count(Message.id)).where(Message.conversation_id == conversation_id).scalar_subquery()
+    last = (
+        select(Message.created_at, Message.content)
+        .where(Message.conversation_id == conversation_id)
+        .order_by(Message.id.desc())
+        .limit(1)
+    )
+    row = db.session.execute(last).first()
+    db.session.execute(
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(
+            message_count=count,
+            last_message_at=row.created_at if row else None,
+            last_message_preview=preview(row.content) if row else None,
+        ),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def conversations_changed(project_id: int, delta: int) -> None:
+    _touch_project(project_id, datetime.utcnow(), conversation_count=delta)
+
+
+def documents_changed(project_id: int, delta: int) -> None:
+    _touch_project(project_id, datetime.utcnow(), document_count=delta)
@@ -1,34 +1,44 @@
 """
 Router: infers which agent(s) should handle the user's question or input.
-Reads conversation-agents.yaml and uses the LLM to select one or more agents.
+Reads conversation-agents.yaml. A local keyword/TF-IDF classifier (route_classifier) answers
+clear-cut messages without a model call; the LLM selects the agents only when the local
+decision is below the confidence threshold. Decisions are cached by normalized message text.
+
+LLM routing is micro-batched: the first request to need the router waits batch_window_ms
+for others, then sends one prompt listing all their messages and hands each waiter its ids.
 """
 import json
 import re
-from pathlib import Path
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
 
-from app.services.gemini_client import get_model
+from app.agents.registry import get_registry
+from app.services.config_loader import get_config
+from app.services.gemini_client import generate_text
+from app.services.route_classifier import RouteClassifier, normalize_text
 
-WORKSPACE_ROOT = Path(__file__).resolve().parent.parent.parent.parent
-CONVERSATION_AGENTS_CONFIG = (
-    WORKSPACE_ROOT / "src" / "modules" / "ba-analysis" / "config" / "conversation-agents.yaml"
-)
+# agent_router section of config.yaml
+ROUTER_DEFAULTS = {
+    "local_enabled": True,
+    "min_score": 2.5,
+    "min_margin": 0.35,
+    "multi_ratio": 0.8,
+    "cache_entries": 2048,
+    "batch_window_ms": 5,  # 0 disables batching
+    "batch_max": 16,
+}
 
-_agents_config_cache = None
+_lock = threading.Lock()
+_classifier: tuple | None = None  # (prompt_version, settings, RouteClassifier)
+_decisions: OrderedDict = OrderedDict()  # (prompt_version, normalized text) -> tuple of agent ids
+_stats = {"requests": 0, "cache_hits": 0, "local": 0, "llm_fallback": 0, "llm_calls": 0}
 
 
-def load_agents_config() -> list[dict]:
-    """Load and parse conversation-agents.yaml; return list of agent dicts."""
-    global _agents_config_cache
-    if _agents_config_cache is not None:
-        return _agents_config_cache
-    if not CONVERSATION_AGENTS_CONFIG.exists():
-        _agents_config_cache = []
-        return _agents_config_cache
-    import yaml
-    with open(CONVERSATION_AGENTS_CONFIG, encoding="utf-8") as f:
-        data = yaml.safe_load(f)
-    _agents_config_cache = data.get("agents") or []
-    return _agents_config_cache
+def load_agents_config() -> list:
+    """Agents of conversation-agents.yaml (read-only mappings from the agent registry)."""
+    return list(get_registry().conversation_agents())
 
 
 def _build_router_prompt(agents: list[dict], user_message: str) -> str:
@@ -51,40 +61,277 @@ def _build_router_prompt(agents: list[dict], user_message: str) -> str:
     return "\n".join(lines)
 
 
-def route_to_agents(user_message: str) -> list[str]:
+def _build_batch_router_prompt(agents: list, user_messages: list[str]) -> str:
+    """One router prompt for several messages; the reply maps message numbers to agent ids."""
+    lines = [
+        "You are a router. Given the following agents and the numbered user messages, choose which agent(s) should handle each message.",
+        "Reply with ONLY a JSON object mapping every message number to an array of agent ids, "
+        "e.g. {\"1\": [\"emma\"], \"2\": [\"emma\", \"sarah\"]}. No other text.",
+        "",
+        "Agents:",
+    ]
+    for a in agents:
+        lines.append(f"  - id: {a.get('id', '')}")
+        lines.append(f"    responsibility: {a.get('responsibility', '')}")
+        lines.append(f"    description: {a.get('description', '').strip()[:200]}")
+        lines.append("")
+    lines.append("User messages:")
+    for i, message in enumerate(user_messages, 1):
+        lines.append(f"[{i}] {message[:2000]}")
+        lines.append("")
+    lines.append("Reply with the JSON object only:")
+    return "\n".join(lines)
+
+
+class MicroBatcher:
     """
-    Infer which agent(s) should handle the user message.
-    Returns list of agent ids (e.g. ["emma", "sarah"]). Uses config conversation-agents.yaml.
+    Collects items submitted within window_seconds and processes them with one
+    run_batch(items) -> list of results call. There is no background thread: the oldest
+    waiting submitter becomes the leader, waits out the window (or until max_batch items
+    are queued), runs the batch in its own thread and completes the other waiters.
+    Items that arrive while a batch is in flight form the next batch.
     """
+
+    def __init__(self, run_batch, window_seconds: float, max_batch: int):
+        self.run_batch = run_batch
+        self.window_seconds = window_seconds
+        self.max_batch = max(1, max_batch)
+        self._cond = threading.Condition()
+        self._pending: list = []  # futures, oldest first; future.item is the submitted item
+        self._leader_active = False
+        self.stats = {"batches": 0, "items": 0}
+
+    def submit(self, item):
+        future = Future()
+        future.item = item
+        with self._cond:
+            self._pending.append(future)
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+            while not future.done():
+                if not self._leader_active and self._pending[0] is future:
+                    self._leader_active = True
+                    break
+                self._cond.wait()
+        if future.done():
+            return future.result()
+
+        with self._cond:
+            deadline = time.monotonic() + self.window_seconds
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[: self.max_batch]
+            del self._pending[: self.max_batch]
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+        try:
+            results = self.run_batch([f.item for f in batch])
+            for f, result in zip(batch, results):
+                f.set_result(result)
+        except Exception as e:
+            for f in batch:
+                if not f.done():
+                    f.set_exception(e)
+        finally:
+            with self._cond:
+                self._leader_active = False
+                self._cond.notify_all()
+        return future.result()
+
+
+def _route_batch_with_llm(messages: list[str]) -> list:
+    """Route several messages with one router call; None for messages the reply did not cover."""
     agents = load_agents_config()
-    if not agents:
-        return ["alex"]
-    prompt = _build_router_prompt(agents, user_message or "")
-    model = get_model()
-    response = model.generate_content(prompt)
-    text = (response.text or "").strip()
+    unique = list(dict.fromkeys(messages))  # identical messages are asked once
+    _count("llm_calls")
+    if len(unique) == 1:
+        by_message = {unique[0]: _route_with_llm(agents, unique[0])}
+    else:
+        reply = generate_text(_build_batch_router_prompt(agents, unique)).strip()
+        by_message = dict(zip(unique, _parse_batch_router_reply(reply, agents, len(unique))))
+    return [by_message[m] for m in messages]
+
+
+def _parse_batch_router_reply(text: str, agents: list, count: int) -> list:
+    """Agent ids per message number 1..count from a JSON object reply (None where unusable)."""
+    match = re.search(r"\{[\s\S]*\}", text)
+    try:
+        data = json.loads(match.group()) if match else {}
+    except (json.JSONDecodeError, TypeError):
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    valid_ids = {a["id"] for a in agents}
+    results = []
+    for i in range(1, count + 1):
+        ids = data.get(str(i))
+        selected = [x for x in ids if isinstance(x, str) and x in valid_ids] if isinstance(ids, list) else []
+        results.append(selected or None)
+    return results
+
+
+_batcher: MicroBatcher | None = None
+
+
+def _get_batcher(settings: dict) -> MicroBatcher:
+    global _batcher
+    window = float(settings["batch_window_ms"]) / 1000.0
+    with _lock:
+        if _batcher is None or (_batcher.window_seconds, _batcher.max_batch) != (window, int(settings["batch_max"])):
+            _batcher = MicroBatcher(_route_batch_with_llm, window, int(settings["batch_max"]))
+        return _batcher
+
+
+def _router_settings() -> dict:
+    cfg = get_config().get("agent_router") or {}
+    return {**ROUTER_DEFAULTS, **{k: v for k, v in cfg.items() if k in ROUTER_DEFAULTS}}
+
+
+def _get_classifier(settings: dict) -> RouteClassifier:
+    """Classifier for the current conversation-agents config (rebuilt when it changes)."""
+    global _classifier
+    snapshot = get_registry().snapshot()
+    with _lock:
+        if _classifier is None or _classifier[0] != snapshot.prompt_version or _classifier[1] != settings:
+            classifier = RouteClassifier(
+                snapshot.conversation_agents,
+                allow_multiple=snapshot.routing.get("allow_multiple", True),
+                min_score=float(settings["min_score"]),
+                min_margin=float(settings["min_margin"]),
+                multi_ratio=float(settings["multi_ratio"]),
+            )
+            _classifier = (snapshot.prompt_version, settings, classifier)
+        return _classifier[2]
+
+
+def _cache_get(key: tuple) -> list[str] | None:
+    with _lock:
+        ids = _decisions.get(key)
+        if ids is not None:
+            _decisions.move_to_end(key)
+            _stats["cache_hits"] += 1
+            return list(ids)
+    return None
+
+
+def _cache_put(key: tuple, ids: list[str], max_entries: int) -> None:
+    with _lock:
+        _decisions[key] = tuple(ids)
+        _decisions.move_to_end(key)
+        while len(_decisions) > max(0, int(max_entries)):
+            _decisions.popitem(last=False)
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+
+
+def _parse_router_reply(text: str, agents: list) -> list[str] | None:
+    """Agent ids from the router model's reply, or None if it has no usable JSON array."""
     # Parse JSON array from response (allow trailing text)
     match = re.search(r"\[[\s\S]*?\]", text)
     if not match:
-        return [agents[0]["id"]]
+        return None
     try:
         ids = json.loads(match.group())
-        if not isinstance(ids, list):
-            return [agents[0]["id"]]
-        valid_ids = {a["id"] for a in agents}
-        selected = [x for x in ids if isinstance(x, str) and x in valid_ids]
-        return selected if selected else [agents[0]["id"]]
     except (json.JSONDecodeError, TypeError):
-        return [agents[0]["id"]]
+        return None
+    if not isinstance(ids, list):
+        return None
+    valid_ids = {a["id"] for a in agents}
+    selected = [x for x in ids if isinstance(x, str) and x in valid_ids]
+    return selected or None
+
+
+def _route_with_llm(agents: list, user_message: str) -> list[str] | None:
+    prompt = _build_router_prompt(agents, user_message or "")
+    return _parse_router_reply(generate_text(prompt).strip(), agents)
+
+
+def _decision_key(user_message: str) -> tuple:
+    return (get_registry().prompt_version, normalize_text(user_message))
+
+
+def route_locally(user_message: str) -> list[str] | None:
+    """
+    Agent ids from the decision cache or a confident local classification; None when only
+    the LLM can decide (counted as a fallback by whoever makes that call).
+    """
+    agents = load_agents_config()
+    if not agents:
+        return ["alex"]
+    _count("requests")
+    settings = _router_settings()
+    key = _decision_key(user_message)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    if settings["local_enabled"]:
+        decision = _get_classifier(settings).classify(user_message or "")
+        if decision.confident:
+            _count("local")
+            ids = list(decision.agent_ids)
+            _cache_put(key, ids, settings["cache_entries"])
+            return ids
+    return None
+
+
+def remember_route(user_message: str, agent_ids: list[str]) -> None:
+    """Cache agent ids chosen outside the router (single-pass chat) for this message."""
+    _count("llm_fallback")
+    if agent_ids:
+        _cache_put(_decision_key(user_message), agent_ids, _router_settings()["cache_entries"])
+
+
+def route_to_agents(user_message: str) -> list[str]:
+    """
+    Infer which agent(s) should handle the user message.
+    Returns list of agent ids (e.g. ["emma", "sarah"]). Uses config conversation-agents.yaml.
+    Confident local classifications and cached decisions skip the router model call.
+    """
+    ids = route_locally(user_message)
+    if ids is not None:
+        return ids
+
+    agents = load_agents_config()
+    settings = _router_settings()
+    _count("llm_fallback")
+    if float(settings["batch_window_ms"]) > 0:
+        ids = _get_batcher(settings).submit(user_message or "")
+    else:
+        _count("llm_calls")
+        ids = _route_with_llm(agents, user_message)
+    if ids is None:
+        return [agents[0]["id"]]  # unparseable reply: default agent, not cached
+    _cache_put(_decision_key(user_message), ids, settings["cache_entries"])
+    return ids
+
+
+def get_stats() -> dict:
+    """Routing counters: how often the cache, the local classifier and the LLM decided."""
+    with _lock:
+        stats = dict(_stats)
+        stats["cache_entries"] = len(_decisions)
+        if _batcher is not None:
+            stats["llm_batches"] = _batcher.stats["batches"]
+            stats["llm_batched_messages"] = _batcher.stats["items"]
+    decided = stats["requests"] - stats["cache_hits"]
+    stats["fallback_rate"] = round(stats["llm_fallback"] / decided, 3) if decided else 0.0
+    return stats
 
 
 def get_agent_info_from_config(agent_id: str) -> dict | None:
     """Return { name, avatar, role } for an agent id from conversation-agents config."""
-    for a in load_agents_config():
-        if a.get("id") == agent_id:
-            return {
-                "name": a.get("name", agent_id.title()),
-                "avatar": a.get("avatar", ""),
-                "role": "assistant",
-            }
-    return None
+    a = get_registry().conversation_agent(agent_id)
+    if a is None:
+        return None
+    return {
+        "name": a.get("name", agent_id.title()),
+        "avatar": a.get("avatar", ""),
+        "role": "assistant",
+    }
@@ -0,0 +1,61 @@
+"""
+Server-Sent Events for analysis progress.
+
+Events are derived from the Analysis row, so any process can serve the stream and a
+reconnecting client can resume: each agent result gets id = its 1-based position in
+progress.completed (append-only), and the final status event gets the next id.
+"""
+import json
+
+from app.models import Analysis
+
+FINAL_STATUSES = ("completed", "failed")
+
+
+def format_sse(event: str, data: dict, event_id: int | None = None) -> str:
+    """Serialize one SSE frame."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def result_events(analysis: Analysis) -> list[tuple[int, str, dict]]:
+    """(id, event, data) for each agent result so far, in completion order."""
+    progress = analysis.progress or {}
+    completed = progress.get("completed") or []
+    results = analysis.agent_results or {}
+    statuses = progress.get("agent_status") or {}
+    events = []
+    for i, name in enumerate(completed, 1):
+        events.append((
+            i,
+            "overview" if name == "alex" else "agent_result",
+            {
+                "analysis_id": analysis.id,
+                "agent": name,
+                "result": results.get(name),
+                "agent_status": statuses.get(name),
+                "completed": i,
+                "total": progress.get("total"),
+            },
+        ))
+    return events
+
+
+def status_event(analysis: Analysis) -> tuple[int | None, str, dict]:
+    """(id, "status", data); only the final status carries an id (after the last result)."""
+    completed = (analysis.progress or {}).get("completed") or []
+    final = analysis.status in FINAL_STATUSES
+    return (
+        len(completed) + 1 if final else None,
+        "status",
+        {
+            "analysis_id": analysis.id,
+            "status": analysis.status,
+            "error_message": analysis.error_message,
+            "progress": analysis.progress,
+        },
+    )
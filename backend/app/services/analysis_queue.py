@@ -0,0 +1,437 @@
+"""
+Durable analysis job queue backed by the analyses table.
+
+An Analysis row in status "pending" is a queued job. Worker threads claim jobs with a
+conditional UPDATE (pending -> running), run the pipeline and store the result, so the
+HTTP request only has to insert the row. A claim records the worker process (worker_id)
+and a lease (heartbeat_at) that a heartbeat thread renews every lease_seconds / 4 while
+the job runs. Rows left "running" whose lease expired (the process crashed or was
+restarted) are reset to "pending" when workers start and by the heartbeat thread of any
+live process; jobs other processes are still running keep their fresh lease.
+
+A finished analysis can be re-queued as a retry (options.only_agents): only those agents
+run again and their results are merged into the stored agent_results.
+
+Single-flight: an analyze request whose coalesce_key (document content hash, prompt version,
+mode) matches an in-flight analysis does not start another run. Its row follows the leader
+(coalesced_into): workers skip it, and the leader's progress and final result are copied to
+it. Only a leader scheduled at least as urgently (an analysis-priority request does not
+follow a batch run) and with no longer a deadline is followed; otherwise a new run starts.
+A follower whose leader disappears is claimed and run like any other job.
+
+With per-project shards (app.db_shards) workers look for pending jobs in every project's
+database, starting after the project they last claimed from; single-flight coalescing then
+only spans analyses of the same project.
+"""
+import bisect
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import exists, or_, update
+from sqlalchemy.orm import aliased
+
+from app.db_shards import project_scope, project_shards
+from app.models import Analysis, Document, db
+from app.services.config_loader import get_config
+from app.services.llm_governor import PRIORITY_ANALYSIS
+from app.services.orchestrator import (
+    AGENT_COMPLETED,
+    get_analysis_settings,
+    get_analysis_workflow,
+    run_analysis,
+    save_analysis_output,
+)
+
+logger = logging.getLogger(__name__)
+
+# Seconds an idle worker sleeps before polling the table again (enqueue wakes it earlier)
+POLL_INTERVAL = 5.0
+# Seconds without a heartbeat after which a running job counts as interrupted
+DEFAULT_LEASE_SECONDS = 120.0
+# Owner of the jobs claimed by this process (unique across hosts and restarts)
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_app = None
+_workers: list[threading.Thread] = []
+_heartbeat: threading.Thread | None = None
+_wakeup = threading.Event()
+_start_lock = threading.Lock()
+# Notified whenever a worker in this process stores a result or finishes a job
+_updated = threading.Condition()
+# Serializes "find in-flight leader, else insert" so concurrent identical requests coalesce
+coalesce_lock = threading.Lock()
+# Project whose shard the last job was claimed from (round-robin start for the next claim)
+_last_project = 0
+
+IN_FLIGHT_STATUSES = ("pending", "running")
+
+
+def get_lease_seconds() -> float:
+    cfg = get_config().get("analysis_queue") or {}
+    return max(1.0, float(cfg.get("lease_seconds", DEFAULT_LEASE_SECONDS)))
+
+
+def initial_progress() -> dict:
+    """Progress value for a freshly queued analysis."""
+    return {"completed": [], "total": len(get_analysis_workflow().nodes), "agent_status": {}}
+
+
+def enqueue(analysis_id: int) -> None:
+    """Signal idle workers that a pending analysis is available."""
+    logger.debug("Analysis %s queued", analysis_id)
+    _wakeup.set()
+
+
+def wait_for_update(timeout: float) -> None:
+    """Block until a worker in this process updates any analysis, or timeout elapses."""
+    with _updated:
+        _updated.wait(timeout)
+
+
+def _notify_updated() -> None:
+    with _updated:
+        _updated.notify_all()
+
+
+def retry_progress(progress: dict | None, agents: list[str]) -> dict:
+    """Progress for a retry: the retried agents are no longer completed."""
+    progress = dict(progress or initial_progress())
+    progress["completed"] = [n for n in progress.get("completed") or [] if n not in agents]
+    progress["agent_status"] = {
+        n: s for n, s in (progress.get("agent_status") or {}).items() if n not in agents
+    }
+    return progress
+
+
+def failed_agents(analysis: Analysis) -> list[str]:
+    """Workflow agents of a finished analysis that errored, timed out or never ran."""
+    results = analysis.agent_results or {}
+    statuses = (analysis.progress or {}).get("agent_status") or {}
+    failed = []
+    for name in get_analysis_workflow().nodes:
+        status = statuses.get(name)
+        if status is None:
+            # Rows from before agent_status existed: errors are stored as "Error: ..." text
+            ok = name in results and not str(results[name]).startswith("Error:")
+        else:
+            ok = status == AGENT_COMPLETED
+        if not ok:
+            failed.append(name)
+    return failed
+
+
+def _can_follow(leader: Analysis, priority: str, deadline_seconds: float | None) -> bool:
+    """The leader's run serves a new request: scheduled at least as urgently, with no longer a deadline."""
+    options = leader.options or {}
+    if priority == PRIORITY_ANALYSIS and (options.get("priority") or PRIORITY_ANALYSIS) != PRIORITY_ANALYSIS:
+        return False
+    default = get_analysis_settings()["deadline_seconds"]
+    return (options.get("deadline_seconds") or default) <= (deadline_seconds or default)
+
+
+def find_inflight(coalesce_key: str, priority: str, deadline_seconds: float | None) -> Analysis | None:
+    """
+    The oldest pending/running leader analysis with this coalesce key whose run also serves a
+    request with this priority and deadline, if any.
+    """
+    leaders = (
+        Analysis.query.filter(
+            Analysis.coalesce_key == coalesce_key,
+            Analysis.coalesced_into.is_(None),
+            Analysis.status.in_(IN_FLIGHT_STATUSES),
+        )
+        .order_by(Analysis.id.asc())
+        .all()
+    )
+    return next((a for a in leaders if _can_follow(a, priority, deadline_seconds)), None)
+
+
+def _followers(analysis_id: int) -> list[Analysis]:
+    """In-flight analyses coalesced into this one."""
+    return Analysis.query.filter(
+        Analysis.coalesced_into == analysis_id, Analysis.status.in_(IN_FLIGHT_STATUSES)
+    ).all()
+
+
+def recover_interrupted_jobs() -> int:
+    """Reset running analyses whose lease expired (worker process gone) to "pending". Returns count."""
+    expired = datetime.utcnow() - timedelta(seconds=get_lease_seconds())
+    count = 0
+    for project_id in project_shards():
+        with project_scope(project_id):
+            rows = (
+                db.session.query(Analysis)
+                .filter(
+                    Analysis.status == "running",
+                    or_(Analysis.heartbeat_at.is_(None), Analysis.heartbeat_at < expired),
+                )
+                .all()
+            )
+            for analysis in rows:
+                analysis.status = "pending"
+                analysis.started_at = None
+                analysis.worker_id = None
+                analysis.heartbeat_at = None
+                only_agents = (analysis.options or {}).get("only_agents")
+                if only_agents:
+                    # Interrupted retry: keep the earlier results, redo only the retried agents
+                    analysis.progress = retry_progress(analysis.progress, only_agents)
+                else:
+                    analysis.progress = initial_progress()
+                    analysis.agent_results = None
+            db.session.commit()
+            db.session.expunge_all()  # ids repeat across shards
+            count += len(rows)
+    return count
+
+
+def renew_leases() -> int:
+    """Move heartbeat_at forward on the running analyses this process claimed. Returns count."""
+    count = 0
+    now = datetime.utcnow()
+    for project_id in project_shards():
+        with project_scope(project_id):
+            count += db.session.execute(
+                update(Analysis)
+                .where(Analysis.status == "running", Analysis.worker_id == WORKER_ID)
+                .values(heartbeat_at=now)
+            ).rowcount
+            db.session.commit()
+    return count
+
+
+def start_workers(app, num_workers: int) -> None:
+    """Recover interrupted jobs and start num_workers daemon worker threads and the heartbeat (idempotent)."""
+    global _app, _heartbeat
+    with _start_lock:
+        if _workers or num_workers <= 0:
+            return
+        _app = app
+        with app.app_context():
+            recovered = recover_interrupted_jobs()
+            if recovered:
+                logger.info("Re-queued %d interrupted analyses", recovered)
+        for i in range(num_workers):
+            t = threading.Thread(target=_worker_loop, name=f"analysis-worker-{i}", daemon=True)
+            t.start()
+            _workers.append(t)
+        _heartbeat = threading.Thread(target=_heartbeat_loop, name="analysis-heartbeat", daemon=True)
+        _heartbeat.start()
+    _wakeup.set()
+
+
+def _heartbeat_loop() -> None:
+    """Renew this process's leases and re-queue jobs whose owner stopped renewing them."""
+    with _app.app_context():
+        while True:
+            time.sleep(get_lease_seconds() / 4)
+            try:
+                renew_leases()
+                recovered = recover_interrupted_jobs()
+                if recovered:
+                    logger.info("Re-queued %d analyses with an expired lease", recovered)
+                    _wakeup.set()
+            except Exception:
+                logger.exception("Analysis lease heartbeat failed")
+            finally:
+                db.session.remove()
+
+
+def _claim_next() -> int | None:
+    """Atomically move the oldest pending analysis to running. Returns its id or None."""
+    leader = aliased(Analysis)
+    leader_in_flight = exists().where(
+        leader.id == Analysis.coalesced_into, leader.status.in_(IN_FLIGHT_STATUSES)
+    )
+    candidates = (
+        db.session.query(Analysis.id)
+        .filter(Analysis.status == "pending", or_(Analysis.coalesced_into.is_(None), ~leader_in_flight))
+        .order_by(Analysis.id.asc())
+        .limit(5)
+        .all()
+    )
+    now = datetime.utcnow()
+    for (analysis_id,) in candidates:
+        result = db.session.execute(
+            update(Analysis)
+            .where(Analysis.id == analysis_id, Analysis.status == "pending")
+            .values(
+                status="running",
+                started_at=now,
+                coalesced_into=None,
+                worker_id=WORKER_ID,
+                heartbeat_at=now,
+            )
+        )
+        db.session.commit()
+        if result.rowcount == 1:
+            _notify_updated()
+            return analysis_id
+    db.session.commit()
+    return None
+
+
+def _claim_any() -> tuple[int | None, int | None]:
+    """Claim the next pending analysis from any project shard. Returns (project_id, analysis_id)."""
+    global _last_project
+    projects = project_shards()
+    if len(projects) > 1:
+        start = bisect.bisect_right(projects, _last_project)
+        projects = projects[start:] + projects[:start]
+    for project_id in projects:
+        with project_scope(project_id):
+            analysis_id = _claim_next()
+        if analysis_id is not None:
+            if project_id is not None:
+                _last_project = project_id
+            return project_id, analysis_id
+    return None, None
+
+
+def _worker_loop() -> None:
+    with _app.app_context():
+        while True:
+            try:
+                project_id, analysis_id = _claim_any()
+            except Exception:
+                logger.exception("Failed to claim analysis job")
+                db.session.remove()
+                analysis_id = None
+            if analysis_id is None:
+                _wakeup.wait(POLL_INTERVAL)
+                _wakeup.clear()
+                continue
+            try:
+                with project_scope(project_id):
+                    _run_job(analysis_id)
+            except Exception:
+                logger.exception("Analysis %s crashed", analysis_id)
+            finally:
+                db.session.remove()
+
+
+def _record_agent_result(analysis_id: int, agent_name: str, result_text: str, status: str) -> None:
+    """Store one agent's result and status and update progress as soon as it is available."""
+    analysis = db.session.get(Analysis, analysis_id)
+    if analysis is None:  # removed while running (project deleted)
+        db.session.rollback()
+        return
+    results = dict(analysis.agent_results or {})
+    results[agent_name] = result_text
+    progress = dict(analysis.progress or initial_progress())
+    completed = list(progress.get("completed") or [])
+    if agent_name not in completed:
+        completed.append(agent_name)
+    progress["completed"] = completed
+    progress["agent_status"] = {**(progress.get("agent_status") or {}), agent_name: status}
+    analysis.agent_results = results
+    analysis.progress = progress
+    for follower in _followers(analysis_id):
+        follower.status = "running"
+        follower.started_at = follower.started_at or analysis.started_at
+        follower.worker_id = analysis.worker_id  # renewed with the leader's lease
+        follower.heartbeat_at = analysis.heartbeat_at
+        follower.agent_results = results
+        follower.progress = progress
+    db.session.commit()
+    _notify_updated()
+
+
+def _run_job(analysis_id: int) -> None:
+    analysis = db.session.get(Analysis, analysis_id)
+    if analysis is None:
+        return
+    doc = db.session.get(Document, analysis.document_id)
+    project_id = analysis.project_id
+    if doc is None:
+        _finish(analysis_id, error="Document not found")
+        return
+    document_path = doc.file_path
+    content_hash = doc.content_hash
+    options = analysis.options or {}
+    only_agents = options.get("only_agents")
+    prior_results, prior_status = {}, {}
+    if only_agents:
+        # Results of the agents that are not retried; they stay as they are
+        prior_results = {n: r for n, r in (analysis.agent_results or {}).items() if n not in only_agents}
+        prior_status = {
+            n: s for n, s in ((analysis.progress or {}).get("agent_status") or {}).items() if n in prior_results
+        }
+    db.session.commit()  # release the read transaction before the long LLM calls
+
+    try:
+        result = run_analysis(
+            document_path,
+            project_id,
+            on_result=lambda name, text, status: _record_agent_result(analysis_id, name, text, status),
+            content_hash=content_hash,
+            use_cache=options.get("use_cache", True),
+            mode=options.get("mode"),
+            priority=options.get("priority") or PRIORITY_ANALYSIS,
+            deadline_seconds=options.get("deadline_seconds"),
+            only=set(only_agents) if only_agents else None,
+            prior_results=prior_results,
+        )
+    except Exception as e:
+        db.session.rollback()
+        _finish(analysis_id, error=str(e), keep_results=bool(only_agents))
+        return
+
+    if "error" in result:
+        _finish(analysis_id, error=result["error"], keep_results=bool(only_agents))
+        return
+    if only_agents:
+        result = _merge_retry(result, prior_results, prior_status)
+    save_analysis_output(project_id, analysis_id, result)
+    followers = _finish(analysis_id, agent_results=result.get("agent_results", result))
+    for follower_id, follower_project_id in followers:
+        save_analysis_output(follower_project_id, follower_id, result)
+
+
+def _merge_retry(result: dict, prior_results: dict, prior_status: dict) -> dict:
+    """Combine a retry's results with the kept results of the earlier run, in workflow order."""
+    results = {**prior_results, **result["agent_results"]}
+    statuses = {**prior_status, **result["agent_status"]}
+    order = [n for n in get_analysis_workflow().nodes if n in results]
+    order += [n for n in results if n not in order]
+    return {
+        **result,
+        "agent_results": {n: results[n] for n in order},
+        "agent_status": {n: statuses.get(n, AGENT_COMPLETED) for n in order},
+    }
+
+
+def _finish(
+    analysis_id: int, agent_results: dict | None = None, error: str | None = None, keep_results: bool = False
+) -> list[tuple[int, int]]:
+    """Store the final status and copy it to the followers. Returns their (id, project_id)."""
+    analysis = db.session.get(Analysis, analysis_id)
+    if analysis is None:
+        db.session.rollback()
+        return []
+    if error is not None:
+        analysis.status = "failed"
+        analysis.error_message = error
+        if not keep_results:
+            analysis.agent_results = None
+    else:
+        analysis.status = "completed"
+        analysis.error_message = None
+        analysis.agent_results = agent_results
+    analysis.finished_at = datetime.utcnow()
+    followers = _followers(analysis_id)
+    for follower in followers:
+        follower.status = analysis.status
+        follower.error_message = analysis.error_message
+        follower.agent_results = analysis.agent_results
+        follower.progress = analysis.progress
+        follower.started_at = follower.started_at or analysis.started_at
+        follower.finished_at = analysis.finished_at
+    db.session.commit()
+    _notify_updated()
+    return [(f.id, f.project_id) for f in followers]
@@ -0,0 +1,242 @@
+"""
+Token-budgeted conversation history for chat replies.
+
+A reply prompt carries the last chat_history.recent_turns turns verbatim (newest first until
+recent_token_budget is used up) plus the conversation's rolling summary of everything before
+them. After each reply a background thread folds the messages that have left the verbatim
+window into conversations.summary (summary_through_id marks the last message folded), so
+prompt size stays bounded however long the conversation gets. Messages that left the window
+but are not folded yet (the update lags behind) stay in the prompt verbatim, up to
+summarize_batch_tokens more, so no turn is in neither. Token counts are estimated at
+CHARS_PER_TOKEN characters per token.
+"""
+import logging
+import threading
+
+from flask import current_app
+
+from app.db_shards import current_project_id, project_scope
+from app.models import Conversation, Message, db
+from app.services.config_loader import get_config
+from app.services.llm_governor import PRIORITY_BATCH
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+CHAT_ROLES = ("user", "assistant")
+# Unsummarized messages beyond the verbatim window loaded for a prompt at most
+MAX_LAG_MESSAGES = 100
+
+DEFAULTS = {
+    "recent_turns": 6,  # user message + reply pairs kept verbatim
+    "recent_token_budget": 3000,
+    "summary_enabled": True,
+    "summary_max_tokens": 600,
+    "summarize_batch_tokens": 6000,  # max transcript folded into the summary per model call
+}
+
+SUMMARY_PROMPT = """You maintain the running summary of a business-analysis conversation between a user and a team of BA agents.
+Update the summary with the new messages below. Keep what later turns need: goals, decisions, requirements, constraints, stakeholders, names, numbers, open questions and anything the user asked to remember. Drop small talk and repetition.
+Write plain prose or short bullets, at most {max_words} words. Return ONLY the updated summary.
+
+# Current summary
+{summary}
+
+# New messages
+{transcript}"""
+
+_lock = threading.Lock()
+_running: set = set()  # (project_id, conversation_id) with a summary update in progress
+_dirty: set = set()  # ... that got another reply meanwhile (run once more)
+_stats = {"updates": 0, "messages_summarized": 0, "errors": 0}
+
+
+def get_history_settings() -> dict:
+    cfg = get_config().get("chat_history") or {}
+    return {**DEFAULTS, **{k: cfg[k] for k in DEFAULTS if k in cfg}}
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text or "") // CHARS_PER_TOKEN + 1
+
+
+def _recent_count(newest_first: list, settings: dict) -> int:
+    """How many of these messages (newest first) fit the verbatim window."""
+    budget = int(settings["recent_token_budget"])
+    used = 0
+    count = 0
+    for m in newest_first[: int(settings["recent_turns"]) * 2]:
+        used += estimate_tokens(m.content)
+        if count and used > budget:
+            break  # the newest message is always kept, even if it alone is over budget
+        count += 1
+    return count
+
+
+def _lag_count(newest_first: list, settings: dict) -> int:
+    """How many of these unsummarized messages (newest first) fit summarize_batch_tokens."""
+    budget = int(settings["summarize_batch_tokens"])
+    used = 0
+    for count, m in enumerate(newest_first):
+        used += estimate_tokens(m.content)
+        if used > budget:
+            return count
+    return len(newest_first)
+
+
+def load_history(conversation_id: int, pending_content: str | None = None) -> tuple[str | None, list[dict]]:
+    """
+    (summary, recent messages as {"role", "content"} oldest first) for a reply prompt.
+    pending_content: the user message being answered; if it is already the newest stored
+    message it is left out of the history (it is sent as the new message).
+    Pending and failed replies are not part of the history. With summaries on, messages older
+    than the window that the summary does not cover yet are included too (within
+    summarize_batch_tokens).
+    """
+    settings = get_history_settings()
+    conv = db.session.get(Conversation, conversation_id)
+    through = (conv.summary_through_id if conv else None) or 0
+    window = int(settings["recent_turns"]) * 2 + 1
+    rows = (
+        Message.query.filter(
+            Message.conversation_id == conversation_id,
+            Message.id > through,
+            Message.role.in_(CHAT_ROLES),
+            Message.status == "complete",
+        )
+        .order_by(Message.id.desc())
+        .limit(window + MAX_LAG_MESSAGES if settings["summary_enabled"] else window)
+        .all()
+    )
+    if rows and pending_content is not None and rows[0].role == "user" and rows[0].content == pending_content:
+        rows = rows[1:]
+    keep = _recent_count(rows, settings)
+    if settings["summary_enabled"]:
+        keep += _lag_count(rows[keep:], settings)
+    rows = rows[:keep]
+    summary = conv.summary if conv is not None and settings["summary_enabled"] else None
+    history = [{"role": m.role, "content": m.content or ""} for m in reversed(rows)]
+    db.session.rollback()  # end the read transaction: the model call that follows holds none
+    return summary or None, history
+
+
+def with_summary(system_prompt: str, summary: str | None) -> str:
+    """System prompt extended with the rolling summary of earlier turns."""
+    if not summary:
+        return system_prompt
+    return f"{system_prompt}\n\n# Earlier in this conversation (summary)\n{summary}"
+
+
+def _transcript(messages: list) -> str:
+    lines = []
+    for m in messages:
+        speaker = "User" if m.role == "user" else f"Assistant ({m.agent_id})" if m.agent_id else "Assistant"
+        lines.append(f"{speaker}: {(m.content or '').strip()}")
+    return "\n\n".join(lines)
+
+
+def _fold(summary: str | None, messages: list, settings: dict) -> str:
+    from app.services.gemini_client import generate_text
+
+    max_tokens = int(settings["summary_max_tokens"])
+    prompt = SUMMARY_PROMPT.format(
+        max_words=max_tokens * 3 // 4,
+        summary=summary or "(none yet)",
+        transcript=_transcript(messages),
+    )
+    text = generate_text(prompt, priority=PRIORITY_BATCH).strip()
+    return text[: max_tokens * CHARS_PER_TOKEN]
+
+
+def update_summary(conversation_id: int) -> int:
+    """
+    Fold messages that have left the verbatim window into the conversation summary.
+    Returns the number of messages folded. Call inside an app context.
+    """
+    settings = get_history_settings()
+    if not settings["summary_enabled"]:
+        return 0
+    conv = db.session.get(Conversation, conversation_id)
+    if conv is None:
+        return 0
+    through = conv.summary_through_id or 0
+    summary = conv.summary
+    rows = (
+        Message.query.filter(
+            Message.conversation_id == conversation_id,
+            Message.id > through,
+            Message.role.in_(CHAT_ROLES),
+            Message.status == "complete",
+        )
+        .order_by(Message.id.asc())
+        .all()
+    )
+    older = rows[: len(rows) - _recent_count(rows[::-1], settings)]
+    db.session.expunge_all()  # keep the loaded rows usable after ending the read transaction
+    db.session.rollback()
+    folded = 0
+    batch_budget = int(settings["summarize_batch_tokens"])
+    while older:
+        batch, used = [], 0
+        for m in older:
+            used += estimate_tokens(m.content)
+            if batch and used > batch_budget:
+                break
+            batch.append(m)
+        new_summary = _fold(summary, batch, settings)  # no transaction open during the call
+        new_through = batch[-1].id
+        # Conditional write: a concurrent update that already moved summary_through_id wins
+        updated = Conversation.query.filter(
+            Conversation.id == conversation_id,
+            db.func.coalesce(Conversation.summary_through_id, 0) == through,
+        ).update({"summary": new_summary, "summary_through_id": new_through}, synchronize_session=False)
+        db.session.commit()
+        if not updated:
+            break
+        summary, through = new_summary, new_through
+        folded += len(batch)
+        older = older[len(batch):]
+    if folded:
+        with _lock:
+            _stats["updates"] += 1
+            _stats["messages_summarized"] += folded
+    return folded
+
+
+def schedule_summary_update(conversation_id: int) -> None:
+    """Update the conversation's summary on a background thread (one at a time per conversation)."""
+    if not get_history_settings()["summary_enabled"]:
+        return
+    project_id = current_project_id()
+    key = (project_id, conversation_id)  # conversation ids are per shard when projects are sharded
+    with _lock:
+        if key in _running:
+            _dirty.add(key)
+            return
+        _running.add(key)
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context(), project_scope(project_id):
+            while True:
+                try:
+                    update_summary(conversation_id)
+                except Exception:
+                    db.session.rollback()
+                    with _lock:
+                        _stats["errors"] += 1
+                    logger.exception("Summary update failed for conversation %s", conversation_id)
+                finally:
+                    db.session.remove()
+                with _lock:
+                    if key not in _dirty:
+                        _running.discard(key)
+                        return
+                    _dirty.discard(key)
+
+    threading.Thread(target=run, name=f"chat-summary-{conversation_id}", daemon=True).start()
+
+
+def get_stats() -> dict:
+    with _lock:
+        return {**_stats, "running": len(_running)}
@@ -0,0 +1,103 @@
+"""
+Split parsed document text into section-aware chunks for map-reduce analysis.
+
+Sections start at heading-like lines (Markdown headings, numbered headings such as
+"2.1 Scope", short ALL-CAPS lines). Whole sections are packed into chunks up to
+max_chars; a section that is larger on its own is split at paragraph, then line,
+boundaries, and only cut mid-line as a last resort.
+"""
+import re
+
+HEADING_PATTERNS = [
+    re.compile(r"^#{1,6}\s+\S"),                                   # Markdown heading
+    re.compile(r"^(\d+(\.\d+)*\.?|[IVXLC]+\.)\s+[A-Z][^.!?]{0,120}$"),  # 1. / 2.3 / IV. Title
+    re.compile(r"^[A-Z][A-Z0-9 &/\-,()]{3,80}$"),                 # ALL CAPS heading
+]
+
+
+def _is_heading(line: str) -> bool:
+    stripped = line.strip()
+    return bool(stripped) and any(p.match(stripped) for p in HEADING_PATTERNS)
+
+
+def split_sections(text: str) -> list[str]:
+    """Split text into sections, each starting at a heading line (first may have none)."""
+    sections = []
+    current: list[str] = []
+    for line in text.splitlines():
+        if _is_heading(line) and any(l.strip() for l in current):
+            sections.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        sections.append("\n".join(current))
+    return [s for s in sections if s.strip()]
+
+
+def _split_oversized(section: str, max_chars: int) -> list[str]:
+    """Split one section larger than max_chars at paragraph, then line, boundaries."""
+    for separator in ("\n\n", "\n"):
+        pieces = section.split(separator)
+        if all(len(p) <= max_chars for p in pieces):
+            return _pack(pieces, max_chars, separator)
+    return _hard_split(section, max_chars)
+
+
+def _hard_split(section: str, max_chars: int) -> list[str]:
+    """
+    Pack lines like _pack, cutting lines longer than max_chars. A long line's first cut fills
+    the chunk being built, so a heading (or other short text) right before it stays with it
+    instead of becoming a chunk of its own.
+    """
+    chunks = []
+    current = ""
+    for line in section.split("\n"):
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        if len(line) <= max_chars:
+            chunks.append(current)
+            current = line
+            continue
+        room = max_chars - len(current) - 1 if current else max_chars
+        if room <= 0:
+            chunks.append(current)
+            current, room = "", max_chars
+        chunks.append(f"{current}\n{line[:room]}" if current else line[:room])
+        rest = [line[i:i + max_chars] for i in range(room, len(line), max_chars)]
+        chunks.extend(rest[:-1])
+        current = rest[-1] if rest else ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _pack(pieces: list[str], max_chars: int, separator: str) -> list[str]:
+    """Greedily join consecutive pieces into chunks no longer than max_chars."""
+    chunks = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current}{separator}{piece}" if current else piece
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_into_chunks(text: str, max_chars: int) -> list[str]:
+    """Return chunks of at most max_chars, keeping sections together where they fit."""
+    if len(text) <= max_chars:
+        return [text]
+    pieces = []
+    for section in split_sections(text):
+        if len(section) > max_chars:
+            pieces.extend(_split_oversized(section, max_chars))
+        else:
+            pieces.append(section)
+    return _pack(pieces, max_chars, "\n\n")
@@ -1,28 +1,57 @@
-"""Conversation agent: BA chat with history; router selects agent(s), multiple agents may collaborate."""
-from pathlib import Path
+"""
+Conversation agent: BA chat with history; router selects agent(s), multiple agents may collaborate.
+
+Single-pass mode (chat.single_pass in config.yaml, or per request): when the cached/local
+router cannot decide, one model call both picks the agents and writes the reply, returning
+{"agents": [...], "reply": "..."} instead of a router call followed by the reply call.
+"""
+import json
+import re
+from datetime import datetime, timedelta
 
 from app.agents.base import get_agent_bot_info
-from app.models import Message
+from app.agents.registry import get_registry
+from app.db_shards import project_scope, project_shards
+from app.models import Message, db
 from app.services.agent_router import (
     get_agent_info_from_config,
     load_agents_config,
+    remember_route,
+    route_locally,
     route_to_agents,
 )
-from app.services.gemini_client import generate_chat
+from app.services.chat_history import load_history, with_summary
+from app.services.config_loader import get_config
+from app.services.gemini_client import generate_chat, stream_chat
 
 # Fallback when config has no agents or router returns none
 CONVERSATION_AGENT_ID = "alex"
+# A reply still pending after this many seconds is no longer being generated by any process
+DEFAULT_REPLY_TIMEOUT_SECONDS = 600.0
 
-WORKSPACE_ROOT = Path(__file__).resolve().parent.parent.parent.parent
-BA_CONVERSATION_PROMPT_PATH = (
-    WORKSPACE_ROOT / "src" / "modules" / "ba-analysis" / "prompts" / "ba_conversation.prompt.txt"
+SINGLE_PASS_INSTRUCTIONS = (
+    "For each user message, first decide which of these agents should answer (one, or several "
+    "when the request spans their responsibilities), then write one coherent reply from their "
+    "perspective(s) in Markdown.\n"
+    "Respond with ONLY a JSON object, no other text:\n"
+    '{"agents": ["<agent id>", ...], "reply": "<your reply in Markdown>"}'
 )
 
 
+def get_chat_settings() -> dict:
+    """chat section of config.yaml."""
+    cfg = get_config().get("chat") or {}
+    return {
+        "single_pass": bool(cfg.get("single_pass", False)),
+        "reply_timeout_seconds": float(cfg.get("reply_timeout_seconds", DEFAULT_REPLY_TIMEOUT_SECONDS)),
+    }
+
+
 def get_conversation_system_prompt() -> str:
-    """Load BA conversation system prompt from module prompts."""
-    if BA_CONVERSATION_PROMPT_PATH.exists():
-        return BA_CONVERSATION_PROMPT_PATH.read_text(encoding="utf-8").strip()
+    """BA conversation system prompt from module prompts (cached by the agent registry)."""
+    prompt = get_registry().snapshot().conversation_prompt
+    if prompt is not None:
+        return prompt
     return (
         "You are a Senior Business Analyst. Answer the user's questions clearly. "
         "When information is missing, ask concise follow-up questions to clarify. "
@@ -57,28 +86,124 @@ def get_conversation_bot(primary_agent_id: str | None = None) -> dict:
     return get_agent_bot_info(CONVERSATION_AGENT_ID)
 
 
-def get_agent_reply(conversation_id: int, new_user_content: str) -> tuple[str, list[str]]:
+def _build_single_pass_system_prompt(agents: list) -> str:
+    """System prompt describing every conversation agent, asking for agents + reply as JSON."""
+    parts = [get_conversation_system_prompt(), "", "You are a team of the following agents:"]
+    for a in agents:
+        parts.append(
+            f"- id: {a.get('id', '')} | {a.get('name', '')} ({a.get('responsibility', '')}): "
+            f"{a.get('description', '').strip()}"
+        )
+    parts.append("")
+    parts.append(SINGLE_PASS_INSTRUCTIONS)
+    return "\n".join(parts)
+
+
+def parse_single_pass_reply(text: str, agents: list) -> tuple[str, list[str]]:
     """
-    Infer which agent(s) to use, build combined prompt when multiple agents, then reply.
-    Returns (reply_text, selected_agent_ids). Caller may use selected_agent_ids[0] for bot.
+    (reply, agent_ids) from a single-pass JSON response. If the model did not return valid
+    JSON, the whole text is the reply and the agent list is empty (caller falls back).
     """
-    selected_ids = route_to_agents(new_user_content)
-    agents_config = load_agents_config()
+    raw = (text or "").strip()
+    fenced = re.match(r"^```(?:json)?\s*([\s\S]*?)\s*```$", raw)
+    if fenced:
+        raw = fenced.group(1)
+    try:
+        data = json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return text or "", []
+    if not isinstance(data, dict) or not isinstance(data.get("reply"), str):
+        return text or "", []
+    valid_ids = {a.get("id") for a in agents}
+    ids = data.get("agents") if isinstance(data.get("agents"), list) else []
+    return data["reply"], [x for x in ids if isinstance(x, str) and x in valid_ids]
+
+
+def _reply_prompt(
+    conversation_id: int, new_user_content: str, selected_ids: list[str], agents_config: list
+) -> tuple[str, list[dict]]:
+    """(system_prompt, history) for a reply from the selected agents."""
     selected_agents = [a for a in agents_config if a.get("id") in selected_ids]
     if selected_agents:
         system_prompt = _build_multi_agent_system_prompt(selected_agents)
     else:
         system_prompt = get_conversation_system_prompt()
+    summary, history = load_history(conversation_id, pending_content=new_user_content)
+    return with_summary(system_prompt, summary), history
+
 
-    messages = (
-        Message.query.filter_by(conversation_id=conversation_id)
-        .order_by(Message.created_at.asc())
-        .all()
+def _cache_scope(conversation_id: int) -> str:
+    """Chat replies are cached per conversation, never shared between conversations."""
+    return f"conversation:{conversation_id}"
+
+
+def get_agent_reply(
+    conversation_id: int, new_user_content: str, use_cache: bool = True, single_pass: bool | None = None
+) -> tuple[str, list[str]]:
+    """
+    Infer which agent(s) to use, build combined prompt when multiple agents, then reply.
+    Returns (reply_text, selected_agent_ids). Caller may use selected_agent_ids[0] for bot.
+    use_cache=False forces a fresh model reply instead of a cached one.
+    single_pass: route and reply in one model call when the local router cannot decide
+    (None = chat.single_pass from config).
+    History is the recent turns plus the conversation's rolling summary (chat_history).
+    """
+    if single_pass is None:
+        single_pass = get_chat_settings()["single_pass"]
+    agents_config = load_agents_config()
+
+    if single_pass:
+        selected_ids = route_locally(new_user_content)
+        if selected_ids is None:
+            summary, history = load_history(conversation_id, pending_content=new_user_content)
+            system_prompt = with_summary(_build_single_pass_system_prompt(agents_config), summary)
+            raw = generate_chat(
+                system_prompt,
+                history,
+                new_user_content,
+                use_cache=use_cache,
+                json_output=True,
+                cache_scope=_cache_scope(conversation_id),
+            )
+            reply_text, selected_ids = parse_single_pass_reply(raw, agents_config)
+            remember_route(new_user_content, selected_ids)
+            return reply_text, selected_ids or [CONVERSATION_AGENT_ID]
+    else:
+        selected_ids = route_to_agents(new_user_content)
+
+    system_prompt, history = _reply_prompt(conversation_id, new_user_content, selected_ids, agents_config)
+    reply_text = generate_chat(
+        system_prompt, history, new_user_content, use_cache=use_cache, cache_scope=_cache_scope(conversation_id)
     )
-    history = [
-        {"role": m.role, "content": m.content or ""}
-        for m in messages
-        if m.role in ("user", "assistant")
-    ]
-    reply_text = generate_chat(system_prompt, history, new_user_content)
     return reply_text, selected_ids
+
+
+def stream_agent_reply(conversation_id: int, new_user_content: str, use_cache: bool = True):
+    """
+    Streaming variant of get_agent_reply: routes first, then returns (selected_agent_ids,
+    iterator of reply text chunks). The model call starts on the first next(). Single-pass
+    mode does not apply (a JSON reply cannot be shown while it streams).
+    """
+    selected_ids = route_to_agents(new_user_content)
+    system_prompt, history = _reply_prompt(conversation_id, new_user_content, selected_ids, load_agents_config())
+    chunks = stream_chat(
+        system_prompt, history, new_user_content, use_cache=use_cache, cache_scope=_cache_scope(conversation_id)
+    )
+    return selected_ids, chunks
+
+
+def fail_interrupted_replies() -> int:
+    """
+    Mark assistant replies left "pending" (server stopped mid-generation) as failed. Returns count.
+    Only replies older than chat.reply_timeout_seconds are touched: younger ones may still be
+    generated by another process sharing the database.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=get_chat_settings()["reply_timeout_seconds"])
+    count = 0
+    for project_id in project_shards():
+        with project_scope(project_id):
+            count += Message.query.filter(Message.status == "pending", Message.created_at < cutoff).update(
+                {"status": "failed"}, synchronize_session=False
+            )
+            db.session.commit()
+    return count
@@ -0,0 +1,151 @@
+"""
+Content-addressed cache of parsed document text.
+
+Extracted text and document_metadata are stored once per SHA-256 of the file contents
+under <documents_path>/_parsed/, so re-analyses and identical files uploaded to other
+projects skip PDF/DOCX extraction. The cache is capped by total size (document_cache.max_bytes
+in config) and evicts least recently used entries; file mtime is the recency marker.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from app.services.config_loader import get_config
+from app.services.document_parser import parse_document
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+CACHE_DIRNAME = "_parsed"
+
+_lock = threading.Lock()
+_index: OrderedDict | None = None  # sha256 -> entry size in bytes, least recently used first
+_total_bytes = 0
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def file_sha256(file_path: str) -> str:
+    """Return hex SHA-256 of a file, read in 1 MiB blocks."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _cache_dir() -> Path:
+    config = get_config()
+    base = config.get("documents_path") or str(Path(config["project_root"]) / "data" / "documents")
+    return Path(base) / CACHE_DIRNAME
+
+
+def _max_bytes() -> int:
+    return int((get_config().get("document_cache") or {}).get("max_bytes", DEFAULT_MAX_BYTES))
+
+
+def _entry_path(content_hash: str) -> Path:
+    return _cache_dir() / content_hash[:2] / f"{content_hash}.json"
+
+
+def _load_index() -> OrderedDict:
+    """Scan the cache directory once, ordering entries by mtime (oldest first)."""
+    global _index, _total_bytes
+    if _index is not None:
+        return _index
+    entries = []
+    root = _cache_dir()
+    if root.is_dir():
+        for path in root.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, path.stem, st.st_size))
+    entries.sort()
+    _index = OrderedDict((sha, size) for _, sha, size in entries)
+    _total_bytes = sum(_index.values())
+    return _index
+
+
+def _evict_locked(max_bytes: int) -> None:
+    global _total_bytes
+    index = _load_index()
+    while _total_bytes > max_bytes and index:
+        sha, size = index.popitem(last=False)
+        _total_bytes -= size
+        _stats["evictions"] += 1
+        _entry_path(sha).unlink(missing_ok=True)
+
+
+def get_cached(content_hash: str) -> dict | None:
+    """Return cached { document_text, document_metadata } or None; counts a hit or miss."""
+    global _total_bytes
+    path = _entry_path(content_hash)
+    with _lock:
+        index = _load_index()
+        if content_hash not in index:
+            _stats["misses"] += 1
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            _total_bytes -= index.pop(content_hash, 0)
+            _stats["misses"] += 1
+            return None
+        index.move_to_end(content_hash)
+        _stats["hits"] += 1
+        return data
+
+
+def put_cached(content_hash: str, parsed: dict) -> None:
+    """Store parsed output for content_hash and evict LRU entries above the size cap."""
+    global _total_bytes
+    path = _entry_path(content_hash)
+    payload = json.dumps(parsed, ensure_ascii=False).encode("utf-8")
+    max_bytes = _max_bytes()
+    if len(payload) > max_bytes:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+    with _lock:
+        index = _load_index()
+        _total_bytes -= index.pop(content_hash, 0)
+        index[content_hash] = len(payload)
+        _total_bytes += len(payload)
+        _evict_locked(max_bytes)
+
+
+def parse_document_cached(file_path: str, content_hash: str | None = None) -> dict:
+    """
+    Same contract as parse_document, but served from the content-addressed cache when possible.
+    content_hash: SHA-256 of the file if already known (e.g. Document.content_hash).
+    """
+    if not Path(file_path).exists():
+        raise FileNotFoundError(f"File not found: {file_path}")
+    content_hash = content_hash or file_sha256(file_path)
+    cached = get_cached(content_hash)
+    if cached is not None:
+        # Metadata is shared across identical uploads; report this file's own name
+        metadata = dict(cached.get("document_metadata") or {})
+        metadata["filename"] = Path(file_path).name
+        return {"document_text": cached.get("document_text", ""), "document_metadata": metadata}
+    parsed = parse_document(file_path)
+    put_cached(content_hash, parsed)
+    return parsed
+
+
+def get_stats() -> dict:
+    """Hit/miss/eviction counters and current size of the cache."""
+    with _lock:
+        index = _load_index()
+        return {
+            **_stats,
+            "entries": len(index),
+            "bytes": _total_bytes,
+            "max_bytes": _max_bytes(),
+        }
@@ -1,14 +1,53 @@
 """Document parsing service."""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
 
 ALLOWED_EXTENSIONS = {".pdf", ".docx", ".doc", ".txt"}
 
+# PDF extraction tuning (overridable via document_parser in config.yaml)
+DEFAULT_PDF_WORKERS = max(1, min(4, (multiprocessing.cpu_count() or 2) - 1))
+DEFAULT_PAGES_PER_TASK = 16
+DEFAULT_PARALLEL_MIN_PAGES = 48
+# Per-page ceiling on extracted characters; a pathological page cannot blow up memory
+DEFAULT_MAX_PAGE_CHARS = 200_000
 
-def parse_document(file_path: str) -> dict:
-    """
-    Parse document and extract text and metadata.
-    Returns: { document_text: str, document_metadata: dict }
-    """
+_pdf_pool: ProcessPoolExecutor | None = None
+_pdf_pool_lock = threading.Lock()
+
+
+def _parser_settings() -> dict:
+    try:
+        from app.services.config_loader import get_config
+
+        cfg = get_config().get("document_parser") or {}
+    except Exception:
+        cfg = {}
+    return {
+        "workers": int(cfg.get("workers", DEFAULT_PDF_WORKERS)),
+        "pages_per_task": int(cfg.get("pages_per_task", DEFAULT_PAGES_PER_TASK)),
+        "parallel_min_pages": int(cfg.get("parallel_min_pages", DEFAULT_PARALLEL_MIN_PAGES)),
+        "max_page_chars": int(cfg.get("max_page_chars", DEFAULT_MAX_PAGE_CHARS)),
+    }
+
+
+def _get_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    """Shared process pool for PDF extraction (spawn: safe with the threaded Flask server)."""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_pool
+
+
+def _validate(file_path: str) -> tuple[Path, str]:
     path = Path(file_path)
     if not path.exists():
         raise FileNotFoundError(f"File not found: {file_path}")
@@ -18,6 +57,15 @@ def parse_document(file_path: str) -> dict:
         raise ValueError(
             f"Unsupported format: {suffix}. Allowed: {', '.join(ALLOWED_EXTENSIONS)}"
         )
+    return path, suffix
+
+
+def parse_document(file_path: str) -> dict:
+    """
+    Parse document and extract text and metadata.
+    Returns: { document_text: str, document_metadata: dict }
+    """
+    path, suffix = _validate(file_path)
 
     metadata = {
         "filename": path.name,
@@ -34,14 +82,92 @@ def parse_document(file_path: str) -> dict:
     raise ValueError(f"Unsupported format: {suffix}")
 
 
-def _parse_pdf(path: Path, metadata: dict) -> dict:
-    """Parse PDF using PyPDF2."""
+def iter_document_pages(file_path: str, parallel: bool | None = None) -> Iterator[str]:
+    """
+    Stream document text page by page, in order.
+    PDF pages are extracted in parallel page ranges when the document is large enough
+    (parallel=None decides by page count). Word and text files yield a single page.
+    """
+    path, suffix = _validate(file_path)
+    if suffix == ".pdf":
+        yield from iter_pdf_pages(path, parallel=parallel)
+    elif suffix in (".docx", ".doc"):
+        yield _parse_docx(path, {})["document_text"]
+    else:
+        yield _parse_txt(path, {})["document_text"]
+
+
+def _clip_page(text: str, max_page_chars: int) -> tuple[str, bool]:
+    """Page text cut to max_page_chars, and whether anything was cut."""
+    return text[:max_page_chars], len(text) > max_page_chars
+
+
+def _extract_page_range(file_path: str, start: int, stop: int, max_page_chars: int) -> list[tuple[str, bool]]:
+    """Process-pool task: extract text of pages [start, stop) from a PDF, as (text, truncated) pairs."""
     from PyPDF2 import PdfReader
 
+    reader = PdfReader(file_path)
+    return [_clip_page(reader.pages[i].extract_text() or "", max_page_chars) for i in range(start, stop)]
+
+
+def iter_pdf_pages(
+    path: Path, parallel: bool | None = None, truncated_pages: list[int] | None = None
+) -> Iterator[str]:
+    """
+    Yield each PDF page's text in page order.
+    Parallel mode submits page ranges to the process pool with a bounded window of
+    in-flight ranges, so at most workers * 2 ranges of text are held at once.
+    Pages longer than max_page_chars are cut; their 1-based numbers are logged and
+    appended to truncated_pages when given.
+    """
+    from PyPDF2 import PdfReader
+
+    settings = _parser_settings()
+    max_chars = settings["max_page_chars"]
     reader = PdfReader(str(path))
-    pages = reader.pages
-    text = "\n".join(p.extract_text() or "" for p in pages)
+    page_count = len(reader.pages)
+    if parallel is None:
+        parallel = settings["workers"] > 1 and page_count >= settings["parallel_min_pages"]
+
+    def clipped(page_no: int, text: str, cut: bool) -> str:
+        if cut:
+            logger.warning("%s: page %s truncated to %s characters", path.name, page_no, max_chars)
+            if truncated_pages is not None:
+                truncated_pages.append(page_no)
+        return text
+
+    if not parallel:
+        for page_no, page in enumerate(reader.pages, start=1):
+            yield clipped(page_no, *_clip_page(page.extract_text() or "", max_chars))
+        return
+
+    del reader  # each pool task opens its own reader
+    step = max(1, settings["pages_per_task"])
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+    pool = _get_pdf_pool(settings["workers"])
+    window = settings["workers"] * 2
+    pending = []
+    next_range = 0
+    page_no = 0
+    while next_range < len(ranges) or pending:
+        while next_range < len(ranges) and len(pending) < window:
+            start, stop = ranges[next_range]
+            pending.append(pool.submit(_extract_page_range, str(path), start, stop, max_chars))
+            next_range += 1
+        for text, cut in pending.pop(0).result():
+            page_no += 1
+            yield clipped(page_no, text, cut)
+
+
+def _parse_pdf(path: Path, metadata: dict) -> dict:
+    """Parse PDF using PyPDF2 (page ranges extracted in parallel for large files)."""
+    truncated = []
+    pages = list(iter_pdf_pages(path, truncated_pages=truncated))
+    text = "\n".join(pages)
     metadata["page_count"] = len(pages)
+    if truncated:
+        metadata["truncated_pages"] = truncated
     return {"document_text": text, "document_metadata": metadata}
 
 
@@ -1,8 +1,37 @@
-"""Gemini API client."""
+"""Gemini API client. Every model call goes through the process-wide LLMGovernor."""
+import json
+import threading
+
 from flask import current_app
 
+from app.services.llm_cache import get_cache, make_key
+from app.services.llm_governor import (
+    PRIORITY_ANALYSIS,
+    PRIORITY_CHAT,
+    LLMGovernor,
+    governor_from_config,
+)
+
+MODEL_NAME = "gemini-2.5-flash"
+
 _gen_model = None
 _genai = None
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> LLMGovernor:
+    """Process-wide rate limiter / concurrency governor for model calls."""
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = governor_from_config()
+    return _governor
+
+
+def _request_options() -> dict:
+    return {"timeout": get_governor().request_timeout}
 
 
 def _ensure_configured():
@@ -23,34 +52,52 @@ def get_model():
     global _gen_model
     _ensure_configured()
     if _gen_model is None:
-        _gen_model = _genai.GenerativeModel("gemini-2.5-flash")
+        _gen_model = _genai.GenerativeModel(MODEL_NAME)
     return _gen_model
 
 
-def generate_content(system_prompt: str, user_message: str) -> str:
-    """
-    Generate content using Gemini (single turn).
-    Returns the raw text response.
-    """
+def generate_text(prompt: str, priority: str = PRIORITY_CHAT) -> str:
+    """Raw single-turn call (no system prompt, no cache), e.g. for the agent router."""
     model = get_model()
-    full_prompt = f"{system_prompt}\n\n---\n\nDocument to analyze:\n\n{user_message}"
-    response = model.generate_content(full_prompt)
+    response = get_governor().call(
+        lambda: model.generate_content(prompt, request_options=_request_options()),
+        priority=priority,
+    )
     return response.text if response.text else ""
 
 
-def generate_chat(system_prompt: str, messages: list[dict], new_user_content: str) -> str:
+def generate_content(
+    system_prompt: str, user_message: str, use_cache: bool = True, priority: str = PRIORITY_ANALYSIS
+) -> str:
     """
-    Multi-turn chat with conversation history.
-    messages: list of {"role": "user"|"assistant", "content": str}
-    new_user_content: the latest user message (will be sent via send_message).
-    Returns the model reply as text.
+    Generate content using Gemini (single turn).
+    Returns the raw text response.
+    use_cache=False bypasses the response cache for this call (the fresh result is still stored).
+    priority: LLM governor class (chat, analysis, batch). Latencies are recorded as analysis
+    calls whatever the priority, for the orchestrator's hedging threshold.
     """
-    import google.generativeai as genai
+    cache = get_cache()
+    key = make_key(MODEL_NAME, system_prompt, user_message)
+    if cache and use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    model = get_model()
+    full_prompt = f"{system_prompt}\n\n---\n\nDocument to analyze:\n\n{user_message}"
+    response = get_governor().call(
+        lambda: model.generate_content(full_prompt, request_options=_request_options()),
+        priority=priority,
+        kind=PRIORITY_ANALYSIS,
+    )
+    text = response.text if response.text else ""
+    if cache and text:
+        cache.set(key, text)
+    return text
 
-    _ensure_configured()
-    model = genai.GenerativeModel("gemini-2.5-flash", system_instruction=system_prompt)
 
-    # Build history for Gemini: "user" and "model" (map assistant -> model)
+def _chat_history(messages: list[dict]) -> list[dict]:
+    """History for Gemini: "user" and "model" (map assistant -> model)."""
     history = []
     for m in messages:
         role = m.get("role", "user")
@@ -62,7 +109,101 @@ def generate_chat(system_prompt: str, messages: list[dict], new_user_content: st
         elif role == "user":
             history.append({"role": "user", "parts": [content]})
         # skip system: already in system_instruction
+    return history
 
+
+def _chat_cache_key(
+    scope: str, system_prompt: str, history: list, new_user_content: str, json_output: bool = False
+) -> str:
+    payload = [scope, history, new_user_content] + (["json"] if json_output else [])
+    return make_key(MODEL_NAME, system_prompt, json.dumps(payload, ensure_ascii=False))
+
+
+def generate_chat(
+    system_prompt: str,
+    messages: list[dict],
+    new_user_content: str,
+    use_cache: bool = True,
+    priority: str = PRIORITY_CHAT,
+    json_output: bool = False,
+    cache_scope: str | None = None,
+) -> str:
+    """
+    Multi-turn chat with conversation history.
+    messages: list of {"role": "user"|"assistant", "content": str}
+    new_user_content: the latest user message (will be sent via send_message).
+    Returns the model reply as text.
+    use_cache=False bypasses the response cache for this call (the fresh result is still stored).
+    priority: LLM governor class (chat, analysis, batch).
+    json_output: ask the model for a JSON response (response_mime_type application/json).
+    cache_scope: replies are cached only within this scope (e.g. one conversation), so two
+    conversations never share a reply; None does not cache.
+    """
+    import google.generativeai as genai
+
+    history = _chat_history(messages)
+    cache = get_cache() if cache_scope is not None else None
+    key = _chat_cache_key(cache_scope, system_prompt, history, new_user_content, json_output)
+    if cache and use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    _ensure_configured()
+    model = genai.GenerativeModel(MODEL_NAME, system_instruction=system_prompt)
     chat = model.start_chat(history=history)
-    response = chat.send_message(new_user_content)
-    return response.text if response.text else ""
+    generation_config = {"response_mime_type": "application/json"} if json_output else None
+    response = get_governor().call(
+        lambda: chat.send_message(
+            new_user_content, generation_config=generation_config, request_options=_request_options()
+        ),
+        priority=priority,
+    )
+    text = response.text if response.text else ""
+    if cache and text:
+        cache.set(key, text)
+    return text
+
+
+def stream_chat(
+    system_prompt: str,
+    messages: list[dict],
+    new_user_content: str,
+    use_cache: bool = True,
+    priority: str = PRIORITY_CHAT,
+    cache_scope: str | None = None,
+):
+    """
+    Like generate_chat, but yields the reply as text chunks while the model produces them.
+    A cached reply is yielded as a single chunk; the full text is cached when the stream ends.
+    """
+    import google.generativeai as genai
+
+    history = _chat_history(messages)
+    cache = get_cache() if cache_scope is not None else None
+    key = _chat_cache_key(cache_scope, system_prompt, history, new_user_content)
+    if cache and use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    _ensure_configured()
+    model = genai.GenerativeModel(MODEL_NAME, system_instruction=system_prompt)
+    chat = model.start_chat(history=history)
+    parts = []
+    chunks = get_governor().stream(
+        lambda: chat.send_message(new_user_content, stream=True, request_options=_request_options()),
+        priority=priority,
+    )
+    for chunk in chunks:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue  # chunk without text parts (e.g. only safety metadata)
+        if text:
+            parts.append(text)
+            yield text
+    full = "".join(parts)
+    if cache and full:
+        cache.set(key, full)
@@ -0,0 +1,67 @@
+"""
+Hedged model calls.
+
+A call that is still running after the governor's recent latency percentile (p95 by
+default) is a straggler: a second, identical request is started and whichever answers
+first wins. Hedges are only sent when the governor has a free slot, so they never queue
+behind (or push out) other work when the provider is already saturated.
+"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+_stats_lock = threading.Lock()
+_stats = {"calls": 0, "hedged": 0, "hedge_wins": 0}
+
+
+def _start(fn) -> Future:
+    """Run fn() on a daemon thread; a losing request may outlive the caller."""
+    future = Future()
+
+    def target():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=target, name="llm-hedge", daemon=True).start()
+    return future
+
+
+def hedged_call(fn, hedge_after: float | None, can_hedge=None):
+    """
+    Call fn(); if it has not returned after hedge_after seconds (and can_hedge() allows it),
+    start a second fn() and return the first successful result. An exception is raised
+    only when every request started has failed. hedge_after=None disables hedging.
+    """
+    with _stats_lock:
+        _stats["calls"] += 1
+    if hedge_after is None:
+        return fn()
+
+    primary = _start(fn)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done or (can_hedge is not None and not can_hedge()):
+        return primary.result()
+
+    with _stats_lock:
+        _stats["hedged"] += 1
+    hedge = _start(fn)
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                if future is hedge:
+                    with _stats_lock:
+                        _stats["hedge_wins"] += 1
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def get_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,107 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+A client that sends `Idempotency-Key: <key>` can retry the same request safely: the first
+request runs and its response is stored in idempotency_keys; a retry with the same key and
+body gets that response again (with `Idempotent-Replayed: true`) instead of a second run.
+A retry that arrives while the first request is still running gets 409; reusing a key
+with a different body gets 422. Error responses (5xx, 429) and streamed (SSE) responses are
+not stored, so the client can retry them. Keys expire after idempotency.ttl_seconds.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, jsonify, make_response, request
+from sqlalchemy.exc import IntegrityError
+
+from app.models import IdempotencyKey, db
+from app.services.config_loader import get_config
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL_SECONDS = 24 * 3600
+
+
+def _ttl_seconds() -> int:
+    cfg = get_config().get("idempotency") or {}
+    return int(cfg.get("ttl_seconds", DEFAULT_TTL_SECONDS))
+
+
+def _replay(record: IdempotencyKey, request_hash: str):
+    if record.request_hash != request_hash:
+        return jsonify({"error": f"{IDEMPOTENCY_HEADER} was already used with a different request body"}), 422
+    if record.status != "completed":
+        response = jsonify({"error": f"A request with this {IDEMPOTENCY_HEADER} is still in progress"})
+        response.headers["Retry-After"] = "1"
+        return response, 409
+    response = Response(record.response_body, status=record.response_status, mimetype="application/json")
+    if record.response_location:
+        response.headers["Location"] = record.response_location
+    response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _claim(scope: str, key: str, request_hash: str) -> IdempotencyKey | None:
+    """Insert an in-progress record for (scope, key); None if another request holds the key."""
+    expired_before = datetime.utcnow() - timedelta(seconds=_ttl_seconds())
+    IdempotencyKey.query.filter(IdempotencyKey.created_at < expired_before).delete(synchronize_session=False)
+    record = IdempotencyKey(scope=scope, key=key, request_hash=request_hash, status="in_progress")
+    db.session.add(record)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return record
+
+
+def _release(record_id: int) -> None:
+    """Forget a key whose request failed, so the client's retry runs again."""
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(id=record_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def idempotent(view):
+    """Decorator for POST views: honour the Idempotency-Key header when present."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"}), 400
+
+        scope = f"{request.method} {request.path}"
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+        existing = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+        if existing is not None:
+            return _replay(existing, request_hash)
+        record = _claim(scope, key, request_hash)
+        if record is None:
+            # Lost the insert race to a concurrent request with the same key
+            existing = IdempotencyKey.query.filter_by(scope=scope, key=key).first()
+            return _replay(existing or IdempotencyKey(request_hash=request_hash), request_hash)
+        record_id = record.id
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _release(record_id)
+            raise
+        if response.status_code >= 500 or response.status_code == 429 or response.is_streamed:
+            _release(record_id)  # a streamed response cannot be stored for replay
+            return response
+
+        record = db.session.get(IdempotencyKey, record_id)
+        record.status = "completed"
+        record.response_status = response.status_code
+        record.response_body = response.get_data(as_text=True)
+        record.response_location = response.headers.get("Location")
+        db.session.commit()
+        return response
+
+    return wrapper
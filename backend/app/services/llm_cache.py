@@ -0,0 +1,180 @@
+"""
+Response cache for Gemini calls.
+
+Keys combine the model name, a hash of the system prompt (as built by build_system_prompt,
+i.e. agent YAML persona + prompt file) and a hash of the input. Editing an agent YAML or
+prompt file therefore changes the key: responses for the old prompt are never served again
+and age out by TTL. Chat replies are also keyed by their conversation (gemini_client
+cache_scope), so one conversation is never answered from another's cache.
+
+Tiers are pluggable: an in-memory LRU in front of a persistent SQLite file
+(<database_path>/llm_cache.db). Configure with the llm_cache section of config.yaml.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from app.services.config_loader import get_config
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DEFAULT_MEMORY_ENTRIES = 512
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_key(model_name: str, system_prompt: str, payload: str) -> str:
+    """Cache key for one model call: model + hash(system prompt) + hash(input)."""
+    return _sha256(f"{model_name}\0{_sha256(system_prompt)}\0{_sha256(payload)}")
+
+
+class MemoryLRUCache:
+    """Process-local LRU tier: key -> (expires_at, value)."""
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCache:
+    """Persistent tier in a standalone SQLite file (kept out of the application DB)."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM llm_responses WHERE expires_at < ?", (time.time(),))
+        return cur.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+
+
+class ResponseCache:
+    """Read-through over tiers (fastest first); a hit in a slower tier is promoted."""
+
+    def __init__(self, tiers: list, ttl: float = DEFAULT_TTL_SECONDS):
+        self.tiers = tiers
+        self.ttl = ttl
+        self._stats = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key)
+            if value is not None:
+                for faster in self.tiers[:i]:
+                    faster.set(key, value, self.ttl)
+                with self._lock:
+                    self._stats["hits"] += 1
+                return value
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: str) -> None:
+        for tier in self.tiers:
+            tier.set(key, value, self.ttl)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._stats)
+        return {**counters, "tiers": [type(t).__name__ for t in self.tiers]}
+
+
+_cache: ResponseCache | None = None
+_cache_lock = threading.Lock()
+
+
+def _build_from_config() -> ResponseCache | None:
+    cfg = get_config().get("llm_cache") or {}
+    if not cfg.get("enabled", True):
+        return None
+    tiers = [MemoryLRUCache(int(cfg.get("memory_entries", DEFAULT_MEMORY_ENTRIES)))]
+    if cfg.get("persistent", True):
+        db_dir = get_config().get("database_path") or str(Path(get_config()["project_root"]) / "data" / "database")
+        persistent = SQLiteCache(str(Path(db_dir) / "llm_cache.db"))
+        persistent.purge_expired()
+        tiers.append(persistent)
+    return ResponseCache(tiers, ttl=float(cfg.get("ttl_seconds", DEFAULT_TTL_SECONDS)))
+
+
+def get_cache() -> ResponseCache | None:
+    """Return the process-wide response cache (None when disabled in config)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = _build_from_config() or ResponseCache([])
+    return _cache if _cache.tiers else None
+
+
+def set_cache(cache: ResponseCache | None) -> None:
+    """Replace the response cache (e.g. a different backend, or None to disable)."""
+    global _cache
+    _cache = cache if cache is not None else ResponseCache([])
+
+
+def get_stats() -> dict:
+    cache = get_cache()
+    return cache.stats() if cache else {"enabled": False}
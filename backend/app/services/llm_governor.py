@@ -0,0 +1,315 @@
+"""
+Process-wide governor for Gemini calls.
+
+Every model call goes through one LLMGovernor (owned by gemini_client), which applies:
+- a token-bucket rate limit (rate_per_second, burst);
+- a concurrency cap that adapts AIMD-style: +1/limit per successful call, multiplied by
+  decrease_factor (at most once per cooldown) when the provider answers 429 or times out;
+- priority classes (interactive chat, interactive analysis, background batch), each with
+  its own wait queue. Free slots go to waiting classes by smooth weighted round-robin, so
+  chat keeps most of the capacity while long analyses run but batch work never starves.
+  A class whose queue is full either rejects new callers with LLMOverloadedError (HTTP 429
+  with Retry-After) or lets them wait, per its on_full setting.
+
+Call latencies are kept in one window per call kind (the priority class unless the caller
+names one, e.g. "analysis" for document analysis calls), so hedging thresholds are not
+skewed by short router calls or by the duration of streamed replies, which are not recorded.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+from app.services.config_loader import get_config
+
+PRIORITY_CHAT = "chat"
+PRIORITY_ANALYSIS = "analysis"
+PRIORITY_BATCH = "batch"
+PRIORITIES = (PRIORITY_CHAT, PRIORITY_ANALYSIS, PRIORITY_BATCH)
+
+DEFAULTS = {
+    "rate_per_second": 5.0,
+    "burst": 10,
+    "max_concurrency": 16,
+    "min_concurrency": 1,
+    "initial_concurrency": 8,
+    "decrease_factor": 0.5,
+    "cooldown_seconds": 5.0,
+    "request_timeout": 120.0,
+    "latency_window": 200,
+}
+
+# weight: share of free slots when classes compete; max_queue: waiters before the class is full;
+# on_full: "reject" (429 to the caller) or "wait" (background work keeps waiting)
+DEFAULT_CLASSES = {
+    PRIORITY_CHAT: {"weight": 8, "max_queue": 32, "on_full": "reject"},
+    PRIORITY_ANALYSIS: {"weight": 3, "max_queue": 64, "on_full": "wait"},
+    PRIORITY_BATCH: {"weight": 1, "max_queue": 256, "on_full": "wait"},
+}
+
+
+class LLMOverloadedError(Exception):
+    """Raised when the LLM wait queue is full; retry_after is a hint in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"LLM capacity exhausted, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def is_throttle_error(exc: Exception) -> bool:
+    """True for provider rate limiting (429) and timeouts, which shrink the concurrency cap."""
+    if isinstance(exc, TimeoutError):
+        return True
+    code = getattr(exc, "code", None)
+    if code in (429, 504):
+        return True
+    return type(exc).__name__ in ("ResourceExhausted", "TooManyRequests", "DeadlineExceeded")
+
+
+class TokenBucket:
+    """Classic token bucket; acquire() blocks until a token is available."""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = max(rate_per_second, 0.001)
+        self.capacity = max(burst, 1)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token; returns seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class LLMGovernor:
+    """Rate limit + adaptive concurrency cap + per-priority queues around model calls."""
+
+    def __init__(self, classes: dict | None = None, **settings):
+        s = {**DEFAULTS, **settings}
+        self.max_concurrency = int(s["max_concurrency"])
+        self.min_concurrency = max(1, int(s["min_concurrency"]))
+        self.decrease_factor = float(s["decrease_factor"])
+        self.cooldown_seconds = float(s["cooldown_seconds"])
+        self.request_timeout = float(s["request_timeout"])
+        self._bucket = TokenBucket(float(s["rate_per_second"]), int(s["burst"]))
+        self._limit = float(min(self.max_concurrency, max(self.min_concurrency, int(s["initial_concurrency"]))))
+        self.classes = {
+            name: {**DEFAULT_CLASSES[name], **((classes or {}).get(name) or {})} for name in PRIORITIES
+        }
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queues = {name: deque() for name in PRIORITIES}
+        self._rr_current = {name: 0.0 for name in PRIORITIES}
+        self._granted: set = set()
+        self._last_decrease = 0.0
+        self._latency_ewma = 1.0
+        self._latency_window = max(1, int(s["latency_window"]))
+        self._latencies: dict[str, deque] = {}
+        self._stats = {"calls": 0, "errors": 0, "throttled": 0, "rejected": 0}
+        self._class_stats = {name: {"calls": 0, "rejected": 0, "wait_seconds": 0.0} for name in PRIORITIES}
+
+    # -- slots -------------------------------------------------------------------------
+
+    def _pick_class_locked(self) -> str:
+        """Smooth weighted round-robin over classes that have waiters."""
+        active = [name for name in PRIORITIES if self._queues[name]]
+        total = 0.0
+        for name in active:
+            weight = float(self.classes[name]["weight"])
+            self._rr_current[name] += weight
+            total += weight
+        chosen = max(active, key=lambda n: self._rr_current[n])
+        self._rr_current[chosen] -= total
+        return chosen
+
+    def _dispatch_locked(self) -> None:
+        """Grant free slots to waiters; wake them if any were granted."""
+        granted_any = False
+        while self._in_flight < int(self._limit) and any(self._queues.values()):
+            waiter = self._queues[self._pick_class_locked()].popleft()
+            self._granted.add(waiter)
+            self._in_flight += 1
+            granted_any = True
+        if granted_any:
+            self._cond.notify_all()
+
+    def _acquire_slot(self, priority: str) -> float:
+        start = time.monotonic()
+        with self._cond:
+            queue = self._queues[priority]
+            if self._in_flight < int(self._limit) and not any(self._queues.values()):
+                self._in_flight += 1
+                return 0.0
+            if self.classes[priority]["on_full"] == "reject" and self._is_overloaded_locked(priority):
+                self._stats["rejected"] += 1
+                self._class_stats[priority]["rejected"] += 1
+                raise LLMOverloadedError(self._retry_after_locked(priority))
+            waiter = object()
+            queue.append(waiter)
+            self._dispatch_locked()
+            while waiter not in self._granted:
+                self._cond.wait()
+            self._granted.discard(waiter)
+        return time.monotonic() - start
+
+    def _release_slot(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._dispatch_locked()
+
+    def _is_overloaded_locked(self, priority: str) -> bool:
+        """A new caller of this class would have to wait and its queue is already full."""
+        return (
+            self._in_flight >= int(self._limit)
+            and len(self._queues[priority]) >= int(self.classes[priority]["max_queue"])
+        )
+
+    def _retry_after_locked(self, priority: str) -> int:
+        # Slots this class can expect per "wave" of completions, given the weights of busy classes
+        busy_weight = sum(
+            float(self.classes[n]["weight"]) for n in PRIORITIES if self._queues[n] or n == priority
+        )
+        share = float(self.classes[priority]["weight"]) / busy_weight
+        waves = (len(self._queues[priority]) + 1) / max(int(self._limit) * share, 1e-6)
+        return max(1, math.ceil(waves * self._latency_ewma))
+
+    # -- AIMD --------------------------------------------------------------------------
+
+    def _on_success(self, latency: float | None = None, kind: str | None = None) -> None:
+        """Grow the cap; latency (None for streams) feeds the EWMA and the window of kind."""
+        with self._cond:
+            self._limit = min(float(self.max_concurrency), self._limit + 1.0 / self._limit)
+            if latency is not None:
+                self._latency_ewma = 0.8 * self._latency_ewma + 0.2 * latency
+                window = self._latencies.get(kind)
+                if window is None:
+                    window = self._latencies[kind] = deque(maxlen=self._latency_window)
+                window.append(latency)
+            self._dispatch_locked()
+
+    def _on_throttle(self) -> None:
+        with self._cond:
+            self._stats["throttled"] += 1
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown_seconds:
+                self._limit = max(float(self.min_concurrency), self._limit * self.decrease_factor)
+                self._last_decrease = now
+
+    # -- public ------------------------------------------------------------------------
+
+    def call(self, fn, priority: str = PRIORITY_CHAT, kind: str | None = None):
+        """
+        Run fn() under the rate limit and concurrency cap, queued in the given priority class.
+        Its latency is recorded under kind (default: the priority class).
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Unknown LLM priority: {priority}")
+        waited = self._acquire_slot(priority)
+        try:
+            waited += self._bucket.acquire()
+            start = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                with self._cond:
+                    self._stats["errors"] += 1
+                if is_throttle_error(e):
+                    self._on_throttle()
+                raise
+            self._on_success(time.monotonic() - start, kind or priority)
+            return result
+        finally:
+            with self._cond:
+                self._stats["calls"] += 1
+                self._class_stats[priority]["calls"] += 1
+                self._class_stats[priority]["wait_seconds"] += waited
+            self._release_slot()
+
+    def stream(self, fn, priority: str = PRIORITY_CHAT):
+        """
+        Like call() for a streaming response: fn() returns an iterable whose items are yielded.
+        The slot is taken on the first next() and held until the stream is exhausted or closed.
+        A stream's duration depends on the reply length, so it is not recorded as a latency.
+        """
+        if priority not in self._queues:
+            raise ValueError(f"Unknown LLM priority: {priority}")
+        waited = self._acquire_slot(priority)
+        try:
+            waited += self._bucket.acquire()
+            try:
+                yield from fn()
+            except Exception as e:
+                with self._cond:
+                    self._stats["errors"] += 1
+                if is_throttle_error(e):
+                    self._on_throttle()
+                raise
+            self._on_success()
+        finally:
+            with self._cond:
+                self._stats["calls"] += 1
+                self._class_stats[priority]["calls"] += 1
+                self._class_stats[priority]["wait_seconds"] += waited
+            self._release_slot()
+
+    def is_overloaded(self, priority: str = PRIORITY_CHAT) -> bool:
+        with self._cond:
+            return self._is_overloaded_locked(priority)
+
+    def retry_after(self, priority: str = PRIORITY_CHAT) -> int:
+        with self._cond:
+            return self._retry_after_locked(priority)
+
+    def latency_percentile(
+        self, percentile: float, min_samples: int = 1, kind: str = PRIORITY_CHAT
+    ) -> float | None:
+        """Latency (seconds) of recent successful calls of kind at the given percentile (0-100);
+        None until min_samples such calls have completed."""
+        with self._cond:
+            samples = sorted(self._latencies.get(kind) or ())
+        if not samples or len(samples) < min_samples:
+            return None
+        index = min(len(samples) - 1, max(0, math.ceil(percentile / 100 * len(samples)) - 1))
+        return samples[index]
+
+    def has_free_slot(self) -> bool:
+        """True when a new call would start without queueing."""
+        with self._cond:
+            return self._in_flight < int(self._limit) and not any(self._queues.values())
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self._stats,
+                "in_flight": self._in_flight,
+                "queue_depth": sum(len(q) for q in self._queues.values()),
+                "concurrency_limit": round(self._limit, 2),
+                "avg_latency_seconds": round(self._latency_ewma, 3),
+                "latency_samples": {kind: len(window) for kind, window in self._latencies.items()},
+                "classes": {
+                    name: {
+                        **self._class_stats[name],
+                        "wait_seconds": round(self._class_stats[name]["wait_seconds"], 3),
+                        "queue_depth": len(self._queues[name]),
+                        "max_queue": self.classes[name]["max_queue"],
+                        "weight": self.classes[name]["weight"],
+                    }
+                    for name in PRIORITIES
+                },
+            }
+
+
+def governor_from_config() -> LLMGovernor:
+    cfg = get_config().get("llm_governor") or {}
+    return LLMGovernor(classes=cfg.get("classes"), **{k: v for k, v in cfg.items() if k in DEFAULTS})
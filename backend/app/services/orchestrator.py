@@ -1,61 +1,237 @@
 """Agent orchestrator - runs analysis pipeline."""
+import hashlib
 import json
+import time
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 
 from flask import current_app
 
 from app.agents.base import build_system_prompt
+from app.agents.registry import get_registry
+from app.services.chunker import split_into_chunks
 from app.services.config_loader import get_config
-from app.services.document_parser import parse_document
-from app.services.gemini_client import generate_content
+from app.services.document_cache import parse_document_cached
+from app.services.gemini_client import generate_content, get_governor
+from app.services.hedging import hedged_call
+from app.services.llm_governor import PRIORITY_ANALYSIS
+from app.services.workflow_engine import load_workflow, run_workflow
 
 
 AGENT_ORDER = ["alex", "emma", "sarah", "david", "paul"]
-SPECIALIST_AGENTS = ["emma", "sarah", "david", "paul"]
 
+ANALYSIS_WORKFLOW = "analyze-document"
+# Used when module.yaml has no workflows.analyze-document entry: all agents run concurrently
+DEFAULT_ANALYSIS_WORKFLOW = {
+    "max_parallel": len(AGENT_ORDER),
+    "nodes": {name: {"depends_on": [], "retries": 1} for name in AGENT_ORDER},
+}
 
-def run_analysis(document_path: str, project_id: int) -> dict:
+ANALYSIS_MODES = ("auto", "single", "chunked")
+DEFAULT_CHUNK_SIZE_CHARS = 60_000
+DEFAULT_CHUNK_CONCURRENCY = 4
+DEFAULT_DEADLINE_SECONDS = 600
+DEFAULT_AGENT_TIMEOUT_SECONDS = 300
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+
+# agent_status values (progress.agent_status and the saved analysis output)
+AGENT_COMPLETED = "completed"
+AGENT_ERROR = "error"
+AGENT_TIMED_OUT = "timed_out"
+
+REDUCE_INSTRUCTIONS = (
+    "The document was too large to analyze in one pass. It was split into consecutive parts and "
+    "you analyzed each part separately. Below are those partial analyses, in document order. "
+    "Merge them into ONE analysis of the whole document in your usual output format: combine "
+    "duplicates, keep every distinct finding, and resolve references that span parts."
+)
+
+
+def get_analysis_settings() -> dict:
+    """Chunking, deadline and hedging settings from the analysis section of config.yaml."""
+    cfg = get_config().get("analysis") or {}
+    return {
+        "mode": cfg.get("mode", "auto"),
+        "chunk_size_chars": int(cfg.get("chunk_size_chars", DEFAULT_CHUNK_SIZE_CHARS)),
+        "chunk_concurrency": int(cfg.get("chunk_concurrency", DEFAULT_CHUNK_CONCURRENCY)),
+        "deadline_seconds": float(cfg.get("deadline_seconds", DEFAULT_DEADLINE_SECONDS)),
+        "agent_timeout_seconds": float(cfg.get("agent_timeout_seconds", DEFAULT_AGENT_TIMEOUT_SECONDS)),
+        "hedge_percentile": float(cfg.get("hedge_percentile", DEFAULT_HEDGE_PERCENTILE)),
+        "hedge_min_samples": int(cfg.get("hedge_min_samples", DEFAULT_HEDGE_MIN_SAMPLES)),
+    }
+
+
+def get_analysis_workflow():
+    """The analyze-document DAG from module.yaml (cached until the file changes)."""
+    return load_workflow(ANALYSIS_WORKFLOW, default=DEFAULT_ANALYSIS_WORKFLOW)
+
+
+def analysis_prompt_version() -> str:
+    """Hash of the analysis workflow and every node's system prompt; changes with any prompt edit."""
+    workflow = get_analysis_workflow()
+    registry = get_registry()
+    h = hashlib.sha256()
+    for name in workflow.topological_order():
+        deps = ",".join(workflow.nodes[name].depends_on)
+        h.update(f"{name}\0{deps}\0{registry.get_agent(name).prompt_hash}\0".encode("utf-8"))
+    return h.hexdigest()
+
+
+def analysis_coalesce_key(content_hash: str, mode: str | None) -> str:
+    """Single-flight key: runs with the same document contents, prompts and mode give the same result."""
+    mode = mode or get_analysis_settings()["mode"]
+    return hashlib.sha256(f"{content_hash}\0{mode}\0{analysis_prompt_version()}".encode("utf-8")).hexdigest()
+
+
+def _with_app_context(fn):
+    """Wrap fn so it runs inside the caller's app context (for pool threads)."""
+    app = current_app._get_current_object()
+
+    def wrapper(*args, **kwargs):
+        with app.app_context():
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def _generate(system_prompt: str, user_message: str, settings: dict) -> str:
+    """
+    One model call with the run's cache and priority options. A call still running after
+    the hedge_percentile latency of recent analysis calls is hedged with a duplicate request.
+    """
+    call = _with_app_context(
+        lambda: generate_content(
+            system_prompt, user_message, use_cache=settings["use_cache"], priority=settings["priority"]
+        )
+    )
+    governor = get_governor()
+    hedge_after = None
+    if settings.get("hedge_percentile"):
+        hedge_after = governor.latency_percentile(
+            settings["hedge_percentile"], settings["hedge_min_samples"], kind=PRIORITY_ANALYSIS
+        )
+    return hedged_call(call, hedge_after, can_hedge=governor.has_free_slot)
+
+
+def _reduce_partials(system_prompt: str, partials: list[str], settings: dict) -> str:
+    """Merge partial analyses with reduce calls; reduces in groups if they exceed one chunk."""
+    reduce_prompt = f"{system_prompt}\n\n{REDUCE_INSTRUCTIONS}"
+    while True:
+        numbered = [f"## Partial analysis {i + 1} of {len(partials)}\n\n{p}" for i, p in enumerate(partials)]
+        groups = split_into_chunks("\n\n".join(numbered), settings["chunk_size_chars"])
+        if len(groups) == 1 or len(groups) >= len(partials):
+            return _generate(reduce_prompt, "\n\n".join(numbered), settings)
+        partials = [_generate(reduce_prompt, g, settings) for g in groups]
+
+
+def analyze_with_agent(
+    name: str, doc_text: str, chunks: list[str], settings: dict, upstream: dict | None = None
+) -> str:
+    """
+    Run one agent over the document. With a single chunk this is one call; otherwise each
+    chunk is analyzed in parallel (map) and the partial results are merged (reduce).
+    settings: get_analysis_settings() plus the run's use_cache and priority.
+    upstream: results of the agents this one depends on in the workflow, added as context.
+    """
+    system_prompt = build_system_prompt(name)
+    if upstream:
+        context = "\n\n".join(f"## {agent}\n\n{text}" for agent, text in upstream.items())
+        system_prompt = f"{system_prompt}\n\n# Input from other agents\n\n{context}"
+    if len(chunks) <= 1:
+        return _generate(system_prompt, doc_text, settings)
+
+    def map_chunk(index_chunk):
+        i, chunk = index_chunk
+        return _generate(system_prompt, f"[Part {i + 1} of {len(chunks)}]\n\n{chunk}", settings)
+
+    with ThreadPoolExecutor(max_workers=max(1, settings["chunk_concurrency"])) as executor:
+        partials = list(executor.map(_with_app_context(map_chunk), enumerate(chunks)))
+    return _reduce_partials(system_prompt, partials, settings)
+
+
+def run_analysis(
+    document_path: str,
+    project_id: int,
+    on_result=None,
+    content_hash: str | None = None,
+    use_cache: bool = True,
+    mode: str | None = None,
+    priority: str = PRIORITY_ANALYSIS,
+    deadline_seconds: float | None = None,
+    only: set | None = None,
+    prior_results: dict | None = None,
+) -> dict:
     """
     Run full analysis pipeline:
-    1. Parse document
-    2. Alex (overview) then Emma, Sarah, David, Paul (parallel)
-    3. Return agent_results
+    1. Parse document (served from the parsed-text cache when the contents were seen before)
+    2. Run the agents as the analyze-document workflow DAG from module.yaml (by default
+       Alex, Emma, Sarah, David and Paul all run concurrently, each retried once on error)
+    3. Return agent_results and agent_status (completed / error / timed_out per agent)
+
+    on_result: optional callback(agent_name, result_text, status), called from the calling
+    thread as each agent finishes (used by the job queue to report progress).
+    content_hash: SHA-256 of the document if known, saves re-hashing the file.
+    use_cache: False forces fresh model calls instead of cached responses.
+    mode: "single" sends the whole text in one prompt per agent; "chunked" splits it into
+    section-aware chunks and map-reduces each agent; "auto" (default) chunks only documents
+    longer than analysis.chunk_size_chars.
+    priority: LLM governor class for the agent calls ("analysis" or "batch").
+    deadline_seconds: overall budget (default analysis.deadline_seconds). When it passes, the
+    agents that finished are returned and the rest are marked timed_out; each agent is also
+    limited to analysis.agent_timeout_seconds (or its node's timeout_seconds).
+    only: run just these agents (retry of an earlier run); prior_results holds that run's
+    successful results, given as input to agents that depend on them.
     """
-    parsed = parse_document(document_path)
+    started = time.monotonic()
+    parsed = parse_document_cached(document_path, content_hash)
     doc_text = parsed["document_text"]
     doc_metadata = parsed["document_metadata"]
 
     if not doc_text.strip():
         return {"error": "Document is empty or could not extract text"}
 
-    agent_results = {}
-
-    # Step 1: Alex (coordinator overview)
-    try:
-        alex_prompt = build_system_prompt("alex")
-        alex_response = generate_content(alex_prompt, doc_text)
-        agent_results["alex"] = alex_response
-    except Exception as e:
-        agent_results["alex"] = f"Error: {str(e)}"
-
-    # Step 2: Specialist agents (parallel)
-    def run_agent(name):
-        try:
-            prompt = build_system_prompt(name)
-            return name, generate_content(prompt, doc_text)
-        except Exception as e:
-            return name, f"Error: {str(e)}"
-
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        futures = {executor.submit(run_agent, name): name for name in SPECIALIST_AGENTS}
-        for future in as_completed(futures):
-            name, result = future.result()
-            agent_results[name] = result
+    settings = {**get_analysis_settings(), "use_cache": use_cache, "priority": priority}
+    mode = mode or settings["mode"]
+    if mode == "single" or (mode == "auto" and len(doc_text) <= settings["chunk_size_chars"]):
+        chunks = [doc_text]
+    else:
+        chunks = split_into_chunks(doc_text, settings["chunk_size_chars"])
+    doc_metadata = {**doc_metadata, "chunk_count": len(chunks)}
+
+    agent_results, agent_status = {}, {}
+
+    @_with_app_context
+    def run_node(node, inputs):
+        node_settings = {**settings, "chunk_concurrency": node.concurrency or settings["chunk_concurrency"]}
+        return analyze_with_agent(node.name, doc_text, chunks, node_settings, upstream=inputs)
+
+    def on_complete(name, result, error):
+        if error is None:
+            agent_results[name], agent_status[name] = result, AGENT_COMPLETED
+        elif isinstance(error, TimeoutError):
+            agent_results[name], agent_status[name] = f"Timed out: {str(error)}", AGENT_TIMED_OUT
+        else:
+            agent_results[name], agent_status[name] = f"Error: {str(error)}", AGENT_ERROR
+        if on_result:
+            on_result(name, agent_results[name], agent_status[name])
+
+    workflow = get_analysis_workflow()
+    deadline = deadline_seconds or settings["deadline_seconds"]
+    run_workflow(
+        workflow,
+        run_node,
+        on_complete,
+        deadline_seconds=max(0.001, deadline - (time.monotonic() - started)) if deadline else None,
+        node_timeout_seconds=settings["agent_timeout_seconds"] or None,
+        only=only,
+        upstream=prior_results,
+    )
 
     return {
         "document_metadata": doc_metadata,
-        "agent_results": agent_results,
+        "agent_results": {name: agent_results[name] for name in workflow.nodes if name in agent_results},
+        "agent_status": {name: agent_status[name] for name in workflow.nodes if name in agent_status},
     }
 
 
@@ -66,5 +242,7 @@ def save_analysis_output(project_id: int, analysis_id: int, result: dict):
     project_dir = output_path / str(project_id)
     project_dir.mkdir(parents=True, exist_ok=True)
     file_path = project_dir / f"analysis_{analysis_id}.json"
-    with open(file_path, "w", encoding="utf-8") as f:
+    tmp_path = file_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(result, f, indent=2, ensure_ascii=False)
+    tmp_path.replace(file_path)  # a retry rewrites the file; readers never see half of it
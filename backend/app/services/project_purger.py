@@ -0,0 +1,182 @@
+"""
+Background removal of deleted projects.
+
+DELETE /projects/<id> only sets projects.deleted_at: the project and its analyses are gone
+from the API at once (reject_deleted_project answers 404 for their URLs) and the purger
+thread is woken. The purger deletes the project's rows with set-based DELETE ... WHERE statements in batches of
+project_purge.batch_size, each batch its own short transaction so other projects' writes
+are not held up behind one big delete (with per-project shards it also drops the shard
+file), then removes <documents_path>/<id> and <analysis_output>/<id>, and deletes the
+project row last. The thread starts with the first delete, or at startup when a restart
+left projects deleted but not purged.
+"""
+import logging
+import shutil
+import threading
+from pathlib import Path
+
+from flask import abort, current_app
+from sqlalchemy import delete, select
+
+from app.db_shards import drop_shard, locate_analysis, sharding_enabled
+from app.models import Analysis, AnalysisLocation, Conversation, Document, Message, Project, db
+from app.services.config_loader import get_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 2000
+# Seconds between passes while idle (retries failed purges; delete wakes the thread earlier)
+POLL_INTERVAL = 60.0
+
+_app = None
+_thread: threading.Thread | None = None
+_start_lock = threading.Lock()
+_wakeup = threading.Event()
+_stats_lock = threading.Lock()
+_stats = {"projects_purged": 0, "rows_deleted": 0, "errors": 0}
+
+
+def get_batch_size() -> int:
+    cfg = get_config().get("project_purge") or {}
+    return max(1, int(cfg.get("batch_size", DEFAULT_BATCH_SIZE)))
+
+
+def reject_deleted_project(endpoint, values) -> None:
+    """url_value_preprocessor: 404 for URLs of a project (or of its analyses) deleted but not purged yet."""
+    values = values or {}
+    project_id = values.get("project_id")
+    if project_id is None and "analysis_id" in values:
+        if sharding_enabled():
+            project_id = locate_analysis(values["analysis_id"])
+        else:
+            project_id = db.session.execute(
+                select(Analysis.project_id).where(Analysis.id == values["analysis_id"])
+            ).scalar()
+    if project_id is None:
+        return
+    deleted_at = db.session.execute(select(Project.deleted_at).where(Project.id == project_id)).scalar()
+    if deleted_at is not None:
+        abort(404)
+
+
+def project_folders(project_id: int) -> list[Path]:
+    """Files kept per project outside the database: uploads/exports and analysis JSON."""
+    from app.api.projects import _get_project_documents_path
+
+    output = get_config().get("analysis_output")
+    if not output:
+        output = Path(current_app.config["PROJECT_ROOT"]) / "data" / "output" / "analysis"
+    return [_get_project_documents_path(project_id), Path(output) / str(project_id)]
+
+
+def _delete_batched(model, condition, batch_size: int, bind=None) -> int:
+    """DELETE rows of model matching condition, batch_size rows per transaction. Returns count."""
+    total = 0
+    while True:
+        ids = select(model.id).where(condition).limit(batch_size).scalar_subquery()
+        deleted = db.session.execute(
+            delete(model).where(model.id.in_(ids)),
+            execution_options={"synchronize_session": False},
+            bind_arguments={"bind": bind} if bind is not None else None,
+        ).rowcount
+        db.session.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+def delete_project_rows(project_id: int, batch_size: int, bind=None) -> int:
+    """
+    Set-based delete of a project's messages, analyses, documents and conversations (children
+    first). bind: run against this engine instead of the session's routing (e.g. the main
+    database while sharding is on).
+    """
+    conversation_ids = select(Conversation.id).where(Conversation.project_id == project_id)
+    return (
+        _delete_batched(Message, Message.conversation_id.in_(conversation_ids), batch_size, bind)
+        + _delete_batched(Analysis, Analysis.project_id == project_id, batch_size, bind)
+        + _delete_batched(Document, Document.project_id == project_id, batch_size, bind)
+        + _delete_batched(Conversation, Conversation.project_id == project_id, batch_size, bind)
+    )
+
+
+def purge_project(project_id: int) -> int:
+    """Remove a soft-deleted project's rows, shard, folders and finally the project row. Returns rows deleted."""
+    if sharding_enabled():
+        drop_shard(project_id)
+        db.session.execute(delete(AnalysisLocation).where(AnalysisLocation.project_id == project_id))
+        db.session.commit()
+        # Rows the project wrote to the main database before sharding was turned on
+        rows = delete_project_rows(project_id, get_batch_size(), bind=db.engine)
+    else:
+        rows = delete_project_rows(project_id, get_batch_size())
+    for folder in project_folders(project_id):
+        if folder.is_dir():
+            shutil.rmtree(folder, ignore_errors=True)
+    db.session.execute(delete(Project).where(Project.id == project_id, Project.deleted_at.is_not(None)))
+    db.session.commit()
+    return rows
+
+
+def schedule_purge() -> None:
+    """Start or wake the purger after a project was soft-deleted (call in an app context)."""
+    start_purger(current_app._get_current_object())
+    _wakeup.set()
+
+
+def _purge_pending() -> None:
+    project_ids = db.session.execute(
+        select(Project.id).where(Project.deleted_at.is_not(None)).order_by(Project.id)
+    ).scalars().all()
+    db.session.commit()
+    for project_id in project_ids:
+        try:
+            rows = purge_project(project_id)
+        except Exception:
+            db.session.rollback()
+            with _stats_lock:
+                _stats["errors"] += 1
+            logger.exception("Purging project %s failed", project_id)
+            continue
+        logger.info("Purged project %s (%d rows)", project_id, rows)
+        with _stats_lock:
+            _stats["projects_purged"] += 1
+            _stats["rows_deleted"] += rows
+
+
+def _purge_loop() -> None:
+    with _app.app_context():
+        while True:
+            _wakeup.clear()
+            try:
+                _purge_pending()
+            except Exception:
+                logger.exception("Project purge pass failed")
+            finally:
+                db.session.remove()
+            _wakeup.wait(POLL_INTERVAL)
+
+
+def resume_purges(app) -> None:
+    """Start the purger if a previous run left soft-deleted projects behind."""
+    with app.app_context():
+        pending = db.session.execute(select(Project.id).where(Project.deleted_at.is_not(None)).limit(1)).first()
+        db.session.remove()
+    if pending is not None:
+        start_purger(app)
+
+
+def start_purger(app) -> None:
+    """Start the purger thread (idempotent)."""
+    global _app, _thread
+    with _start_lock:
+        if _thread is not None:
+            return
+        _app = app
+        _thread = threading.Thread(target=_purge_loop, name="project-purger", daemon=True)
+        _thread.start()
+
+
+def get_stats() -> dict:
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,128 @@
+"""
+Local agent classifier for chat routing (no model call).
+
+Each conversation agent is described by its keywords, responsibility and description in
+conversation-agents.yaml. Those fields are tokenized into a weighted TF-IDF vector per agent
+(keywords count most, the description least; terms shared by every agent count for nothing).
+A message scores the sum of its terms' weights per agent, plus a bonus for each multi-word
+keyword whose terms it contains in order (compared after tokenizing, so punctuation and
+plurals do not matter). The decision is confident when the best agent clears min_score
+(more than a single description term scores) and the selected agents beat the best
+unselected one by min_margin.
+"""
+import math
+import re
+from dataclasses import dataclass
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+FIELD_WEIGHTS = {"keywords": 3.0, "responsibility": 2.0, "description": 1.0}
+PHRASE_BONUS = 2.0
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its me my of on or our please "
+    "should that the their this to we what when which who why will with you your can do does "
+    "need want about any all".split()
+)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace (routing cache key)."""
+    return " ".join((text or "").lower().split())
+
+
+def _stem(token: str) -> str:
+    # Light plural folding: stakeholders -> stakeholder, stories -> story (not "analysis")
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "is", "us")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(t) for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    agent_ids: tuple
+    confidence: float  # 0..1 margin between the selected agents and the rest
+    scores: tuple  # ((agent_id, score), ...) best first
+    confident: bool
+
+
+class RouteClassifier:
+    """TF-IDF + keyword-phrase scorer over conversation agents."""
+
+    def __init__(
+        self,
+        agents,
+        allow_multiple: bool = True,
+        min_score: float = 2.5,
+        min_margin: float = 0.35,
+        multi_ratio: float = 0.8,
+    ):
+        self.allow_multiple = allow_multiple
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.multi_ratio = min(multi_ratio, 1.0)  # above 1 not even the top agent would qualify
+        self.agent_ids = [a.get("id") for a in agents if a.get("id")]
+
+        term_weights = {}
+        phrases = {}
+        for a in agents:
+            agent_id = a.get("id")
+            if not agent_id:
+                continue
+            weights: dict = {}
+            for keyword in a.get("keywords") or ():
+                terms = tokenize(str(keyword))
+                for t in terms:
+                    weights[t] = weights.get(t, 0.0) + FIELD_WEIGHTS["keywords"]
+                if len(terms) > 1:
+                    phrases.setdefault(agent_id, []).append(" ".join(terms))
+            for field in ("responsibility", "description"):
+                for t in tokenize(str(a.get(field) or "")):
+                    weights[t] = weights.get(t, 0.0) + FIELD_WEIGHTS[field]
+            term_weights[agent_id] = weights
+
+        n = max(len(term_weights), 1)
+        df: dict = {}
+        for weights in term_weights.values():
+            for t in weights:
+                df[t] = df.get(t, 0) + 1
+        # term -> [(agent_id, weight)], with idf folded in so scoring is one dict lookup per token
+        self._index: dict = {}
+        for agent_id, weights in term_weights.items():
+            for t, w in weights.items():
+                idf = math.log(n / df[t])
+                if idf > 0:
+                    self._index.setdefault(t, []).append((agent_id, (1 + math.log(w)) * idf))
+        self._phrases = {agent_id: tuple(p) for agent_id, p in phrases.items()}
+
+    def classify(self, text: str) -> RouteDecision:
+        scores = {agent_id: 0.0 for agent_id in self.agent_ids}
+        tokens = tokenize(text)
+        for t in set(tokens):
+            for agent_id, weight in self._index.get(t, ()):
+                scores[agent_id] += weight
+        joined = f" {' '.join(tokens)} "
+        for agent_id, phrases in self._phrases.items():
+            for phrase in phrases:
+                if f" {phrase} " in joined:
+                    scores[agent_id] += PHRASE_BONUS
+
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        if not ranked or ranked[0][1] <= 0:
+            return RouteDecision((), 0.0, tuple(ranked), False)
+        top = ranked[0][1]
+        if self.allow_multiple:
+            selected = [agent_id for agent_id, score in ranked if score > 0 and score >= top * self.multi_ratio]
+        else:
+            selected = [ranked[0][0]]
+        lowest_selected = scores[selected[-1]]
+        runner_up = ranked[len(selected)][1] if len(ranked) > len(selected) else 0.0
+        confidence = 1.0 - runner_up / lowest_selected
+        confident = top >= self.min_score and confidence >= self.min_margin
+        return RouteDecision(tuple(selected), round(confidence, 3), tuple(ranked), confident)
@@ -0,0 +1,239 @@
+"""
+Declarative DAG engine for agent workflows.
+
+A workflow is read from the `workflows` section of the ba-analysis module.yaml:
+
+    workflows:
+      analyze-document:
+        max_parallel: 5
+        nodes:
+          alex: { depends_on: [] }
+          emma: { depends_on: [], retries: 1, concurrency: 4 }
+
+Every node runs as soon as all of its depends_on nodes have finished, up to max_parallel
+nodes at a time. A node that raises is retried `retries` times (with retry_backoff_seconds
+between attempts); if it still fails, its dependents are skipped.
+
+A node still running after its timeout_seconds, or any node unfinished when the run's
+deadline passes, is reported with NodeTimeoutError and abandoned: the engine returns
+without waiting for its thread, so one hung call cannot hold back the whole workflow.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+
+import yaml
+
+from app.agents.base import BA_ANALYSIS_ROOT
+
+MODULE_YAML = BA_ANALYSIS_ROOT / "module.yaml"
+
+
+class WorkflowError(ValueError):
+    """Invalid workflow definition (unknown dependency, cycle, missing workflow)."""
+
+
+class NodeTimeoutError(TimeoutError):
+    """A node exceeded its timeout or the workflow deadline passed before it finished."""
+
+
+@dataclass(frozen=True)
+class NodeSpec:
+    name: str
+    depends_on: tuple = ()
+    retries: int = 0
+    retry_backoff_seconds: float = 1.0
+    concurrency: int | None = None  # per-node cap for parallel sub-calls (e.g. chunk map)
+    timeout_seconds: float | None = None
+
+
+@dataclass(frozen=True)
+class Workflow:
+    name: str
+    nodes: dict = field(default_factory=dict)  # name -> NodeSpec, in declaration order
+    max_parallel: int = 4
+
+    def topological_order(self) -> list[str]:
+        """Node names in dependency order (declaration order among independent nodes)."""
+        order, state = [], {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise WorkflowError(f"Workflow {self.name} has a cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in self.nodes[name].depends_on:
+                visit(dep, path + [name])
+            state[name] = "done"
+            order.append(name)
+
+        for name in self.nodes:
+            visit(name, [])
+        return order
+
+
+def _parse_workflow(name: str, data: dict) -> Workflow:
+    raw_nodes = data.get("nodes") or {}
+    if not raw_nodes:
+        raise WorkflowError(f"Workflow {name} has no nodes")
+    nodes = {}
+    for node_name, spec in raw_nodes.items():
+        spec = spec or {}
+        nodes[node_name] = NodeSpec(
+            name=node_name,
+            depends_on=tuple(spec.get("depends_on") or ()),
+            retries=int(spec.get("retries", 0)),
+            retry_backoff_seconds=float(spec.get("retry_backoff_seconds", 1.0)),
+            concurrency=int(spec["concurrency"]) if spec.get("concurrency") else None,
+            timeout_seconds=float(spec["timeout_seconds"]) if spec.get("timeout_seconds") else None,
+        )
+    for node in nodes.values():
+        unknown = [d for d in node.depends_on if d not in nodes]
+        if unknown:
+            raise WorkflowError(f"Node {node.name} depends on unknown node(s): {', '.join(unknown)}")
+    workflow = Workflow(name=name, nodes=nodes, max_parallel=int(data.get("max_parallel", len(nodes))))
+    workflow.topological_order()  # validates: no cycles
+    return workflow
+
+
+_cache: dict = {}
+_cache_lock = threading.Lock()
+
+
+def load_workflow(name: str, default: dict | None = None) -> Workflow:
+    """
+    Load a workflow from module.yaml (re-read only when the file's mtime changes).
+    default: definition used when module.yaml has no entry for name.
+    """
+    mtime = MODULE_YAML.stat().st_mtime if MODULE_YAML.exists() else None
+    with _cache_lock:
+        cached = _cache.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    data = {}
+    if mtime is not None:
+        with open(MODULE_YAML, encoding="utf-8") as f:
+            data = ((yaml.safe_load(f) or {}).get("workflows") or {}).get(name) or {}
+    if not data:
+        if default is None:
+            raise WorkflowError(f"Workflow not found: {name}")
+        data = default
+    workflow = _parse_workflow(name, data)
+    with _cache_lock:
+        _cache[name] = (mtime, workflow)
+    return workflow
+
+
+def _run_with_retries(node: NodeSpec, run_node, inputs: dict, started: dict, abandoned: set):
+    started[node.name] = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            return run_node(node, inputs)
+        except Exception:
+            if attempt >= node.retries or node.name in abandoned:
+                raise
+            attempt += 1
+            time.sleep(node.retry_backoff_seconds * attempt)
+
+
+def run_workflow(
+    workflow: Workflow,
+    run_node,
+    on_complete=None,
+    only: set | None = None,
+    deadline_seconds: float | None = None,
+    node_timeout_seconds: float | None = None,
+    upstream: dict | None = None,
+) -> dict:
+    """
+    Execute the DAG. run_node(node_spec, inputs) -> result, where inputs maps each dependency
+    name to its result; it runs on pool threads. on_complete(name, result, error) is called
+    from the calling thread as each node finishes (error is the exception or None).
+    only: restrict execution to these nodes (dependencies outside the set are treated as done).
+    upstream: earlier results of nodes outside only, passed as inputs to their dependents.
+    deadline_seconds: overall budget; unfinished nodes then fail with NodeTimeoutError.
+    node_timeout_seconds: default per-node timeout (a node's timeout_seconds overrides it).
+    Returns {name: result} for nodes that succeeded.
+    """
+    names = [n for n in workflow.topological_order() if only is None or n in only]
+    remaining = {n: {d for d in workflow.nodes[n].depends_on if d in names} for n in names}
+    results, failed = {}, set()
+    deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+    started: dict = {}
+    abandoned: set = set()  # timed-out nodes: their threads must not retry
+    running = {}
+
+    def finish(name, result, error):
+        if error is not None:
+            failed.add(name)
+        else:
+            results[name] = result
+        if on_complete:
+            on_complete(name, result, error)
+
+    def schedule_ready():
+        for name in list(remaining):
+            deps = remaining[name]
+            if deps & failed:
+                del remaining[name]
+                blocked = ", ".join(sorted(deps & failed))
+                finish(name, None, RuntimeError(f"skipped: dependency {blocked} failed"))
+            elif not deps - results.keys():
+                del remaining[name]
+                node = workflow.nodes[name]
+                available = {**(upstream or {}), **results}
+                inputs = {d: available[d] for d in node.depends_on if d in available}
+                future = executor.submit(_run_with_retries, node, run_node, inputs, started, abandoned)
+                running[future] = name
+
+    def node_expiry(name):
+        timeout = workflow.nodes[name].timeout_seconds or node_timeout_seconds
+        if not timeout or name not in started:
+            return None
+        return started[name] + timeout
+
+    executor = ThreadPoolExecutor(max_workers=max(1, workflow.max_parallel))
+    try:
+        schedule_ready()
+        while running:
+            expiries = [e for e in (node_expiry(n) for n in running.values()) if e is not None]
+            if deadline is not None:
+                expiries.append(deadline)
+            timeout = None
+            if expiries:
+                timeout = max(0.0, min(expiries) - time.monotonic())
+            if any(n not in started for n in running.values()):
+                timeout = min(timeout, 0.5) if timeout is not None else 0.5  # re-check once queued nodes start
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    finish(name, future.result(), None)
+                except Exception as e:
+                    finish(name, None, e)
+
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                for future, name in list(running.items()):
+                    del running[future]
+                    abandoned.add(name)
+                    finish(name, None, NodeTimeoutError("workflow deadline passed"))
+                for name in list(remaining):
+                    del remaining[name]
+                    finish(name, None, NodeTimeoutError("workflow deadline passed"))
+                break
+            for future, name in list(running.items()):
+                expiry = node_expiry(name)
+                if expiry is not None and now >= expiry:
+                    del running[future]
+                    abandoned.add(name)
+                    timeout = workflow.nodes[name].timeout_seconds or node_timeout_seconds
+                    finish(name, None, NodeTimeoutError(f"timed out after {timeout:g}s"))
+            schedule_ready()
+    finally:
+        # Abandoned nodes keep their threads until their in-flight call returns; don't wait for them
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
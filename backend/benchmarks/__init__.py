@@ -0,0 +1 @@
+"""Performance benchmarks. Run from backend/: python3 -m benchmarks.<name>."""
@@ -0,0 +1,112 @@
+"""
+Benchmark parallel chat turns in different conversations on one SQLite database.
+
+Each of --conversations threads posts --turns user messages to its own conversation while a
+probe thread keeps creating projects (a short write). The Gemini SDK is replaced by a fake
+model that answers after --latency-ms. create_message commits before the model call and
+writes the reply in its own short transaction, so turns overlap and the probe's writes are
+not queued behind model calls: wall time stays close to one conversation's time, and no
+request fails with "database is locked".
+
+Usage (from backend/):
+  python3 -m benchmarks.chat_concurrency [--conversations 8] [--turns 5] [--latency-ms 300]
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import google.generativeai as genai  # noqa: E402
+
+from benchmarks.chat_turn import MODEL_CALLS, fake_model_class, percentile  # noqa: E402
+
+
+def chat_worker(app, url: str, turns: int, tag: int, errors: list) -> None:
+    client = app.test_client()
+    for i in range(turns):
+        r = client.post(url, json={"role": "user", "content": f"[{tag}.{i}] Which risks should we log?"})
+        if r.status_code != 201:
+            errors.append(r.get_json())
+
+
+def probe_writes(app, stop: threading.Event, latencies: list, errors: list) -> None:
+    client = app.test_client()
+    while not stop.is_set():
+        start = time.perf_counter()
+        r = client.post("/api/v1/projects", json={"name": "probe"})
+        latencies.append(time.perf_counter() - start)
+        if r.status_code != 201:
+            errors.append(r.get_json())
+        time.sleep(0.02)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    genai.GenerativeModel = fake_model_class(args.latency_ms / 1000)
+    genai.configure = lambda **kwargs: None
+
+    from app.services import config_loader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cfg = config_loader.load_config()
+        for key in ("database_path", "documents_path", "output_folder", "analysis_output"):
+            cfg[key] = str(Path(tmp) / key)
+        # One router call + one reply call per turn; the governor and summaries stay out of the way
+        cfg["agent_router"] = {**(cfg.get("agent_router") or {}), "local_enabled": False, "batch_window_ms": 0}
+        cfg["llm_governor"] = {"rate_per_second": 1000, "burst": 1000, "max_concurrency": 256, "initial_concurrency": 256}
+        cfg["chat_history"] = {"summary_enabled": False}
+        config_loader._config_cache = cfg
+        config_loader.ensure_data_dirs(cfg)
+
+        from app import create_app
+
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp}/bench.db", "GEMINI_API_KEY": "bench"})
+        client = app.test_client()
+        project = client.post("/api/v1/projects", json={"name": "bench"}).get_json()
+        urls = []
+        for n in range(args.conversations):
+            conv = client.post(f"/api/v1/projects/{project['id']}/conversations", json={"title": f"c{n}"}).get_json()
+            urls.append(f"/api/v1/projects/{project['id']}/conversations/{conv['id']}/messages")
+
+        chat_errors, probe_errors, probe_latencies = [], [], []
+        stop = threading.Event()
+        probe = threading.Thread(target=probe_writes, args=(app, stop, probe_latencies, probe_errors))
+        workers = [
+            threading.Thread(target=chat_worker, args=(app, url, args.turns, n, chat_errors))
+            for n, url in enumerate(urls)
+        ]
+        start = time.perf_counter()
+        probe.start()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        wall = time.perf_counter() - start
+        stop.set()
+        probe.join()
+
+        turns = args.conversations * args.turns
+        one_conversation = args.turns * (MODEL_CALLS["count"] / max(turns, 1)) * args.latency_ms / 1000
+        print(f"{args.conversations} conversations x {args.turns} turns, model latency {args.latency_ms:g} ms")
+        print(f"wall time:   {wall:6.2f}s  (one conversation alone ~{one_conversation:.2f}s, serialized ~{one_conversation * args.conversations:.2f}s)")
+        print(f"chat turns:  {turns - len(chat_errors)}/{turns} ok")
+        if probe_latencies:
+            print(
+                f"probe write: {len(probe_latencies)} writes, p50 {percentile(probe_latencies, 50) * 1000:.1f} ms, "
+                f"max {max(probe_latencies) * 1000:.1f} ms, {len(probe_errors)} failed"
+            )
+        for error in (chat_errors + probe_errors)[:3]:
+            print("error:", error)
+
+
+if __name__ == "__main__":
+    main()
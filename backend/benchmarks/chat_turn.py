@@ -0,0 +1,120 @@
+"""
+Benchmark chat turn latency: router call + reply call vs single-pass (one call).
+
+Runs POST .../messages through the Flask test client against a temp SQLite database, with
+the Gemini SDK replaced by a fake model that answers after --latency-ms. Local routing is
+disabled so every turn needs a model routing decision (the case single-pass removes a
+round trip from); each turn uses a new message so no cache answers it.
+
+Usage (from backend/):
+  python3 -m benchmarks.chat_turn [--turns 40] [--latency-ms 300]
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import google.generativeai as genai  # noqa: E402
+
+MODEL_CALLS = {"count": 0}
+
+
+class _FakeResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _FakeChat:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def send_message(self, content, generation_config=None, **kwargs):
+        MODEL_CALLS["count"] += 1
+        time.sleep(self.latency)
+        reply = f"Noted: {content[:40]}"
+        if generation_config and generation_config.get("response_mime_type") == "application/json":
+            return _FakeResponse(json.dumps({"agents": ["alex"], "reply": reply}))
+        return _FakeResponse(reply)
+
+
+def fake_model_class(latency: float):
+    class FakeModel:
+        def __init__(self, model_name, system_instruction=None, **kwargs):
+            self.system_instruction = system_instruction
+
+        def generate_content(self, prompt, **kwargs):
+            MODEL_CALLS["count"] += 1
+            time.sleep(latency)
+            return _FakeResponse('["alex"]')
+
+        def start_chat(self, history=None):
+            return _FakeChat(latency)
+
+    return FakeModel
+
+
+def percentile(samples: list[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def run_turns(client, url: str, turns: int, single_pass: bool, tag: str) -> list[float]:
+    latencies = []
+    for i in range(turns):
+        body = {
+            "role": "user",
+            "content": f"[{tag} {i}] What should we clarify next about the rollout?",
+            "single_pass": single_pass,
+        }
+        start = time.perf_counter()
+        r = client.post(url, json=body)
+        latencies.append(time.perf_counter() - start)
+        assert r.status_code == 201, r.get_json()
+        assert r.get_json()["assistant_message"]["agent_id"] == "alex"
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    genai.GenerativeModel = fake_model_class(args.latency_ms / 1000)
+    genai.configure = lambda **kwargs: None
+
+    from app.services import config_loader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cfg = config_loader.load_config()
+        for key in ("database_path", "documents_path", "output_folder", "analysis_output"):
+            cfg[key] = str(Path(tmp) / key)
+        cfg["agent_router"] = {**(cfg.get("agent_router") or {}), "local_enabled": False, "batch_window_ms": 0}
+        config_loader._config_cache = cfg
+        config_loader.ensure_data_dirs(cfg)
+
+        from app import create_app
+
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp}/bench.db", "GEMINI_API_KEY": "bench"})
+        client = app.test_client()
+        project = client.post("/api/v1/projects", json={"name": "bench"}).get_json()
+        conv = client.post(f"/api/v1/projects/{project['id']}/conversations", json={"title": "bench"}).get_json()
+        url = f"/api/v1/projects/{project['id']}/conversations/{conv['id']}/messages"
+
+        print(f"{args.turns} turns per mode, model latency {args.latency_ms:g} ms")
+        for label, single_pass in (("two-call", False), ("single-pass", True)):
+            MODEL_CALLS["count"] = 0
+            latencies = run_turns(client, url, args.turns, single_pass, label)
+            print(
+                f"{label:12s} p50 {percentile(latencies, 50) * 1000:7.1f} ms  "
+                f"p95 {percentile(latencies, 95) * 1000:7.1f} ms  "
+                f"model calls/turn {MODEL_CALLS['count'] / args.turns:.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
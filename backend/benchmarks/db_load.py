@@ -0,0 +1,127 @@
+"""
+Concurrent read/write load test of the SQLite engine profile.
+
+Runs the same workload twice on a fresh temp database: once with SQLite defaults (rollback
+journal, synchronous=FULL, no read pool) and once with the `sqlite` profile from config.yaml
+(WAL, synchronous=NORMAL, busy timeout, cache/mmap, query_only read pool). --writers threads
+post messages (role "system", so no model call) while --readers threads page through
+messages and list conversations, for --seconds each; throughput, p95 latency and failed
+requests are reported per profile.
+
+Usage (from backend/):
+  python3 -m benchmarks.db_load [--writers 4] [--readers 8] [--seconds 10]
+"""
+import argparse
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.db_engine import get_sqlite_settings  # noqa: E402
+from benchmarks.chat_turn import percentile  # noqa: E402
+
+SEED_MESSAGES = 2000
+CONVERSATIONS = 8
+
+SQLITE_DEFAULTS = {
+    "journal_mode": "DELETE",
+    "synchronous": "FULL",
+    "busy_timeout_ms": 5000,  # pysqlite's default timeout
+    "cache_size_kib": 2000,
+    "mmap_size_mb": 0,
+    "pool_size": 5,
+    "max_overflow": 10,
+    "pool_timeout": 30,
+    "read_pool_enabled": False,
+    "read_pool_size": 0,
+}
+
+
+def run_profile(name: str, sqlite_settings: dict, args, tmp: Path) -> None:
+    from app.services import config_loader
+
+    cfg = config_loader.load_config()
+    for key in ("database_path", "documents_path", "output_folder", "analysis_output"):
+        cfg[key] = str(tmp / name / key)
+    cfg["sqlite"] = sqlite_settings
+    config_loader._config_cache = cfg
+    config_loader.ensure_data_dirs(cfg)
+
+    from app import create_app
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp / name}/bench.db", "ANALYSIS_WORKERS": 0})
+    client = app.test_client()
+    project = client.post("/api/v1/projects", json={"name": "load"}).get_json()
+    urls = []
+    for n in range(CONVERSATIONS):
+        conv = client.post(f"/api/v1/projects/{project['id']}/conversations", json={"title": f"c{n}"}).get_json()
+        urls.append(f"/api/v1/projects/{project['id']}/conversations/{conv['id']}/messages")
+    for i in range(SEED_MESSAGES):
+        client.post(urls[i % CONVERSATIONS], json={"role": "system", "content": f"seed {i}"})
+
+    results = {"read": [], "write": []}
+    failures = {"read": 0, "write": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def worker(kind: str, n: int):
+        c = app.test_client()
+        i = 0
+        while not stop.is_set():
+            url = urls[(n + i) % CONVERSATIONS]
+            start = time.perf_counter()
+            if kind == "write":
+                r = c.post(url, json={"role": "system", "content": f"load {n}.{i} " + "x" * 200})
+                ok = r.status_code == 201
+            elif i % 4 == 3:
+                r = c.get(f"/api/v1/projects/{project['id']}/conversations")
+                ok = r.status_code == 200
+            else:
+                r = c.get(f"{url}?limit=50")
+                ok = r.status_code == 200
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    results[kind].append(elapsed)
+                else:
+                    failures[kind] += 1
+            i += 1
+
+    threads = [threading.Thread(target=worker, args=("write", n)) for n in range(args.writers)]
+    threads += [threading.Thread(target=worker, args=("read", n)) for n in range(args.readers)]
+    app.testing = False  # report errors as 500s instead of raising in the worker threads
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    print(f"{name}:")
+    for kind in ("write", "read"):
+        samples = results[kind]
+        p95 = percentile(samples, 95) * 1000 if samples else float("nan")
+        print(
+            f"  {kind:5s} {len(samples) / args.seconds:8.1f} req/s  p95 {p95:7.1f} ms  failed {failures[kind]}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    tuned = get_sqlite_settings()
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{args.writers} writers + {args.readers} readers, {args.seconds:g}s per profile")
+        run_profile("sqlite-defaults", SQLITE_DEFAULTS, args, Path(tmp))
+        run_profile("tuned-profile", tuned, args, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
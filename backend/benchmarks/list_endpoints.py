@@ -0,0 +1,180 @@
+"""
+Benchmark the list endpoints on a large SQLite database, before and after the index migrations.
+
+Builds a temp database with --messages messages spread over conversations and projects
+(rows of different conversations interleaved, as in real use), drops the foreign-key and
+ordering indexes and rolls schema_version back to before them, times the list endpoints,
+then lets run_migrations() re-create the indexes and times them again.
+
+Usage (from backend/):
+  python3 -m benchmarks.list_endpoints [--messages 1000000] [--conversations 2000] [--repeat 20]
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import db_migrate  # noqa: E402
+from app.models import db  # noqa: E402
+
+CONVERSATIONS_PER_PROJECT = 10
+DOCUMENTS_PER_PROJECT = 50
+# Migration steps that create MESSAGE_KEYSET_INDEXES and LIST_INDEXES
+INDEX_STEPS = (8, 9)
+
+
+def build_database(path: Path, messages: int, conversations: int) -> None:
+    """Fill the (already created) schema with synthetic rows using plain sqlite3."""
+    projects = max(1, conversations // CONVERSATIONS_PER_PROJECT)
+    t0 = datetime(2025, 1, 1)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA synchronous=OFF")
+    con.execute("PRAGMA journal_mode=MEMORY")
+    con.executemany(
+        "INSERT INTO projects (id, name, created_at, updated_at) VALUES (?, ?, ?, ?)",
+        [(p, f"Project {p}", t0, t0 + timedelta(minutes=p)) for p in range(1, projects + 1)],
+    )
+    con.executemany(
+        "INSERT INTO conversations (id, project_id, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (c, (c - 1) % projects + 1, f"Chat {c}", t0, t0 + timedelta(seconds=c))
+            for c in range(1, conversations + 1)
+        ],
+    )
+    con.executemany(
+        "INSERT INTO documents (project_id, filename, file_path, created_at) VALUES (?, ?, ?, ?)",
+        [
+            ((d - 1) % projects + 1, f"doc{d}.txt", f"/tmp/doc{d}.txt", t0 + timedelta(seconds=d))
+            for d in range(1, projects * DOCUMENTS_PER_PROJECT + 1)
+        ],
+    )
+    text = "We need the login flow to support SSO and a fallback for contractors. " * 3
+
+    def rows():
+        for m in range(1, messages + 1):
+            # Round-robin over conversations: each conversation's rows are spread over the table
+            yield (
+                m,
+                (m - 1) % conversations + 1,
+                "user" if m % 2 else "assistant",
+                text,
+                t0 + timedelta(seconds=m),
+                "complete",
+            )
+
+    con.executemany(
+        "INSERT INTO messages (id, conversation_id, role, content, created_at, status) VALUES (?, ?, ?, ?, ?, ?)",
+        rows(),
+    )
+    con.commit()
+    con.close()
+
+
+def drop_indexes(path: Path) -> None:
+    """Return the database to the schema before the index migrations (INDEX_STEPS)."""
+    con = sqlite3.connect(path)
+    for name, _, _ in db_migrate.MESSAGE_KEYSET_INDEXES + db_migrate.LIST_INDEXES:
+        con.execute(f"DROP INDEX IF EXISTS {name}")
+    con.executemany("DELETE FROM schema_version WHERE version = ?", [(v,) for v in INDEX_STEPS])
+    con.commit()
+    con.close()
+
+
+def time_endpoints(client, projects: int, conversations: int, messages: int, repeat: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    per_conversation = messages // conversations
+    timings = {}
+
+    def measure(label, url_fn):
+        samples = []
+        for _ in range(repeat):
+            url = url_fn()
+            start = time.perf_counter()
+            r = client.get(url)
+            samples.append(time.perf_counter() - start)
+            assert r.status_code == 200, (url, r.status_code)
+        timings[label] = statistics.median(samples)
+
+    def conv_url():
+        c = rng.randint(1, conversations)
+        return c, f"/api/v1/projects/{(c - 1) % projects + 1}/conversations/{c}/messages"
+
+    def page_before():
+        c, url = conv_url()
+        middle = c + conversations * (per_conversation // 2)
+        return f"{url}?before_id={middle}&limit=50"
+
+    def since():
+        c, url = conv_url()
+        recent = c + conversations * (per_conversation - 3)
+        return f"{url}?since={recent}"
+
+    measure("GET projects", lambda: "/api/v1/projects")
+    measure("GET conversations", lambda: f"/api/v1/projects/{rng.randint(1, projects)}/conversations")
+    measure("GET documents", lambda: f"/api/v1/projects/{rng.randint(1, projects)}/documents")
+    measure("GET messages ?limit=50", lambda: conv_url()[1] + "?limit=50")
+    measure("GET messages ?before_id", page_before)
+    measure("GET messages ?since", since)
+    measure(f"GET messages (all {per_conversation})", lambda: conv_url()[1])
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    projects = max(1, args.conversations // CONVERSATIONS_PER_PROJECT)
+
+    from app.services import config_loader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cfg = config_loader.load_config()
+        for key in ("database_path", "documents_path", "output_folder", "analysis_output"):
+            cfg[key] = str(Path(tmp) / key)
+        config_loader._config_cache = cfg
+        config_loader.ensure_data_dirs(cfg)
+
+        from app import create_app
+
+        db_path = Path(tmp) / "bench.db"
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}", "ANALYSIS_WORKERS": 0})
+        with app.app_context():
+            db.engine.dispose()  # the fixture is written with plain sqlite3
+
+        start = time.perf_counter()
+        build_database(db_path, args.messages, args.conversations)
+        drop_indexes(db_path)
+        print(
+            f"fixture: {args.messages} messages, {args.conversations} conversations, {projects} projects "
+            f"({db_path.stat().st_size / 1e6:.0f} MB, built in {time.perf_counter() - start:.1f}s)"
+        )
+
+        client = app.test_client()
+        before = time_endpoints(client, projects, args.conversations, args.messages, args.repeat, seed=1)
+
+        start = time.perf_counter()
+        with app.app_context():
+            db.engine.dispose()
+        applied = db_migrate.run_migrations(app)
+        print(f"run_migrations applied {applied} in {time.perf_counter() - start:.1f}s")
+        after = time_endpoints(client, projects, args.conversations, args.messages, args.repeat, seed=1)
+
+        print(f"{'median latency':32s} {'before':>10s} {'after':>10s}")
+        for label in before:
+            print(
+                f"{label:32s} {before[label] * 1000:8.2f}ms {after[label] * 1000:8.2f}ms "
+                f"({before[label] / after[label]:.0f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Conversation list with per-row counts: N+1 requests vs the denormalized counters.
+
+Builds a temp database with --messages messages (as benchmarks.list_endpoints does), times
+migration 11's backfill of the counters, then compares what a client had to do to show
+message counts and last messages in a project's conversation list (GET conversations, then
+GET messages for every conversation) with the single GET conversations that now returns
+message_count, last_message_at and last_message_preview.
+
+Usage (from backend/):
+  python3 -m benchmarks.list_summaries [--messages 1000000] [--conversations 2000] [--repeat 10]
+"""
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app import db_migrate  # noqa: E402
+from app.models import db  # noqa: E402
+from benchmarks.list_endpoints import CONVERSATIONS_PER_PROJECT, build_database  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    projects = max(1, args.conversations // CONVERSATIONS_PER_PROJECT)
+
+    from app.services import config_loader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cfg = config_loader.load_config()
+        for key in ("database_path", "documents_path", "output_folder", "analysis_output"):
+            cfg[key] = str(Path(tmp) / key)
+        config_loader._config_cache = cfg
+        config_loader.ensure_data_dirs(cfg)
+
+        from app import create_app
+
+        db_path = Path(tmp) / "bench.db"
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}", "ANALYSIS_WORKERS": 0})
+        with app.app_context():
+            db.engine.dispose()  # the fixture is written with plain sqlite3
+        build_database(db_path, args.messages, args.conversations)
+
+        start = time.perf_counter()
+        with app.app_context(), db.engine.begin() as conn:
+            db_migrate._activity_counters(conn)
+        print(
+            f"fixture: {args.messages} messages, {args.conversations} conversations, {projects} projects; "
+            f"counter backfill {time.perf_counter() - start:.1f}s"
+        )
+
+        client = app.test_client()
+        rng = random.Random(1)
+        per_row, single = [], []
+        for _ in range(args.repeat):
+            project_id = rng.randint(1, projects)
+            url = f"/api/v1/projects/{project_id}/conversations"
+
+            start = time.perf_counter()
+            convs = client.get(url).get_json()
+            for conv in convs:
+                client.get(f"{url}/{conv['id']}/messages").get_json()
+            per_row.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            convs = client.get(url).get_json()
+            assert all("message_count" in c for c in convs)
+            single.append(time.perf_counter() - start)
+
+        print(f"{'median, one project list':40s} {'time':>9s}")
+        print(f"{'GET conversations + GET messages per row':40s} {statistics.median(per_row) * 1000:7.1f}ms")
+        print(f"{'GET conversations (counters)':40s} {statistics.median(single) * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
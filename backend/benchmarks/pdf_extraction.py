@@ -0,0 +1,97 @@
+"""
+Benchmark serial vs parallel PDF text extraction (document_parser.iter_pdf_pages).
+
+Generates a text-heavy PDF fixture (500 pages by default) in a temp directory and
+reports pages/second for both modes.
+
+Usage (from backend/):
+  python3 -m benchmarks.pdf_extraction [--pages 500] [--workers 4]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import document_parser  # noqa: E402
+
+LINES_PER_PAGE = 60
+
+
+def write_fixture_pdf(path: Path, pages: int) -> None:
+    """Write a minimal multi-page PDF with LINES_PER_PAGE lines of Helvetica text per page."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # pages tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for n in range(pages):
+        lines = [
+            f"({n + 1}.{i} The system shall validate requirement REQ-{n:04d}-{i:02d} against stakeholder needs.) Tj T*"
+            for i in range(LINES_PER_PAGE)
+        ]
+        stream = ("BT /F1 9 Tf 11 TL 40 800 Td\n" + "\n".join(lines) + "\nET").encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % i for i in page_ids)
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+    path.write_bytes(bytes(out))
+
+
+def measure(path: Path, parallel: bool) -> tuple[float, int, int]:
+    start = time.perf_counter()
+    pages = 0
+    chars = 0
+    for text in document_parser.iter_pdf_pages(path, parallel=parallel):
+        pages += 1
+        chars += len(text)
+    return time.perf_counter() - start, pages, chars
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=document_parser.DEFAULT_PDF_WORKERS)
+    args = parser.parse_args()
+
+    from app.services import config_loader
+
+    config_loader._config_cache = {"document_parser": {"workers": args.workers}}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = Path(tmp) / "fixture.pdf"
+        write_fixture_pdf(fixture, args.pages)
+        print(f"fixture: {args.pages} pages, {fixture.stat().st_size / 1e6:.1f} MB, workers={args.workers}")
+
+        # Warm the process pool so spawn start-up is not billed to the parallel run
+        measure(fixture, parallel=True)
+
+        serial_s, pages, chars = measure(fixture, parallel=False)
+        parallel_s, p_pages, p_chars = measure(fixture, parallel=True)
+        assert (pages, chars) == (p_pages, p_chars), "parallel output differs from serial"
+
+        print(f"serial:   {serial_s:7.2f}s  {pages / serial_s:8.1f} pages/s")
+        print(f"parallel: {parallel_s:7.2f}s  {pages / parallel_s:8.1f} pages/s  ({serial_s / parallel_s:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
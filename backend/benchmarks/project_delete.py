@@ -0,0 +1,92 @@
+"""
+Delete one large project: ORM cascade (the old DELETE /projects/<id>) vs soft delete + purger.
+
+Builds a project with --messages messages (plus its conversations and documents) in a temp
+database, copies it, then on one copy deletes the Project through the ORM (every child row
+is loaded to cascade the delete) and on the other times the new DELETE request and the
+background purge it starts (set-based batched DELETEs). Reports wall time and peak Python
+memory (tracemalloc, all threads) of each.
+
+Usage (from backend/):
+  python3 -m benchmarks.project_delete [--messages 50000]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.models import Project, db  # noqa: E402
+from benchmarks.list_endpoints import CONVERSATIONS_PER_PROJECT, build_database  # noqa: E402
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=50_000)
+    args = parser.parse_args()
+
+    from app.services import config_loader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cfg = config_loader.load_config()
+        for key in ("database_path", "documents_path", "output_folder", "analysis_output"):
+            cfg[key] = str(Path(tmp) / key)
+        config_loader._config_cache = cfg
+        config_loader.ensure_data_dirs(cfg)
+
+        from app import create_app
+
+        base = Path(tmp) / "base.db"
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{base}", "ANALYSIS_WORKERS": 0})
+        with app.app_context():
+            db.engine.dispose()  # the fixture is written with plain sqlite3
+        build_database(base, args.messages, CONVERSATIONS_PER_PROJECT)  # one project
+        print(f"project with {args.messages} messages, {CONVERSATIONS_PER_PROJECT} conversations")
+
+        orm_db, purge_db = Path(tmp) / "orm.db", Path(tmp) / "purge.db"
+        shutil.copy(base, orm_db)
+        shutil.copy(base, purge_db)
+
+        orm_app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{orm_db}", "ANALYSIS_WORKERS": 0})
+        with orm_app.app_context():
+
+            def orm_delete():
+                db.session.delete(db.session.get(Project, 1))
+                db.session.commit()
+
+            orm_time, orm_peak = measure(orm_delete)
+
+        purge_app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{purge_db}", "ANALYSIS_WORKERS": 0})
+        client = purge_app.test_client()
+        request_time, request_peak = measure(lambda: client.delete("/api/v1/projects/1"))
+
+        def wait_for_purge():
+            with purge_app.app_context():
+                while db.session.get(Project, 1) is not None:
+                    db.session.remove()
+                    time.sleep(0.01)
+
+        purge_time, purge_peak = measure(wait_for_purge)
+
+        print(f"{'':28s} {'time':>9s} {'peak mem':>10s}")
+        print(f"{'ORM cascade delete':28s} {orm_time:8.2f}s {orm_peak / 1e6:8.1f}MB")
+        print(f"{'DELETE request (soft)':28s} {request_time * 1000:7.1f}ms {request_peak / 1e6:8.1f}MB")
+        print(f"{'background purge':28s} {purge_time:8.2f}s {purge_peak / 1e6:8.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Concurrent writes to different projects: one database vs per-project shards.
+
+--projects worker processes (as under a multi-process server) each post messages
+(role "system", so no model call) to a conversation of their own project for --seconds,
+first with every project in baws.db and then with sqlite.shard_per_project. With one
+database every commit queues on the same SQLite lock; with shards, writers of different
+projects commit to different files.
+
+Usage (from backend/):
+  python3 -m benchmarks.project_writes [--projects 8] [--seconds 10]
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.chat_turn import percentile  # noqa: E402
+
+
+def _configure(name: str, tmp: Path) -> None:
+    from app.services import config_loader
+
+    cfg = config_loader.load_config()
+    for key in ("database_path", "documents_path", "output_folder", "analysis_output"):
+        cfg[key] = str(tmp / name / key)
+    cfg["chat_history"] = {"summary_enabled": False}
+    config_loader._config_cache = cfg
+    config_loader.ensure_data_dirs(cfg)
+
+
+def _app(name: str, shards: bool, tmp: Path):
+    from app import create_app
+
+    return create_app(
+        {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp / name}/baws.db", "ANALYSIS_WORKERS": 0, "SQLITE_SHARDS": shards}
+    )
+
+
+def writer(name: str, shards: bool, tmp: Path, url: str, seconds: float, results) -> None:
+    _configure(name, tmp)
+    client = _app(name, shards, tmp).test_client()
+    latencies, failed = [], 0
+    deadline = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        r = client.post(url, json={"role": "system", "content": f"load {i} " + "x" * 200})
+        if r.status_code == 201:
+            latencies.append(time.perf_counter() - start)
+        else:
+            failed += 1
+        i += 1
+    results.put((latencies, failed))
+
+
+def run(name: str, shards: bool, args, tmp: Path) -> None:
+    _configure(name, tmp)
+    app = _app(name, shards, tmp)
+    client = app.test_client()
+    urls = []
+    for n in range(args.projects):
+        project = client.post("/api/v1/projects", json={"name": f"p{n}"}).get_json()
+        conv = client.post(f"/api/v1/projects/{project['id']}/conversations", json={"title": "load"}).get_json()
+        urls.append(f"/api/v1/projects/{project['id']}/conversations/{conv['id']}/messages")
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=writer, args=(name, shards, tmp, url, args.seconds, results)) for url in urls]
+    for proc in procs:
+        proc.start()
+    latencies, failed = [], 0
+    for _ in procs:
+        samples, errors = results.get()
+        latencies += samples
+        failed += errors
+    for proc in procs:
+        proc.join()
+
+    p95 = percentile(latencies, 95) * 1000 if latencies else float("nan")
+    print(f"{name:14s} {len(latencies) / args.seconds:8.1f} writes/s  p95 {p95:7.1f} ms  failed {failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--projects", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{args.projects} projects, one writer process each, {args.seconds:g}s per mode")
+        run("one-database", False, args, Path(tmp))
+        run("shards", True, args, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
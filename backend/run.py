@@ -25,7 +25,9 @@ bootstrap_config()
 
 from app import create_app
 
-app = create_app()
+# PDF extraction processes (spawn) re-import this module as __mp_main__; only the real
+# server process creates the app and its background workers.
+app = create_app() if __name__ != "__mp_main__" else None
 
 if __name__ == "__main__":
     port = int(os.getenv("BE_PORT", "5000"))
@@ -0,0 +1,52 @@
+"""Pytest setup: make the backend package importable when running from the repo root."""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _make_app(tmp_path, monkeypatch, **config):
+    from app.services import config_loader
+
+    cfg = config_loader.load_config()
+    for key in ("database_path", "documents_path", "output_folder", "analysis_output"):
+        cfg[key] = str(tmp_path / key)
+    cfg["chat_history"] = {"summary_enabled": False}
+    monkeypatch.setattr(config_loader, "_config_cache", cfg)
+    config_loader.ensure_data_dirs(cfg)
+
+    from app import create_app
+
+    return create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/baws.db", "ANALYSIS_WORKERS": 0, **config})
+
+
+def _dispose(app):
+    from app.models import db
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App on a fresh SQLite database and data folders under tmp_path, without job workers."""
+    app = _make_app(tmp_path, monkeypatch)
+    yield app
+    _dispose(app)
+
+
+@pytest.fixture
+def sharded_app(tmp_path, monkeypatch):
+    """Like app, with one SQLite shard per project (sqlite.shard_per_project)."""
+    app = _make_app(tmp_path, monkeypatch, SQLITE_SHARDS=True)
+    yield app
+    from app import db_shards
+
+    with db_shards._lock:
+        for engine in db_shards._engines.values():
+            engine.dispose()
+        db_shards._engines.clear()
+    _dispose(app)
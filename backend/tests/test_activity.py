@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta
+
+from app.models import Conversation, Project, db
+from app.services import activity
+
+
+def _project_with_conversation() -> tuple[int, int]:
+    project = Project(name="p")
+    db.session.add(project)
+    db.session.flush()
+    conv = Conversation(project_id=project.id, title="c")
+    db.session.add(conv)
+    db.session.commit()
+    return project.id, conv.id
+
+
+def test_messages_touch_the_project_at_most_once_per_interval(app):
+    with app.app_context():
+        project_id, conv_id = _project_with_conversation()
+        recent = datetime.utcnow() - timedelta(seconds=activity.PROJECT_TOUCH_SECONDS / 2)
+        db.session.get(Project, project_id).last_activity_at = recent
+        db.session.commit()
+
+        activity.messages_added(conv_id, project_id, 2, "hello")
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(Project, project_id).last_activity_at == recent
+        assert db.session.get(Conversation, conv_id).message_count == 2
+
+        stale = datetime.utcnow() - timedelta(seconds=activity.PROJECT_TOUCH_SECONDS + 1)
+        db.session.get(Project, project_id).last_activity_at = stale
+        db.session.commit()
+        activity.messages_added(conv_id, project_id, 1, "again")
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(Project, project_id).last_activity_at > stale
+
+
+def test_document_changes_always_touch_the_project(app):
+    with app.app_context():
+        project_id, _ = _project_with_conversation()
+        recent = datetime.utcnow() - timedelta(seconds=1)
+        db.session.get(Project, project_id).last_activity_at = recent
+        db.session.commit()
+
+        activity.documents_changed(project_id, 1)
+        db.session.commit()
+        db.session.expire_all()
+        project = db.session.get(Project, project_id)
+        assert project.document_count == 1
+        assert project.last_activity_at > recent
@@ -0,0 +1,34 @@
+import os
+import shutil
+
+from app.agents import base, registry
+from app.agents.registry import AgentRegistry
+
+
+def _use_copy_of_module(tmp_path, monkeypatch):
+    root = tmp_path / "ba-analysis"
+    shutil.copytree(base.BA_ANALYSIS_ROOT, root)
+    monkeypatch.setattr(registry, "AGENTS_DIR", root / "agents")
+    monkeypatch.setattr(registry, "CONVERSATION_AGENTS_CONFIG", root / "config" / "conversation-agents.yaml")
+    monkeypatch.setattr(registry, "BA_CONVERSATION_PROMPT_PATH", root / "prompts" / "ba_conversation.prompt.txt")
+    monkeypatch.setattr(base, "PROMPTS_DIR", root / "prompts")
+    return root
+
+
+def test_edited_prompt_is_picked_up_and_only_that_file_is_reread(tmp_path, monkeypatch):
+    root = _use_copy_of_module(tmp_path, monkeypatch)
+    reg = AgentRegistry(check_interval=3600)
+    before = reg.snapshot()
+    files_read = reg.stats()["files_read"]
+
+    prompt = root / "prompts" / "ba_conversation.prompt.txt"
+    prompt.write_text("You are a terse analyst.", encoding="utf-8")
+    mtime = prompt.stat().st_mtime + 10
+    os.utime(prompt, (mtime, mtime))
+
+    assert reg.snapshot() is before  # not re-checked within check_interval
+    after = reg.reload()
+    assert after.conversation_prompt == "You are a terse analyst."
+    assert after.prompt_version != before.prompt_version
+    assert reg.stats()["files_read"] == files_read + 1
+    assert reg.reload() is after  # nothing changed since
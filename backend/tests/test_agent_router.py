@@ -0,0 +1,39 @@
+import threading
+import time
+
+from app.services.agent_router import MicroBatcher, _parse_batch_router_reply
+
+
+def _submit_all(batcher: MicroBatcher, items: list) -> dict:
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.update({i: batcher.submit(i)})) for i in items]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_batch_is_sent_as_soon_as_it_is_full():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(list(items)) or [i * 10 for i in items], 10.0, 3)
+    start = time.monotonic()
+    results = _submit_all(batcher, [1, 2, 3])
+    assert time.monotonic() - start < 5.0  # did not wait out the 10s window
+    assert results == {1: 10, 2: 20, 3: 30}
+    assert [sorted(b) for b in batches] == [[1, 2, 3]]
+
+
+def test_partial_batch_is_sent_when_the_window_ends():
+    batches = []
+    batcher = MicroBatcher(lambda items: batches.append(list(items)) or [i * 10 for i in items], 0.05, 10)
+    assert _submit_all(batcher, [1, 2]) == {1: 10, 2: 20}
+    assert sum(len(b) for b in batches) == 2
+    assert batcher.stats["items"] == 2
+
+
+def test_batch_reply_is_parsed_per_message_number():
+    agents = [{"id": "emma"}, {"id": "paul"}]
+    reply = 'Sure: {"1": ["emma"], "2": ["nobody"], "3": "paul"}'
+    assert _parse_batch_router_reply(reply, agents, 3) == [["emma"], None, None]
+    assert _parse_batch_router_reply("no json", agents, 2) == [None, None]
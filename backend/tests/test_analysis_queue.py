@@ -0,0 +1,147 @@
+import io
+from datetime import datetime, timedelta
+
+from app.models import Analysis, Document, Project, db
+from app.services import analysis_queue
+
+
+def _running_analysis() -> int:
+    project = Project(name="p")
+    db.session.add(project)
+    db.session.flush()
+    doc = Document(project_id=project.id, filename="a.txt", file_path="a.txt")
+    db.session.add(doc)
+    db.session.flush()
+    analysis = Analysis(project_id=project.id, document_id=doc.id, status="running")
+    db.session.add(analysis)
+    db.session.commit()
+    return analysis.id
+
+
+def test_finish_of_a_removed_analysis_returns_no_followers(app):
+    with app.app_context():
+        assert analysis_queue._finish(12345, agent_results={}) == []
+        assert analysis_queue._finish(12345, error="gone") == []
+
+
+def test_agent_result_for_a_removed_analysis_is_dropped(app):
+    with app.app_context():
+        analysis_id = _running_analysis()
+        db.session.execute(db.delete(Analysis).where(Analysis.id == analysis_id))
+        db.session.commit()
+        analysis_queue._record_agent_result(analysis_id, "agent", "text", "completed")
+        assert db.session.get(Analysis, analysis_id) is None
+
+
+def test_recovery_only_requeues_expired_leases(app):
+    with app.app_context():
+        live = _running_analysis()
+        stale = _running_analysis()
+        legacy = _running_analysis()
+        now = datetime.utcnow()
+        db.session.get(Analysis, live).worker_id = "other-process"
+        db.session.get(Analysis, live).heartbeat_at = now
+        db.session.get(Analysis, stale).worker_id = "crashed-process"
+        db.session.get(Analysis, stale).heartbeat_at = now - timedelta(seconds=analysis_queue.get_lease_seconds() + 1)
+        db.session.commit()
+
+        assert analysis_queue.recover_interrupted_jobs() == 2
+        assert db.session.get(Analysis, live).status == "running"
+        for analysis_id in (stale, legacy):
+            analysis = db.session.get(Analysis, analysis_id)
+            assert (analysis.status, analysis.worker_id, analysis.heartbeat_at) == ("pending", None, None)
+
+
+def test_claim_takes_a_lease_that_this_process_renews(app):
+    with app.app_context():
+        analysis_id = _running_analysis()
+        db.session.get(Analysis, analysis_id).status = "pending"
+        db.session.commit()
+
+        assert analysis_queue._claim_next() == analysis_id
+        analysis = db.session.get(Analysis, analysis_id)
+        assert analysis.worker_id == analysis_queue.WORKER_ID
+        claimed_at = analysis.heartbeat_at
+        db.session.commit()
+        assert analysis_queue.renew_leases() == 1
+        assert db.session.get(Analysis, analysis_id).heartbeat_at >= claimed_at
+
+
+def _project_with_document(client) -> tuple[int, int]:
+    project_id = client.post("/api/v1/projects", json={"name": "p"}).get_json()["id"]
+    doc = client.post(
+        f"/api/v1/projects/{project_id}/documents",
+        data={"file": (io.BytesIO(b"The system shall export reports."), "spec.txt")},
+        content_type="multipart/form-data",
+    ).get_json()
+    return project_id, doc["id"]
+
+
+def _conversation(client, project_id: int) -> int:
+    return client.post(f"/api/v1/projects/{project_id}/conversations", json={"title": "c"}).get_json()["id"]
+
+
+def test_identical_analysis_follows_the_in_flight_run(app):
+    client = app.test_client()
+    project_id, doc_id = _project_with_document(client)
+    url = f"/api/v1/projects/{project_id}/analyze"
+    leader = client.post(url, json={"document_id": doc_id}).get_json()
+    follower = client.post(
+        url, json={"document_id": doc_id, "conversation_id": _conversation(client, project_id)}
+    ).get_json()
+    assert follower["coalesced_into"] == leader["id"]
+
+    with app.app_context():
+        assert analysis_queue._claim_next() == leader["id"]  # followers are not claimed
+        assert analysis_queue._claim_next() is None
+        analysis_queue._record_agent_result(leader["id"], "agent", "text", "completed")
+        followers = analysis_queue._finish(leader["id"], agent_results={"agent": "text"})
+        assert followers == [(follower["id"], project_id)]
+        copied = db.session.get(Analysis, follower["id"])
+        assert (copied.status, copied.agent_results) == ("completed", {"agent": "text"})
+
+
+def test_analysis_does_not_follow_a_less_urgent_run(app):
+    client = app.test_client()
+    project_id, doc_id = _project_with_document(client)
+    url = f"/api/v1/projects/{project_id}/analyze"
+    conv_id = _conversation(client, project_id)
+    batch = client.post(url, json={"document_id": doc_id, "priority": "batch"}).get_json()
+    urgent = client.post(url, json={"document_id": doc_id, "conversation_id": conv_id}).get_json()
+    assert urgent["coalesced_into"] is None
+    short = client.post(
+        url, json={"document_id": doc_id, "conversation_id": conv_id, "deadline_seconds": 1}
+    ).get_json()
+    assert short["coalesced_into"] is None
+    assert short["id"] not in (batch["id"], urgent["id"])
+
+
+def test_document_without_content_hash_is_hashed_on_analyze(app):
+    client = app.test_client()
+    project_id, doc_id = _project_with_document(client)
+    with app.app_context():
+        db.session.get(Document, doc_id).content_hash = None  # uploaded before migration 4
+        db.session.commit()
+    url = f"/api/v1/projects/{project_id}/analyze"
+    leader = client.post(url, json={"document_id": doc_id}).get_json()
+    follower = client.post(
+        url, json={"document_id": doc_id, "conversation_id": _conversation(client, project_id)}
+    ).get_json()
+    assert follower["coalesced_into"] == leader["id"]
+
+
+def test_idempotency_key_replays_and_rejects_a_different_body(app):
+    client = app.test_client()
+    project_id, doc_id = _project_with_document(client)
+    url = f"/api/v1/projects/{project_id}/analyze"
+    headers = {"Idempotency-Key": "k1"}
+    first = client.post(url, json={"document_id": doc_id}, headers=headers)
+    again = client.post(url, json={"document_id": doc_id}, headers=headers)
+    assert first.status_code == again.status_code == 202
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert again.get_json() == first.get_json()
+    with app.app_context():
+        assert Analysis.query.count() == 1
+
+    other = client.post(url, json={"document_id": doc_id, "mode": "single"}, headers=headers)
+    assert other.status_code == 422
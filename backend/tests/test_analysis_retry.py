@@ -0,0 +1,67 @@
+from app.models import Analysis, Document, Project, db
+from app.services import analysis_queue
+from app.services.orchestrator import AGENT_COMPLETED, AGENT_TIMED_OUT, get_analysis_workflow
+
+
+def _finished_analysis(app, timed_out: str) -> int:
+    agents = list(get_analysis_workflow().nodes)
+    with app.app_context():
+        project = Project(name="p")
+        db.session.add(project)
+        db.session.flush()
+        doc = Document(project_id=project.id, filename="a.txt", file_path="a.txt")
+        db.session.add(doc)
+        db.session.flush()
+        analysis = Analysis(
+            project_id=project.id,
+            document_id=doc.id,
+            status="completed",
+            agent_results={a: f"{a} v1" for a in agents if a != timed_out},
+            progress={
+                "completed": agents,
+                "total": len(agents),
+                "agent_status": {a: AGENT_TIMED_OUT if a == timed_out else AGENT_COMPLETED for a in agents},
+            },
+            options={},
+        )
+        db.session.add(analysis)
+        db.session.commit()
+        return analysis.id
+
+
+def test_retry_reruns_only_the_failed_agent_and_keeps_the_others(app, monkeypatch):
+    agents = list(get_analysis_workflow().nodes)
+    timed_out = agents[-1]
+    analysis_id = _finished_analysis(app, timed_out)
+    client = app.test_client()
+
+    response = client.post(f"/api/v1/analyses/{analysis_id}/retry", json={})
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body["status"] == "pending"
+    assert body["options"]["only_agents"] == [timed_out]
+    assert timed_out not in body["progress"]["completed"]
+    assert client.post(f"/api/v1/analyses/{analysis_id}/retry", json={}).status_code == 409
+
+    calls = {}
+
+    def fake_run_analysis(document_path, project_id, only=None, prior_results=None, **kwargs):
+        calls["only"], calls["prior"] = only, prior_results
+        return {"agent_results": {timed_out: f"{timed_out} v2"}, "agent_status": {timed_out: AGENT_COMPLETED}}
+
+    monkeypatch.setattr(analysis_queue, "run_analysis", fake_run_analysis)
+    with app.app_context():
+        assert analysis_queue._claim_next() == analysis_id
+        analysis_queue._run_job(analysis_id)
+        analysis = db.session.get(Analysis, analysis_id)
+        assert analysis.status == "completed"
+        assert calls["only"] == {timed_out}
+        assert set(calls["prior"]) == set(agents) - {timed_out}
+        assert analysis.agent_results[timed_out] == f"{timed_out} v2"
+        assert all(analysis.agent_results[a] == f"{a} v1" for a in agents if a != timed_out)
+
+
+def test_retry_without_failed_agents_is_rejected(app):
+    analysis_id = _finished_analysis(app, timed_out="")
+    response = app.test_client().post(f"/api/v1/analyses/{analysis_id}/retry", json={})
+    assert response.status_code == 400
@@ -0,0 +1,40 @@
+import threading
+import time
+
+from app.api import messages as messages_api
+
+LATENCY = 0.5
+
+
+def test_chats_in_two_conversations_overlap(app, monkeypatch):
+    def slow_reply(conversation_id, content, **kwargs):
+        time.sleep(LATENCY)  # stands in for the model call, made with no transaction open
+        return f"reply to {content}", ["alex"]
+
+    monkeypatch.setattr(messages_api, "get_agent_reply", slow_reply)
+    client = app.test_client()
+    project_id = client.post("/api/v1/projects", json={"name": "p"}).get_json()["id"]
+    urls = []
+    for title in ("a", "b"):
+        conv_id = client.post(f"/api/v1/projects/{project_id}/conversations", json={"title": title}).get_json()["id"]
+        urls.append(f"/api/v1/projects/{project_id}/conversations/{conv_id}/messages")
+
+    responses = {}
+
+    def post(url):
+        responses[url] = app.test_client().post(url, json={"role": "user", "content": "Which risks?"})
+
+    threads = [threading.Thread(target=post, args=(url,)) for url in urls]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    for url in urls:
+        response = responses[url]
+        assert response.status_code == 201, response.get_data(as_text=True)
+        assert "database is locked" not in response.get_data(as_text=True)
+        assert response.get_json()["assistant_message"]["status"] == "complete"
+    assert elapsed < 1.8 * LATENCY  # serialized turns would take 2 x LATENCY
@@ -0,0 +1,52 @@
+from app.models import Conversation, Message, Project, db
+from app.services import chat_history
+from app.services.config_loader import get_config
+
+
+def _conversation_with_turns(turns: int) -> int:
+    project = Project(name="p")
+    db.session.add(project)
+    db.session.flush()
+    conv = Conversation(project_id=project.id, title="c")
+    db.session.add(conv)
+    db.session.flush()
+    for i in range(turns):
+        db.session.add(Message(conversation_id=conv.id, role="user", content=f"question {i}"))
+        db.session.add(Message(conversation_id=conv.id, role="assistant", content=f"answer {i}"))
+    db.session.commit()
+    return conv.id
+
+
+def _settings(monkeypatch, **values):
+    monkeypatch.setitem(get_config(), "chat_history", {"recent_turns": 2, "summary_enabled": True, **values})
+
+
+def test_unsummarized_messages_stay_in_the_prompt_while_the_summary_lags(app, monkeypatch):
+    _settings(monkeypatch)
+    with app.app_context():
+        conv_id = _conversation_with_turns(5)
+        summary, history = chat_history.load_history(conv_id)
+    assert summary is None
+    assert [m["content"] for m in history][:2] == ["question 0", "answer 0"]
+    assert len(history) == 10
+
+
+def test_summary_advances_and_the_prompt_keeps_only_the_window(app, monkeypatch):
+    _settings(monkeypatch)
+    folded_batches = []
+
+    def fake_fold(summary, messages, settings):
+        folded_batches.append([m.content for m in messages])
+        return f"summary of {len(messages)} more"
+
+    monkeypatch.setattr(chat_history, "_fold", fake_fold)
+    with app.app_context():
+        conv_id = _conversation_with_turns(5)
+        assert chat_history.update_summary(conv_id) == 6  # everything but the last 2 turns
+        conv = db.session.get(Conversation, conv_id)
+        assert conv.summary == "summary of 6 more"
+        summary, history = chat_history.load_history(conv_id)
+        assert chat_history.update_summary(conv_id) == 0  # nothing left the window since
+    assert folded_batches[0][0] == "question 0"
+    assert summary == "summary of 6 more"
+    assert [m["content"] for m in history] == ["question 3", "answer 3", "question 4", "answer 4"]
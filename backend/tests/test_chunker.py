@@ -0,0 +1,21 @@
+from app.services.chunker import split_into_chunks
+
+
+def test_heading_stays_with_oversized_line():
+    text = "# H1\n" + "x" * 250
+    chunks = split_into_chunks(text, 100)
+    assert chunks[0].startswith("# H1\nx")
+    assert all(len(c) <= 100 for c in chunks)
+    assert "".join(c.replace("# H1\n", "", 1) for c in chunks) == "x" * 250
+
+
+def test_no_heading_only_chunk_with_blank_line_before_long_line():
+    chunks = split_into_chunks("# H1\n\n" + "y" * 250, 100)
+    assert chunks[0].startswith("# H1\n")
+    assert len(chunks[0]) == 100
+    assert "# H1" not in [c.strip() for c in chunks]
+
+
+def test_sections_that_fit_are_kept_whole():
+    text = "# A\nalpha\n\n# B\nbeta"
+    assert [c.strip() for c in split_into_chunks(text, 12)] == ["# A\nalpha", "# B\nbeta"]
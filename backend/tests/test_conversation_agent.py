@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+from app.models import Conversation, Message, Project, db
+from app.services import conversation_agent
+from app.services.conversation_agent import fail_interrupted_replies, get_chat_settings, parse_single_pass_reply
+
+
+def test_only_replies_older_than_the_timeout_are_failed(app):
+    with app.app_context():
+        project = Project(name="p")
+        db.session.add(project)
+        db.session.flush()
+        conv = Conversation(project_id=project.id, title="c")
+        db.session.add(conv)
+        db.session.flush()
+        timeout = get_chat_settings()["reply_timeout_seconds"]
+        old = Message(
+            conversation_id=conv.id,
+            role="assistant",
+            content="",
+            status="pending",
+            created_at=datetime.utcnow() - timedelta(seconds=timeout + 1),
+        )
+        live = Message(conversation_id=conv.id, role="assistant", content="", status="pending")
+        db.session.add_all([old, live])
+        db.session.commit()
+
+        assert fail_interrupted_replies() == 1
+        assert db.session.get(Message, old.id).status == "failed"
+        assert db.session.get(Message, live.id).status == "pending"
+
+
+AGENTS = [{"id": "emma"}, {"id": "paul"}]
+
+
+def test_single_pass_reply_is_parsed_from_plain_or_fenced_json():
+    assert parse_single_pass_reply('{"agents": ["emma", "bob"], "reply": "Hi"}', AGENTS) == ("Hi", ["emma"])
+    fenced = '```json\n{"agents": ["paul"], "reply": "Links"}\n```'
+    assert parse_single_pass_reply(fenced, AGENTS) == ("Links", ["paul"])
+
+
+def test_single_pass_reply_that_is_not_json_is_used_as_text():
+    assert parse_single_pass_reply("Plain answer", AGENTS) == ("Plain answer", [])
+    assert parse_single_pass_reply('{"agents": ["emma"]}', AGENTS) == ('{"agents": ["emma"]}', [])
+
+
+def test_single_pass_falls_back_to_the_coordinator_when_no_agent_is_named(app, monkeypatch):
+    calls = []
+
+    def fake_generate_chat(system_prompt, history, new_user_content, use_cache=True, json_output=False, **kwargs):
+        calls.append(json_output)
+        return "Not JSON at all"
+
+    monkeypatch.setattr(conversation_agent, "route_locally", lambda text: None)
+    monkeypatch.setattr(conversation_agent, "generate_chat", fake_generate_chat)
+    with app.app_context():
+        project = Project(name="p")
+        db.session.add(project)
+        db.session.flush()
+        conv = Conversation(project_id=project.id, title="c")
+        db.session.add(conv)
+        db.session.commit()
+        reply, agent_ids = conversation_agent.get_agent_reply(conv.id, "Hmm?", single_pass=True)
+    assert (reply, agent_ids) == ("Not JSON at all", [conversation_agent.CONVERSATION_AGENT_ID])
+    assert calls == [True]  # one model call, asked for JSON
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import OperationalError
+
+from app.db_engine import READ_BIND
+from app.models import Project, db
+
+
+def _bind(statement):
+    return db.session.get_bind(mapper=Project.__mapper__, clause=statement)
+
+
+def test_selects_in_get_requests_use_the_read_pool(app):
+    with app.test_request_context(method="GET"):
+        assert _bind(select(Project)) is db.engines[READ_BIND]
+        assert _bind(insert(Project).values(name="p")) is db.engine
+
+
+def test_writes_and_background_work_use_the_primary(app):
+    with app.test_request_context(method="POST"):
+        assert _bind(select(Project)) is db.engine
+    with app.app_context():
+        assert _bind(select(Project)) is db.engine
+
+
+def test_read_pool_connections_are_query_only(app):
+    with app.app_context():
+        with db.engines[READ_BIND].connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM projects")).scalar() == 0
+            with pytest.raises(OperationalError):
+                conn.execute(text("INSERT INTO projects (name) VALUES ('p')"))
+
+
+def test_get_request_reads_what_a_post_wrote(app):
+    client = app.test_client()
+    project_id = client.post("/api/v1/projects", json={"name": "p"}).get_json()["id"]
+    assert client.get(f"/api/v1/projects/{project_id}").get_json()["name"] == "p"
+
+
+def test_flush_during_a_get_request_goes_to_the_primary(app):
+    with app.test_request_context(method="GET"):
+        db.session.add(Project(name="p"))
+        db.session.commit()
+        assert db.session.scalars(select(Project.name)).all() == ["p"]
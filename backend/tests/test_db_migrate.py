@@ -0,0 +1,49 @@
+from sqlalchemy import create_engine, inspect, text
+
+from app.db_migrate import MIGRATIONS, migrate_engine
+from app.models import db
+
+OLD_SCHEMA = [
+    "CREATE TABLE projects (id INTEGER PRIMARY KEY, name VARCHAR(255), created_at DATETIME, updated_at DATETIME)",
+    "CREATE TABLE conversations (id INTEGER PRIMARY KEY, project_id INTEGER, created_at DATETIME, "
+    "updated_at DATETIME)",
+    "CREATE TABLE messages (id INTEGER PRIMARY KEY, conversation_id INTEGER, role VARCHAR(16), content TEXT, "
+    "created_at DATETIME)",
+    "CREATE TABLE documents (id INTEGER PRIMARY KEY, project_id INTEGER, created_at DATETIME)",
+    "INSERT INTO projects (id, name, created_at) VALUES (1, 'p', '2024-01-01 00:00:00')",
+    "INSERT INTO conversations (id, project_id, created_at) VALUES (1, 1, '2024-01-01 00:00:00')",
+    "INSERT INTO messages (conversation_id, role, content, created_at) VALUES "
+    "(1, 'user', 'hi', '2024-01-02 00:00:00'), (1, 'assistant', 'hello', '2024-01-03 00:00:00')",
+]
+
+
+def _versions(engine):
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_version ORDER BY applied_at, version"))]
+
+
+def test_fresh_database_records_every_version_and_reruns_nothing(app):
+    with app.app_context():
+        assert _versions(db.engine) == [version for version, _, _ in MIGRATIONS]
+        assert migrate_engine(db.engine) == []
+
+
+def test_old_schema_is_brought_up_to_date_in_order(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.execute(text(statement))
+
+    applied = migrate_engine(engine)
+
+    assert applied == sorted(applied) == [version for version, _, _ in MIGRATIONS]
+    assert _versions(engine) == applied
+    columns = {c["name"] for c in inspect(engine).get_columns("messages")}
+    assert {"agent_id", "status"} <= columns
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT status FROM messages")).scalars().all() == ["complete", "complete"]
+        row = conn.execute(text("SELECT message_count, last_message_preview FROM conversations")).one()
+        assert tuple(row) == (2, "hello")
+        assert conn.execute(text("SELECT conversation_count FROM projects")).scalar() == 1
+    assert migrate_engine(engine) == []
+    engine.dispose()
@@ -0,0 +1,22 @@
+from sqlalchemy import inspect
+
+from app.db_shards import SHARDED_TABLES, get_shard_engine, project_shards, shard_path
+
+
+def test_scanning_projects_does_not_create_shards(sharded_app):
+    client = sharded_app.test_client()
+    idle = client.post("/api/v1/projects", json={"name": "idle"}).get_json()["id"]
+    used = client.post("/api/v1/projects", json={"name": "used"}).get_json()["id"]
+    client.post(f"/api/v1/projects/{used}/conversations", json={"title": "c"})
+
+    with sharded_app.app_context():
+        assert project_shards() == [used]
+        assert not shard_path(idle).exists()
+
+
+def test_shards_hold_only_the_sharded_tables(sharded_app):
+    client = sharded_app.test_client()
+    project_id = client.post("/api/v1/projects", json={"name": "p"}).get_json()["id"]
+    with sharded_app.app_context():
+        tables = set(inspect(get_shard_engine(project_id)).get_table_names())
+    assert tables == set(SHARDED_TABLES) | {"schema_version"}
@@ -0,0 +1,52 @@
+import logging
+
+from app.services import config_loader
+from app.services.document_parser import iter_pdf_pages, parse_document
+
+
+def _write_pdf(path, page_texts):
+    """Minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 10 Tf 20 400 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+            "/Resources << /Font << /F1 3 0 R >> >> >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+    return path
+
+
+def test_truncated_pages_are_logged_and_recorded(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(config_loader, "_config_cache", {"document_parser": {"max_page_chars": 20}})
+    pdf = _write_pdf(tmp_path / "long.pdf", ["short page", "x" * 50, "another short one", "y" * 30])
+
+    with caplog.at_level(logging.WARNING, logger="app.services.document_parser"):
+        parsed = parse_document(str(pdf))
+
+    assert parsed["document_metadata"]["page_count"] == 4
+    assert parsed["document_metadata"]["truncated_pages"] == [2, 4]
+    assert "x" * 20 in parsed["document_text"] and "x" * 21 not in parsed["document_text"]
+    assert sum("truncated" in r.getMessage() for r in caplog.records) == 2
+
+
+def test_pages_within_the_limit_are_not_flagged(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_loader, "_config_cache", {})
+    pdf = _write_pdf(tmp_path / "short.pdf", ["one", "two"])
+    truncated = []
+    assert [p.strip() for p in iter_pdf_pages(pdf, parallel=False, truncated_pages=truncated)] == ["one", "two"]
+    assert truncated == []
+    assert "truncated_pages" not in parse_document(str(pdf))["document_metadata"]
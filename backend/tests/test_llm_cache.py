@@ -0,0 +1,65 @@
+import threading
+
+import google.generativeai as genai
+
+from app.services import gemini_client, llm_cache
+from app.services.llm_cache import MemoryLRUCache, ResponseCache
+
+
+class _FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+def _fake_model(calls):
+    class FakeChat:
+        def send_message(self, content, **kwargs):
+            calls.append(content)
+            return _FakeResponse(f"reply {len(calls)}")
+
+    class FakeModel:
+        def __init__(self, model_name, system_instruction=None, **kwargs):
+            pass
+
+        def start_chat(self, history=None):
+            return FakeChat()
+
+    return FakeModel
+
+
+def test_chat_replies_are_cached_per_conversation_only(app, monkeypatch):
+    calls = []
+    cache = ResponseCache([MemoryLRUCache()])
+    monkeypatch.setattr(llm_cache, "_cache", cache)
+    monkeypatch.setattr(gemini_client, "_ensure_configured", lambda: None)
+    monkeypatch.setattr(genai, "GenerativeModel", _fake_model(calls))
+
+    def chat(scope):
+        return gemini_client.generate_chat("system", [], "hello", cache_scope=scope)
+
+    with app.app_context():
+        assert chat("conversation:1") == "reply 1"
+        assert chat("conversation:1") == "reply 1"
+        assert chat("conversation:2") == "reply 2"
+        assert chat(None) == "reply 3"
+        assert chat(None) == "reply 4"
+    assert len(calls) == 4
+    assert cache.stats()["hits"] == 1
+
+
+def test_stats_counters_do_not_lose_updates():
+    cache = ResponseCache([MemoryLRUCache()])
+    cache.set("hit", "value")
+
+    def lookups():
+        for _ in range(2000):
+            cache.get("hit")
+            cache.get("miss")
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (16000, 16000)
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from app.services.llm_governor import (
+    PRIORITY_ANALYSIS,
+    PRIORITY_BATCH,
+    PRIORITY_CHAT,
+    LLMGovernor,
+    LLMOverloadedError,
+)
+
+
+class Throttled(Exception):
+    code = 429
+
+
+def _hold_slot(governor: LLMGovernor, priority: str = PRIORITY_CHAT) -> tuple[threading.Event, threading.Thread]:
+    """Occupy one slot until the returned event is set."""
+    release = threading.Event()
+    thread = threading.Thread(target=governor.call, args=(release.wait,), kwargs={"priority": priority})
+    thread.start()
+    _wait_until(lambda: governor.stats()["in_flight"] == 1)
+    return release, thread
+
+
+def _wait_until(condition, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_latency_windows_are_kept_per_kind():
+    governor = LLMGovernor(rate_per_second=1000, burst=1000)
+    governor._on_success(30.0, PRIORITY_ANALYSIS)
+    for _ in range(10):
+        governor._on_success(0.5, PRIORITY_CHAT)
+    assert governor.latency_percentile(95, kind=PRIORITY_ANALYSIS) == 30.0
+    assert governor.latency_percentile(95, kind=PRIORITY_CHAT) == 0.5
+    assert governor.latency_percentile(95, kind=PRIORITY_BATCH) is None
+
+
+def test_call_records_under_kind_and_streams_are_not_recorded():
+    governor = LLMGovernor(rate_per_second=1000, burst=1000)
+    governor.call(lambda: "ok", priority=PRIORITY_BATCH, kind=PRIORITY_ANALYSIS)
+    governor.call(lambda: "ok", priority=PRIORITY_CHAT)
+    assert list(governor.stream(lambda: iter(["a", "b"]))) == ["a", "b"]
+    assert governor.stats()["latency_samples"] == {PRIORITY_ANALYSIS: 1, PRIORITY_CHAT: 1}
+    assert governor.latency_percentile(50, min_samples=2, kind=PRIORITY_ANALYSIS) is None
+
+
+def test_throttling_halves_the_cap_once_per_cooldown_and_success_grows_it():
+    governor = LLMGovernor(rate_per_second=1000, burst=1000, initial_concurrency=8, cooldown_seconds=60)
+
+    def throttled():
+        raise Throttled()
+
+    for _ in range(2):
+        with pytest.raises(Throttled):
+            governor.call(throttled)
+    assert governor.stats()["concurrency_limit"] == 4.0
+    assert governor.stats()["throttled"] == 2
+
+    governor.call(lambda: "ok")
+    assert governor.stats()["concurrency_limit"] == 4.25
+
+
+def test_full_chat_queue_rejects_with_retry_after():
+    governor = LLMGovernor(
+        classes={PRIORITY_CHAT: {"max_queue": 0}}, rate_per_second=1000, burst=1000, initial_concurrency=1
+    )
+    release, holder = _hold_slot(governor)
+    try:
+        assert governor.is_overloaded(PRIORITY_CHAT)
+        with pytest.raises(LLMOverloadedError) as excinfo:
+            governor.call(lambda: "ok")
+        assert excinfo.value.retry_after >= 1
+        assert governor.stats()["rejected"] == 1
+    finally:
+        release.set()
+        holder.join()
+
+
+def test_free_slots_go_to_chat_before_waiting_batch_work():
+    governor = LLMGovernor(rate_per_second=1000, burst=1000, initial_concurrency=1, max_concurrency=1)
+    release, holder = _hold_slot(governor, PRIORITY_BATCH)
+    order = []
+    waiters = []
+    for priority in [PRIORITY_BATCH] * 3 + [PRIORITY_CHAT] * 3:
+        thread = threading.Thread(
+            target=governor.call, args=(lambda p=priority: order.append(p),), kwargs={"priority": priority}
+        )
+        thread.start()
+        waiters.append(thread)
+        queued = len(waiters)
+        _wait_until(lambda: governor.stats()["queue_depth"] == queued)
+
+    release.set()
+    for thread in [holder, *waiters]:
+        thread.join()
+    # Weights 8 (chat) to 1 (batch): the queued chat calls all run before the batch backlog
+    assert order == [PRIORITY_CHAT] * 3 + [PRIORITY_BATCH] * 3
+    classes = governor.stats()["classes"]
+    assert classes[PRIORITY_BATCH]["wait_seconds"] > 0
+    assert classes[PRIORITY_CHAT]["calls"] == 3
@@ -0,0 +1,43 @@
+import pytest
+
+
+@pytest.fixture
+def messages_url(app):
+    client = app.test_client()
+    project_id = client.post("/api/v1/projects", json={"name": "p"}).get_json()["id"]
+    conv_id = client.post(f"/api/v1/projects/{project_id}/conversations", json={"title": "c"}).get_json()["id"]
+    url = f"/api/v1/projects/{project_id}/conversations/{conv_id}/messages"
+    for i in range(5):
+        client.post(url, json={"role": "system", "content": f"m{i}"})
+    return url
+
+
+def _page(client, url, **params):
+    response = client.get(url, query_string=params)
+    assert response.status_code == 200
+    return [m["content"] for m in response.get_json()], response.headers.get("X-Has-More")
+
+
+def test_scrolling_back_with_before_id_reaches_the_first_message(app, messages_url):
+    client = app.test_client()
+    assert _page(client, messages_url, limit=2) == (["m3", "m4"], "true")
+    ids = [m["id"] for m in client.get(messages_url, query_string={"limit": 2}).get_json()]
+    assert _page(client, messages_url, limit=2, before_id=ids[0]) == (["m1", "m2"], "true")
+    first_id = ids[0] - 2
+    assert _page(client, messages_url, limit=2, before_id=first_id) == (["m0"], "false")
+    assert _page(client, messages_url, limit=2, before_id=first_id - 1) == ([], "false")
+
+
+def test_since_returns_only_newer_messages(app, messages_url):
+    client = app.test_client()
+    all_messages = client.get(messages_url).get_json()
+    assert "X-Has-More" not in client.get(messages_url).headers
+    last_id = all_messages[-1]["id"]
+    assert _page(client, messages_url, since=last_id) == ([], "false")
+    assert _page(client, messages_url, since=all_messages[2]["id"]) == (["m3", "m4"], "false")
+    assert _page(client, messages_url, after_id=0, limit=3) == (["m0", "m1", "m2"], "true")
+
+
+@pytest.mark.parametrize("params", [{"limit": 0}, {"before_id": "x"}, {"since": -1}])
+def test_invalid_cursors_are_rejected(app, messages_url, params):
+    assert app.test_client().get(messages_url, query_string=params).status_code == 400
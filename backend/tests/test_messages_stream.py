@@ -0,0 +1,34 @@
+from app.api import messages as messages_api
+from app.models import Conversation, Message, db
+
+
+def _conversation(client) -> str:
+    project_id = client.post("/api/v1/projects", json={"name": "p"}).get_json()["id"]
+    conv_id = client.post(f"/api/v1/projects/{project_id}/conversations", json={"title": "c"}).get_json()["id"]
+    return f"/api/v1/projects/{project_id}/conversations/{conv_id}/messages"
+
+
+def test_client_disconnect_mid_stream_discards_the_turn(app, monkeypatch):
+    closed = []
+
+    def fake_stream():
+        try:
+            yield "Hello"
+            yield " world"
+        finally:
+            closed.append(True)
+
+    monkeypatch.setattr(messages_api, "stream_agent_reply", lambda *a, **k: (["alex"], fake_stream()))
+    client = app.test_client()
+    url = _conversation(client)
+
+    response = client.post(url + "?stream=1", json={"role": "user", "content": "Hi"}, buffered=False)
+    events = iter(response.response)
+    assert b"event: message" in next(events)
+    assert b"Hello" in next(events)
+    response.close()
+
+    assert closed == [True]
+    with app.app_context():
+        assert Message.query.count() == 0
+        assert db.session.query(Conversation.message_count).scalar() == 0
@@ -0,0 +1,61 @@
+from datetime import datetime
+
+from app.models import Analysis, Conversation, Document, Project, db
+from app.services import config_loader
+from app.services.project_purger import project_folders, purge_project
+
+
+def test_analysis_urls_of_a_deleted_project_are_not_found(app):
+    with app.app_context():
+        project = Project(name="p")
+        db.session.add(project)
+        db.session.flush()
+        doc = Document(project_id=project.id, filename="a.txt", file_path="a.txt")
+        db.session.add(doc)
+        db.session.flush()
+        analysis = Analysis(project_id=project.id, document_id=doc.id, status="failed", agent_results={})
+        db.session.add(analysis)
+        db.session.commit()
+        project_id, analysis_id = project.id, analysis.id
+
+    client = app.test_client()
+    assert client.get(f"/api/v1/analyses/{analysis_id}").status_code == 200
+
+    with app.app_context():
+        db.session.get(Project, project_id).deleted_at = datetime.utcnow()  # soft delete, purge not started
+        db.session.commit()
+
+    assert client.get(f"/api/v1/analyses/{analysis_id}").status_code == 404
+    assert client.get(f"/api/v1/analyses/{analysis_id}/events").status_code == 404
+    assert client.post(f"/api/v1/analyses/{analysis_id}/retry", json={}).status_code == 404
+    with app.app_context():
+        assert db.session.get(Analysis, analysis_id).status == "failed"
+
+
+def test_sharded_purge_removes_rows_left_in_the_main_database(sharded_app):
+    client = sharded_app.test_client()
+    project_id = client.post("/api/v1/projects", json={"name": "p"}).get_json()["id"]
+    with sharded_app.app_context():
+        # A conversation written before sharding was turned on
+        with db.engine.begin() as conn:
+            conn.execute(
+                db.insert(Conversation).values(project_id=project_id, title="old", created_at=datetime.utcnow())
+            )
+        db.session.get(Project, project_id).deleted_at = datetime.utcnow()
+        db.session.commit()
+
+        assert purge_project(project_id) == 1
+        with db.engine.connect() as conn:
+            assert conn.execute(db.select(Conversation.id)).first() is None
+        assert db.session.get(Project, project_id) is None
+
+
+def test_project_folders_default_under_the_project_root(app, tmp_path, monkeypatch):
+    config = {k: v for k, v in config_loader._config_cache.items() if k not in ("documents_path", "analysis_output")}
+    monkeypatch.setattr(config_loader, "_config_cache", config)
+    monkeypatch.setitem(app.config, "PROJECT_ROOT", str(tmp_path))
+    with app.app_context():
+        assert project_folders(7) == [
+            tmp_path / "data" / "documents" / "7",
+            tmp_path / "data" / "output" / "analysis" / "7",
+        ]
@@ -0,0 +1,40 @@
+from app.services.route_classifier import RouteClassifier, tokenize
+
+AGENTS = [
+    {"id": "alex", "responsibility": "Coordination", "description": "General questions.", "keywords": ["overview"]},
+    {
+        "id": "emma",
+        "responsibility": "Requirements Validation",
+        "description": "Checks requirement quality.",
+        "keywords": ["user story", "acceptance criteria"],
+    },
+    {"id": "david", "responsibility": "Compliance", "description": "Checks document structure.", "keywords": ["audit"]},
+]
+
+
+def test_plural_ies_folds_to_y():
+    assert tokenize("User stories") == ["user", "story"]
+    assert tokenize("stakeholders analysis") == ["stakeholder", "analysis"]
+
+
+def test_phrase_bonus_ignores_punctuation_and_plurals():
+    classifier = RouteClassifier(AGENTS)
+    plain = dict(classifier.classify("user story").scores)["emma"]
+    for text in ("Write user stories?", "user stories, please", "Acceptance criteria!"):
+        decision = classifier.classify(text)
+        assert decision.agent_ids == ("emma",)
+        assert decision.confident
+    assert dict(classifier.classify("Write user stories?").scores)["emma"] == plain
+
+
+def test_single_description_term_is_not_confident():
+    decision = RouteClassifier(AGENTS).classify("summarize the document")
+    assert decision.agent_ids == ("david",)
+    assert not decision.confident
+
+
+def test_out_of_range_multi_ratio_never_selects_unscored_agents():
+    for ratio in (0.0, -1.0, 1.5):
+        decision = RouteClassifier(AGENTS, multi_ratio=ratio).classify("acceptance criteria")
+        assert decision.agent_ids == ("emma",)
+        assert decision.confidence == 1.0
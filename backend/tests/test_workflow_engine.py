@@ -0,0 +1,50 @@
+import pytest
+
+from app.services.workflow_engine import WorkflowError, _parse_workflow, run_workflow
+
+WORKFLOW = {
+    "max_parallel": 4,
+    "nodes": {
+        "report": {"depends_on": ["validate", "trace"]},
+        "validate": {"depends_on": ["extract"]},
+        "trace": {"depends_on": ["extract"]},
+        "extract": {},
+    },
+}
+
+
+def test_nodes_run_after_their_dependencies_with_their_results():
+    workflow = _parse_workflow("wf", WORKFLOW)
+    finished = []
+
+    def run_node(node, inputs):
+        assert set(inputs) == set(node.depends_on)
+        return f"{node.name}({','.join(sorted(inputs.values()))})"
+
+    results = run_workflow(workflow, run_node, on_complete=lambda name, result, error: finished.append(name))
+    assert results["report"] == "report(trace(extract()),validate(extract()))"
+    assert finished[0] == "extract" and finished[-1] == "report"
+
+
+def test_failure_skips_dependents_after_retries():
+    trace = {"depends_on": ["extract"], "retries": 1, "retry_backoff_seconds": 0}
+    workflow = _parse_workflow("wf", {"nodes": {**WORKFLOW["nodes"], "trace": trace}})
+    attempts = []
+    errors = {}
+
+    def run_node(node, inputs):
+        attempts.append(node.name)
+        if node.name == "trace":
+            raise RuntimeError("model error")
+        return node.name
+
+    results = run_workflow(workflow, run_node, on_complete=lambda name, result, error: errors.update({name: error}))
+    assert set(results) == {"extract", "validate"}
+    assert attempts.count("trace") == 2
+    assert "report" not in attempts
+    assert "dependency trace failed" in str(errors["report"])
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(WorkflowError, match="cycle"):
+        _parse_workflow("wf", {"nodes": {"a": {"depends_on": ["b"]}, "b": {"depends_on": ["a"]}}})
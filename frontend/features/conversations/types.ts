@@ -6,4 +6,7 @@ export interface Conversation {
   title: string;
   created_at: string;
   updated_at: string;
+  message_count: number;
+  last_message_at: string | null;
+  last_message_preview: string | null;
 }
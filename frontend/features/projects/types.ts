@@ -5,4 +5,7 @@ export interface Project {
   name: string;
   created_at: string;
   updated_at: string;
+  conversation_count: number;
+  document_count: number;
+  last_activity_at: string | null;
 }